@@ -0,0 +1,339 @@
+"""Daily, per-condition and correlation statistics, updated one observation at a time.
+
+Usage:
+    python aggregates.py rebuild bbc_weather.csv OUT.json   # from scratch, vectorized
+    python aggregates.py check bbc_weather.csv              # incremental vs rebuild
+
+Reports read these in O(days) rather than re-reading every observation.
+Statistics are kept as [count, mean, M2, min, max] (Welford's running
+variance), so they can be updated and persisted without the raw rows.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from collections import namedtuple
+
+from schema import COLUMNS
+
+# Every numeric column gets daily statistics, plus 'tide_height', which
+# pools the four tide heights for the daily tide range.
+DAILY_METRICS = [column.field for column in COLUMNS if column.kind == 'float']
+TIDE_HEIGHTS = ['low_tide_morning_height', 'high_tide_morning_height',
+                'low_tide_evening_height', 'high_tide_evening_height']
+CONDITION_METRICS = ['high_temperature', 'current_temperature']
+# The report's correlation matrix, over observations that have all of them.
+CORRELATION_METRICS = ['high_temperature', 'low_temperature', 'current_temperature',
+                       'wind_speed', 'humidity', 'pressure']
+
+Summary = namedtuple('Summary', ['count', 'mean', 'sd', 'min', 'max'])
+
+VERSION = 1
+
+
+def _new_stats():
+    return [0, 0.0, 0.0, math.inf, -math.inf]
+
+
+def _add(stats, value):
+    """Adds one value to [count, mean, M2, min, max]."""
+    stats[0] += 1
+    delta = value - stats[1]
+    stats[1] += delta / stats[0]
+    stats[2] += delta * (value - stats[1])
+    if value < stats[3]:
+        stats[3] = value
+    if value > stats[4]:
+        stats[4] = value
+
+
+def _merge(stats, other):
+    """Folds another [count, mean, M2, min, max] into stats (Chan et al.'s pairwise update)."""
+    count = stats[0] + other[0]
+    if not other[0]:
+        return
+    delta = other[1] - stats[1]
+    stats[2] += other[2] + delta * delta * stats[0] * other[0] / count
+    stats[1] += delta * other[0] / count
+    stats[0] = count
+    stats[3] = min(stats[3], other[3])
+    stats[4] = max(stats[4], other[4])
+
+
+def summarize(stats):
+    """Turns [count, mean, M2, min, max] into a Summary (sd is the sample standard deviation)."""
+    count, mean, m2, low, high = stats
+    if not count:
+        return Summary(0, None, None, None, None)
+    sd = math.sqrt(m2 / (count - 1)) if count > 1 else None
+    return Summary(count, mean, sd, low, high)
+
+
+class Aggregates:
+    """Running statistics over the observation log, kept in a JSON file.
+
+    Observations must be added in time order; ones at or before the last
+    time already added (last_time, epoch seconds) are skipped, so replaying
+    a log is harmless.
+    """
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+        self.last_time = None
+        self.daily = {}
+        self.conditions = {}
+        self.correlation = {'n': 0, 'mean': [0.0] * len(CORRELATION_METRICS),
+                            'comoment': [[0.0] * len(CORRELATION_METRICS) for _ in CORRELATION_METRICS]}
+        if file_path and os.path.exists(file_path):
+            # An OSError (a dropped Drive mount, say) is raised: starting empty
+            # would overwrite the file with the next save().
+            with open(file_path, encoding='utf-8') as f:
+                text = f.read()
+            try:
+                self._load(json.loads(text))
+            except (ValueError, KeyError) as e:
+                # Corrupt or from another version: kept aside for a rebuild, not overwritten.
+                moved = f'{file_path}.{int(time.time())}.bad'
+                os.replace(file_path, moved)
+                print(f"Starting new aggregates; unreadable {file_path} moved to {moved}: {e}")
+
+    def _load(self, state):
+        if state.get('version') != VERSION:
+            raise ValueError(f"version {state.get('version')}, expected {VERSION}")
+        self.last_time, self.daily, self.conditions, self.correlation = (
+            state['last_time'], state['daily'], state['conditions'], state['correlation'])
+
+    def state(self):
+        return {'version': VERSION, 'last_time': self.last_time, 'daily': self.daily,
+                'conditions': self.conditions, 'correlation': self.correlation}
+
+    def save(self):
+        if not self.file_path:
+            return
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state(), f)
+        os.replace(tmp_path, self.file_path)
+
+    def add(self, observation):
+        """Updates every statistic with one observation.Observation; returns False if skipped."""
+        when = observation.time_of_search.timestamp()
+        if self.last_time is not None and when <= self.last_time:
+            return False
+        self.last_time = when
+
+        day = self.daily.setdefault(observation.time_of_search.strftime('%Y-%m-%d'), {})
+        for metric in DAILY_METRICS:
+            value = getattr(observation, metric)
+            if value is not None:
+                _add(day.setdefault(metric, _new_stats()), value)
+        for metric in TIDE_HEIGHTS:
+            value = getattr(observation, metric)
+            if value is not None:
+                _add(day.setdefault('tide_height', _new_stats()), value)
+
+        if observation.weather_condition is not None:
+            condition = self.conditions.setdefault(observation.weather_condition, {'count': 0})
+            condition['count'] += 1
+            for metric in CONDITION_METRICS:
+                value = getattr(observation, metric)
+                if value is not None:
+                    _add(condition.setdefault(metric, _new_stats()), value)
+
+        values = [getattr(observation, metric) for metric in CORRELATION_METRICS]
+        if None not in values:
+            self._add_correlation(values)
+        return True
+
+    def _add_correlation(self, values):
+        """Updates the running mean vector and co-moment matrix with one complete row."""
+        correlation = self.correlation
+        correlation['n'] += 1
+        n = correlation['n']
+        mean = correlation['mean']
+        before = [value - m for value, m in zip(values, mean)]
+        for i, delta in enumerate(before):
+            mean[i] += delta / n
+        after = [value - m for value, m in zip(values, mean)]
+        for i, row in enumerate(correlation['comoment']):
+            for j in range(len(row)):
+                row[j] += before[i] * after[j]
+
+    def merge(self, other):
+        """Adds another Aggregates' statistics to these, e.g. one per day partition.
+
+        Days, conditions and the correlation matrix combine exactly; the
+        other aggregates should cover a later or disjoint stretch of time.
+        """
+        for day, metrics in other.daily.items():
+            mine = self.daily.setdefault(day, {})
+            for metric, stats in metrics.items():
+                _merge(mine.setdefault(metric, _new_stats()), stats)
+        for condition, stats in other.conditions.items():
+            mine = self.conditions.setdefault(condition, {'count': 0})
+            mine['count'] += stats['count']
+            for metric, values in stats.items():
+                if metric != 'count':
+                    _merge(mine.setdefault(metric, _new_stats()), values)
+
+        a, b = self.correlation, other.correlation
+        count = a['n'] + b['n']
+        if b['n']:
+            delta = [y - x for x, y in zip(a['mean'], b['mean'])]
+            weight = a['n'] * b['n'] / count
+            for i, row in enumerate(a['comoment']):
+                for j in range(len(row)):
+                    row[j] += b['comoment'][i][j] + delta[i] * delta[j] * weight
+            a['mean'] = [x + d * b['n'] / count for x, d in zip(a['mean'], delta)]
+            a['n'] = count
+        if other.last_time is not None and (self.last_time is None or other.last_time > self.last_time):
+            self.last_time = other.last_time
+        return self
+
+    def daily_summary(self, metric):
+        """Returns [(day, Summary)] for a metric, oldest day first."""
+        return [(day, summarize(metrics[metric])) for day, metrics in sorted(self.daily.items())
+                if metric in metrics]
+
+    def condition_summary(self, metric='high_temperature'):
+        """Returns {condition: Summary of metric} for every weather condition seen."""
+        return {condition: summarize(stats.get(metric, _new_stats()))
+                for condition, stats in self.conditions.items()}
+
+    def condition_counts(self):
+        return {condition: stats['count'] for condition, stats in self.conditions.items()}
+
+    def correlation_matrix(self):
+        """Returns (metrics, matrix) of Pearson correlations over complete observations."""
+        comoment = self.correlation['comoment']
+        size = len(CORRELATION_METRICS)
+        matrix = [[None] * size for _ in range(size)]
+        for i in range(size):
+            for j in range(size):
+                denominator = math.sqrt(comoment[i][i] * comoment[j][j])
+                matrix[i][j] = comoment[i][j] / denominator if denominator else None
+        return CORRELATION_METRICS, matrix
+
+
+def rebuild(table):
+    """Computes the same aggregates from scratch from a history.load_history table.
+
+    Vectorized (pyarrow group-bys and one NumPy product), so it is an
+    independent check on the incremental path as well as a quick way to
+    start from an existing log.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    aggregates = Aggregates()
+    if not table.num_rows:
+        return aggregates
+    # Repeated times count once, as Aggregates.add skips them.
+    times = table.column('time_of_search').cast(pa.int64()).to_numpy()
+    table = table.filter(pa.array(np.concatenate([[True], times[1:] > times[:-1]])))
+    aggregates.last_time = float(times[-1])
+    days = pc.strftime(table.column('time_of_search'), format='%Y-%m-%d')
+
+    def grouped(keys, values, key_name):
+        """Returns {key: [count, mean, M2, min, max]} of values grouped by keys."""
+        frame = pa.table({key_name: keys, 'value': values}).filter(pc.is_valid(values))
+        if not frame.num_rows:
+            return {}
+        result = frame.group_by(key_name).aggregate([
+            ('value', 'count'), ('value', 'mean'), ('value', 'variance', pc.VarianceOptions(ddof=0)),
+            ('value', 'min'), ('value', 'max')])
+        return {key: [count, mean, variance * count, low, high] for key, count, mean, variance, low, high in zip(
+            *(result.column(name).to_pylist() for name in
+              [key_name, 'value_count', 'value_mean', 'value_variance', 'value_min', 'value_max']))}
+
+    for metric in DAILY_METRICS:
+        for day, stats in grouped(days, table.column(metric), 'day').items():
+            aggregates.daily.setdefault(day, {})[metric] = stats
+    tide_days = pa.chunked_array([days] * len(TIDE_HEIGHTS))
+    tide_values = pa.chunked_array([table.column(metric).combine_chunks() for metric in TIDE_HEIGHTS])
+    for day, stats in grouped(tide_days, tide_values, 'day').items():
+        aggregates.daily.setdefault(day, {})['tide_height'] = stats
+
+    conditions = table.column('weather_condition').cast(pa.string())
+    counts = pc.value_counts(conditions.filter(pc.is_valid(conditions))).to_pylist()
+    for entry in counts:
+        aggregates.conditions[entry['values']] = {'count': entry['counts']}
+    for metric in CONDITION_METRICS:
+        for condition, stats in grouped(conditions, table.column(metric), 'condition').items():
+            if condition is not None:
+                aggregates.conditions[condition][metric] = stats
+
+    matrix = np.column_stack([table.column(metric).fill_null(math.nan).to_numpy()
+                              for metric in CORRELATION_METRICS])
+    complete = matrix[~np.isnan(matrix).any(axis=1)]
+    if len(complete):
+        mean = complete.mean(axis=0)
+        centered = complete - mean
+        aggregates.correlation = {'n': len(complete), 'mean': mean.tolist(),
+                                  'comoment': (centered.T @ centered).tolist()}
+    return aggregates
+
+
+def compare(a, b, rel_tol=1e-9, abs_tol=1e-9):
+    """Returns a list of differences between two Aggregates (empty if they agree)."""
+    differences = []
+
+    def close(path, x, y):
+        if isinstance(x, (list, tuple)) and isinstance(y, (list, tuple)) and len(x) == len(y):
+            for i, (p, q) in enumerate(zip(x, y)):
+                close(f'{path}[{i}]', p, q)
+        elif isinstance(x, (int, float)) and isinstance(y, (int, float)):
+            if not math.isclose(x, y, rel_tol=rel_tol, abs_tol=abs_tol):
+                differences.append(f'{path}: {x} != {y}')
+        elif x != y:
+            differences.append(f'{path}: {x!r} != {y!r}')
+
+    for name in ('daily', 'conditions'):
+        first, second = getattr(a, name), getattr(b, name)
+        for key in sorted(set(first) | set(second)):
+            if key not in first or key not in second:
+                differences.append(f'{name}[{key}] only on one side')
+                continue
+            for inner in sorted(set(first[key]) | set(second[key])):
+                close(f'{name}[{key}][{inner}]', first[key].get(inner), second[key].get(inner))
+    close('correlation.n', a.correlation['n'], b.correlation['n'])
+    close('correlation.mean', a.correlation['mean'], b.correlation['mean'])
+    close('correlation.comoment', a.correlation['comoment'], b.correlation['comoment'])
+    close('last_time', a.last_time, b.last_time)
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = commands.add_parser('rebuild', help='compute the aggregates from a whole CSV log')
+    rebuild_parser.add_argument('csv_path')
+    rebuild_parser.add_argument('out')
+    check_parser = commands.add_parser('check', help='compare incremental and rebuilt aggregates')
+    check_parser.add_argument('csv_path')
+    args = parser.parse_args()
+
+    from history import load_history
+    table = load_history(args.csv_path)
+    rebuilt = rebuild(table)
+    if args.command == 'rebuild':
+        rebuilt.file_path = args.out
+        rebuilt.save()
+        print(f"Aggregated {table.num_rows} observations over {len(rebuilt.daily)} days into {args.out}")
+        return
+
+    from observation import read_csv_observations
+    incremental = Aggregates()
+    for observation in sorted(read_csv_observations(args.csv_path), key=lambda o: o.time_of_search):
+        incremental.add(observation)
+    differences = compare(incremental, rebuilt, rel_tol=1e-6)
+    for difference in differences[:20]:
+        print(difference)
+    print(f"{len(differences)} difference(s) over {len(rebuilt.daily)} days")
+    raise SystemExit(1 if differences else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Typed Parquet archive of observations, partitioned by day.
+
+Usage:
+    python archive.py import bbc_weather.csv ARCHIVE_DIR   # load an existing CSV log
+    python archive.py compact ARCHIVE_DIR [--date YYYY-MM-DD ...]
+    python archive.py compact FORECAST_DIR/hourly --table hourly
+
+Files live in ARCHIVE_DIR/date=YYYY-MM-DD/*.parquet, so a scan over a
+date range only opens those days' files, and only the requested columns
+are read from them.
+"""
+import argparse
+import glob
+import os
+import time
+import uuid
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from observation import Observation, arrow_schema, read_csv_observations, to_record_batch
+from schema import parse_timestamp
+
+SCHEMA = arrow_schema()
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+
+def to_table(observations):
+    """Builds an Arrow table from a list of observations."""
+    return pa.Table.from_batches([to_record_batch(observations)])
+
+
+def partition_dir(root, day):
+    return os.path.join(root, f'date={day}')
+
+
+def _write_file(directory, table, prefix='part'):
+    """Writes a table to a new, uniquely named file in directory and returns its path."""
+    return _write_files([(directory, table)], prefix)[0]
+
+
+def _write_files(tables, prefix='part'):
+    """Writes [(directory, table)] to new files, all or none of them; returns their paths.
+
+    Every table is written to a .tmp file first, and the files are only
+    renamed into place once all of them have been written, so a caller can
+    retry a failed write without duplicating the tables that did get out.
+    """
+    paths = []
+    try:
+        for directory, table in tables:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{prefix}-{int(time.time())}-{uuid.uuid4().hex[:8]}.parquet')
+            paths.append(path)
+            pq.write_table(table, path + '.tmp', compression='zstd')
+    except Exception:
+        for path in paths:
+            try:
+                os.remove(path + '.tmp')
+            except OSError:
+                pass
+        raise
+    for path in paths:
+        os.replace(path + '.tmp', path)
+    return paths
+
+
+class ParquetArchive:
+    """Collects observations and writes them as typed Parquet, one directory per day.
+
+    Rows are buffered and written once flush_rows have arrived (or on
+    flush/close), so each write makes a small file; compact() merges them.
+    """
+
+    def __init__(self, root, flush_rows=6):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.pending = []
+
+    def append(self, row):
+        """Adds one Observation, or a row keyed by CSV column names."""
+        if not isinstance(row, Observation):
+            row = Observation.from_row(row)
+        self.pending.append(row)
+        if len(self.pending) >= self.flush_rows:
+            self.flush()
+
+    def extend(self, rows):
+        """Writes several rows out straight away, bypassing the buffer (for spool.Uploader).
+
+        Nothing is kept if the write fails, so the caller can send the same
+        rows again without them being written twice.
+        """
+        self._write([row if isinstance(row, Observation) else Observation.from_row(row) for row in rows])
+
+    def flush(self):
+        """Writes buffered rows, one file per day they fall on."""
+        self._write(self.pending)
+        self.pending = []
+
+    def _write(self, observations):
+        by_day = {}
+        for observation in observations:
+            by_day.setdefault(observation.time_of_search.strftime('%Y-%m-%d'), []).append(observation)
+        _write_files([(partition_dir(self.root, day), to_table(observations))
+                      for day, observations in by_day.items()])
+
+    def close(self):
+        self.flush()
+
+
+# Forecast tables (scraper.ForecastTable): one row per hourly slot or day,
+# keyed by when the forecast was issued and the time it is for.
+_FORECAST_COLUMNS = [
+    ('issued_at', pa.timestamp('s', tz='Europe/London')),
+    ('target_time', pa.timestamp('s', tz='Europe/London')),
+]
+HOURLY_SCHEMA = pa.schema(_FORECAST_COLUMNS + [
+    ('temperature', pa.float64()),
+    ('weather_condition', pa.dictionary(pa.int32(), pa.string())),
+    ('wind_speed', pa.float64()),
+    ('wind_direction', pa.dictionary(pa.int32(), pa.string())),
+    ('humidity', pa.float64()),
+    ('pressure', pa.float64()),
+    ('visibility', pa.dictionary(pa.int32(), pa.string())),
+    ('precipitation_chance', pa.float64()),
+])
+DAILY_SCHEMA = pa.schema([
+    ('issued_at', pa.timestamp('s', tz='Europe/London')),
+    ('target_time', pa.date32()),
+    ('high_temperature', pa.float64()),
+    ('low_temperature', pa.float64()),
+])
+
+SCHEMAS = {'observations': SCHEMA, 'hourly': HOURLY_SCHEMA, 'daily': DAILY_SCHEMA}
+
+
+def forecast_to_table(columns, schema):
+    """Builds an Arrow table from forecast column arrays of 'YYYY-MM-DD[ HH:MM]' strings and values."""
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if pa.types.is_timestamp(field.type):
+            values = [parse_timestamp(value) for value in values]
+        elif pa.types.is_date(field.type):
+            values = [date.fromisoformat(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class ForecastArchive:
+    """Writes forecast tables as Parquet under root/hourly and root/daily, one directory per issue day.
+
+    Like ParquetArchive, tables are buffered and written flush_tables at a time.
+    """
+
+    def __init__(self, root, flush_tables=6):
+        self.root = root
+        self.flush_tables = flush_tables
+        self.pending = []
+
+    def append(self, table):
+        """Adds one scraper.ForecastTable."""
+        self.pending.append(table)
+        if len(self.pending) >= self.flush_tables:
+            self.flush()
+
+    def flush(self):
+        by_day = {}
+        for table in self.pending:
+            issued = table.hourly['issued_at'] or table.daily['issued_at']
+            if issued:
+                by_day.setdefault(issued[0][:10], []).append(table)
+        # Hourly and daily files land together or not at all, so a failed
+        # flush can be retried without writing any of them twice.
+        files = []
+        for day, tables in by_day.items():
+            for kind, schema in (('hourly', HOURLY_SCHEMA), ('daily', DAILY_SCHEMA)):
+                parts = [forecast_to_table(getattr(table, kind), schema) for table in tables]
+                files.append((partition_dir(os.path.join(self.root, kind), day),
+                              pa.concat_tables(parts).unify_dictionaries().combine_chunks()))
+        _write_files(files)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+
+
+def compact(root, days=None, schema=SCHEMA):
+    """Merges each day's files into one file sorted by the first column (time of search).
+
+    Returns the number of partitions rewritten. Only days with more than
+    one file are touched; the merged file is in place before the small
+    files are removed.
+    """
+    compacted = 0
+    for directory in sorted(glob.glob(os.path.join(root, 'date=*'))):
+        day = os.path.basename(directory)[len('date='):]
+        if days and day not in days:
+            continue
+        files = sorted(glob.glob(os.path.join(directory, '*.parquet')))
+        if len(files) < 2:
+            continue
+        table = pa.concat_tables([pq.read_table(path, schema=schema) for path in files])
+        table = table.unify_dictionaries().sort_by(schema.names[0])
+        _write_file(directory, table.combine_chunks(), prefix='compacted')
+        for path in files:
+            os.remove(path)
+        compacted += 1
+    return compacted
+
+
+def read_archive(root, columns=None, start=None, end=None):
+    """Reads observations from the archive as an Arrow table.
+
+    columns limits which columns are read; start and end are 'YYYY-MM-DD'
+    days (inclusive) and prune whole partitions before any file is opened.
+    """
+    dataset = ds.dataset(root, format='parquet', schema=SCHEMA.append(pa.field('date', pa.string())),
+                         partitioning=PARTITIONING)
+    condition = None
+    if start is not None:
+        condition = ds.field('date') >= start
+    if end is not None:
+        upper = ds.field('date') <= end
+        condition = upper if condition is None else condition & upper
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def import_csv(csv_path, root, batch_rows=10000):
+    """Loads an existing bbc_weather.csv log into the archive."""
+    archive = ParquetArchive(root, flush_rows=batch_rows)
+    count = 0
+    for observation in read_csv_observations(csv_path):
+        archive.append(observation)
+        count += 1
+    archive.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    compact_parser = commands.add_parser('compact', help='merge small files within each day')
+    compact_parser.add_argument('root')
+    compact_parser.add_argument('--date', action='append', help='only this day (repeatable)')
+    compact_parser.add_argument('--table', choices=sorted(SCHEMAS), default='observations',
+                                help='what the directory holds (hourly/daily: a ForecastArchive subdirectory)')
+    import_parser = commands.add_parser('import', help='load a CSV log into the archive')
+    import_parser.add_argument('csv_path')
+    import_parser.add_argument('root')
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        print(f"Compacted {compact(args.root, args.date, SCHEMAS[args.table])} partition(s)")
+    else:
+        count = import_csv(args.csv_path, args.root)
+        compact(args.root)
+        print(f"Imported {count} rows into {args.root}")
+
+
+if __name__ == '__main__':
+    main()
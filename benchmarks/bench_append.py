@@ -0,0 +1,111 @@
+"""Measures the cost of saving one observation against the size of the history.
+
+Usage: python benchmarks/bench_append.py [--sizes 10000 100000 1000000] [--rewrite]
+
+For every size a synthetic bbc_weather.csv with that many rows is generated
+in a temporary directory, then a handful of new rows are appended through
+AppendOnlyCSVStore. With --rewrite the old read/concat/rewrite path
+(RewriteCSVStore) is timed too, which gets slow quickly.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from storage import AppendOnlyCSVStore, RewriteCSVStore
+
+COLUMNS = [
+    'Time of Search', 'High Temperature(°C)', 'Low Temperature(°C)', 'Current Temperature(°C)',
+    'Weather Condition', 'Wind Speed(mph)', 'Humidity(%)', 'Pressure(mb)', 'Visibility',
+    'Location', 'Wind Direction', 'UV Index', 'Pollen', 'Pollution', 'Chance of Precipitation(%)',
+    'Sunset', 'Sunrise', 'Low Tide Morning Time', 'Low Tide Morning Height(M)',
+    'High Tide Morning Time', 'High Tide Morning Height(M)', 'Low Tide Evening Time',
+    'Low Tide Evening Height(M)', 'High Tide Evening Time', 'High Tide Evening Height(M)',
+]
+
+START = datetime(2024, 7, 1)
+
+
+def make_row(i):
+    """Builds a plausible observation for the i-th 10-minute slot."""
+    when = START + timedelta(minutes=10 * i)
+    return {
+        'Time of Search': when.strftime('%Y-%m-%d %H:%M'),
+        'High Temperature(°C)': 21.0,
+        'Low Temperature(°C)': 13.0,
+        'Current Temperature(°C)': 15.0 + (i % 7),
+        'Weather Condition': 'Light cloud and a gentle breeze',
+        'Wind Speed(mph)': str(5 + i % 10),
+        'Humidity(%)': 70.0,
+        'Pressure(mb)': '1012',
+        'Visibility': 'Good',
+        'Location': 'London - Weather warnings issued',
+        'Wind Direction': 'South Westerly',
+        'UV Index': 'Medium',
+        'Pollen': 'High',
+        'Pollution': 'Low',
+        'Chance of Precipitation(%)': 10.0,
+        'Sunset': '21:15',
+        'Sunrise': '04:51',
+        'Low Tide Morning Time': '03:12',
+        'Low Tide Morning Height(M)': '0.80',
+        'High Tide Morning Time': '08:31',
+        'High Tide Morning Height(M)': '6.50',
+        'Low Tide Evening Time': '15:40',
+        'Low Tide Evening Height(M)': '0.70',
+        'High Tide Evening Time': '20:58',
+        'High Tide Evening Height(M)': '6.70',
+    }
+
+
+def write_history(file_path, rows, newest_first=False):
+    """Writes a synthetic history file with the given number of rows."""
+    order = range(rows - 1, -1, -1) if newest_first else range(rows)
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(COLUMNS)
+        for i in order:
+            row = make_row(i)
+            writer.writerow([row[column] for column in COLUMNS])
+
+
+def time_appends(store, start, count):
+    """Returns the mean seconds per append over count appends."""
+    started = time.perf_counter()
+    for i in range(start, start + count):
+        store.append(make_row(i))
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--appends', type=int, default=50)
+    parser.add_argument('--rewrite', action='store_true', help='also time the old rewrite path')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'append (ms/row)':>16}  {'rewrite (ms/row)':>17}  {'file size':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            file_path = os.path.join(tmp, f'history_{size}.csv')
+            write_history(file_path, size)
+            append_cost = time_appends(AppendOnlyCSVStore(file_path), size, args.appends)
+            file_size = os.path.getsize(file_path)
+
+            rewrite_cost = float('nan')
+            if args.rewrite:
+                write_history(file_path, size, newest_first=True)
+                rewrite_cost = time_appends(RewriteCSVStore(file_path), size, min(args.appends, 3))
+            os.remove(file_path)
+
+            print(f"{size:>10}  {append_cost * 1000:>16.3f}  {rewrite_cost * 1000:>17.1f}  "
+                  f"{file_size / 1e6:>8.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
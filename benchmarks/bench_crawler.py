@@ -0,0 +1,38 @@
+"""Runs one crawler cycle over many synthetic locations against the stand-in
+server and prints the cycle report.
+
+Usage: python benchmarks/bench_crawler.py [--locations 300] [--delay 0.2] [--workers 32]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from crawler import Crawler, format_report
+from locations import Location
+from standin import FORECAST_PREFIX, TIDE_PREFIX, StandInServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=300)
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds the stand-in waits per page')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--jitter', type=float, default=2.0)
+    parser.add_argument('--per-host-interval', type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Every other location has a tide station, like a mix of coastal and inland places.
+    locations = [Location(str(1000000 + i), f'2/{i}' if i % 2 else None) for i in range(args.locations)]
+    with StandInServer(delay=args.delay) as server:
+        crawler = Crawler(locations, workers=args.workers, jitter=args.jitter,
+                          per_host_interval=args.per_host_interval,
+                          forecast_template=server.base_url + FORECAST_PREFIX + '{geo_id}',
+                          tide_template=server.base_url + TIDE_PREFIX + '{station}')
+        results, report = crawler.run_cycle()
+    print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Compares the size and write volume of the plain and change-only (delta) CSV logs.
+
+Usage: python benchmarks/bench_delta.py [--days 30] [--interval 10]
+
+Generates a log the way BBC publishes: current conditions updated hourly,
+the day's high/low a few times a day, and sunrise, sunset, tides, UV,
+pollen and pollution once a day. The same rows go to AppendOnlyCSVStore
+and DeltaCSVStore, one append per row, and the delta file is read back
+and checked against the plain one.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_append import COLUMNS
+from storage import AppendOnlyCSVStore, DeltaCSVStore
+
+CONDITIONS = ['Sunny', 'Light cloud', 'Thick cloud', 'Light rain showers', 'Drizzle', 'Sunny intervals']
+DIRECTIONS = ['Westerly', 'South Westerly', 'Southerly', 'North Westerly']
+
+
+def realistic_rows(days, interval, seed=0):
+    """Yields rows every interval minutes, with fields changing at BBC's pace."""
+    rng = random.Random(seed)
+    when = datetime(2024, 7, 1)
+    row = {}
+    for _ in range(days * 24 * 60 // interval):
+        if when.hour == 0 and when.minute == 0 or not row:
+            clock = lambda: f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}'
+            row.update({
+                'Sunrise': f'04:{rng.randint(40, 59)}', 'Sunset': f'21:{rng.randint(0, 20):02d}',
+                'UV Index': rng.choice(['Low', 'Moderate', 'High']), 'Pollen': rng.choice(['Low', 'High']),
+                'Pollution': 'Low', 'Location': 'London',
+                'Low Tide Morning Time': clock(), 'Low Tide Morning Height(M)': f'{rng.uniform(0, 2):.2f}',
+                'High Tide Morning Time': clock(), 'High Tide Morning Height(M)': f'{rng.uniform(5, 7):.2f}',
+                'Low Tide Evening Time': clock(), 'Low Tide Evening Height(M)': f'{rng.uniform(0, 2):.2f}',
+                'High Tide Evening Time': clock(), 'High Tide Evening Height(M)': f'{rng.uniform(5, 7):.2f}',
+            })
+        if when.minute == 0 and (when.hour % 6 == 0 or 'High Temperature(°C)' not in row):
+            row['High Temperature(°C)'] = str(rng.randint(18, 28))
+            row['Low Temperature(°C)'] = str(rng.randint(8, 15))
+        if when.minute == 0 or 'Current Temperature(°C)' not in row:
+            # The hourly republish; some fields often come back the same.
+            row['Current Temperature(°C)'] = str(rng.randint(12, 26))
+            if rng.random() < 0.4 or 'Weather Condition' not in row:
+                row['Weather Condition'] = rng.choice(CONDITIONS)
+            row['Wind Speed(mph)'] = str(rng.randint(3, 20))
+            if rng.random() < 0.3 or 'Wind Direction' not in row:
+                row['Wind Direction'] = rng.choice(DIRECTIONS)
+            row['Humidity(%)'] = str(rng.randint(50, 95))
+            row['Pressure(mb)'] = str(rng.randint(995, 1030))
+            row['Visibility'] = rng.choice(['Good', 'Very Good', 'Moderate'])
+            row['Chance of Precipitation(%)'] = str(rng.randrange(0, 100, 5))
+        row['Time of Search'] = when.strftime('%Y-%m-%d %H:%M')
+        yield {column: row.get(column, 'N/A') for column in COLUMNS}
+        when += timedelta(minutes=interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--interval', type=int, default=10, help='minutes between observations')
+    args = parser.parse_args()
+
+    rows = list(realistic_rows(args.days, args.interval))
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, store_class in (('plain', AppendOnlyCSVStore), ('delta', DeltaCSVStore)):
+            path = os.path.join(directory, f'{name}.csv')
+            store = store_class(path)
+            started = time.perf_counter()
+            for row in rows:
+                store.append(row)
+            results[name] = (os.path.getsize(path), (time.perf_counter() - started) / len(rows))
+            print(f"{name:6s} {results[name][0] / 1024:8.0f} KB  {results[name][0] / len(rows):6.1f} bytes/row  "
+                  f"{results[name][1] * 1e6:5.0f} us/append")
+        print(f"{len(rows)} rows: delta is {results['plain'][0] / results['delta'][0]:.1f}x smaller")
+
+        with open(os.path.join(directory, 'plain.csv'), newline='', encoding='utf-8') as f:
+            plain = list(csv.reader(f))[1:]
+        delta = DeltaCSVStore(os.path.join(directory, 'delta.csv'))
+        started = time.perf_counter()
+        rebuilt = list(delta.iter_rows())
+        print(f"delta read back in {(time.perf_counter() - started) * 1e3:.0f} ms, "
+              f"identical to the plain log: {rebuilt == plain}")
+        reopened = DeltaCSVStore(os.path.join(directory, 'delta.csv'))
+        print(f"reopened store resumes from the last row: {reopened.previous == plain[-1]}")
+        if rebuilt != plain or reopened.previous != plain[-1]:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Compares per-page field extraction: the old absolute XPath strings against
+the precompiled field table in extraction.py.
+
+Usage: python benchmarks/bench_extraction.py [--pages forecast.html ...] [--repeat 200]
+
+Without --pages a set of generated stand-in pages is used (see pages.py);
+pass saved copies of real BBC forecast pages to measure those instead.
+Parsing is timed separately so the numbers only cover field extraction.
+"""
+import argparse
+import os
+import sys
+import time
+
+from lxml import html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extraction import extract_forecast, extract_forecast_page, map_level
+from pages import render_forecast_page
+
+
+def legacy_extract(tree):
+    """The extraction loop get_weather_data used before the field table."""
+    def extract_and_clean(xpath, elem_index=0, suffix=None, convert_to_float=False):
+        elem = tree.xpath(xpath)
+        if elem:
+            text = elem[elem_index].text.strip()
+            if suffix:
+                text = text[:-len(suffix)]
+            return float(text) if convert_to_float else text
+        return "N/A"
+
+    return {
+        'High Temperature(°C)': extract_and_clean('//*[@id="daylink-0"]/div[4]/div[1]/div/div[4]/div/div[1]/span[2]/span/span[1]', suffix='°', convert_to_float=True),
+        'Low Temperature(°C)': extract_and_clean('//*[@id="daylink-0"]/div[4]/div[1]/div/div[4]/div/div[2]/span[2]/span/span[1]', suffix='°', convert_to_float=True),
+        'Current Temperature(°C)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[1]/div[2]/div[3]/div[2]/div/div/div[2]/span/span[1]', suffix='°', convert_to_float=True),
+        'Weather Condition': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/span'),
+        'Wind Speed(mph)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[1]/div[2]/div[3]/div[4]/div/span[3]/span/span[1]'),
+        'Humidity(%)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[1]/dl/dd[1]', suffix='%', convert_to_float=True),
+        'Pressure(mb)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[1]/dl/dd[2]', suffix=' mb'),
+        'Visibility': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[1]/dl/dd[3]'),
+        'Location': extract_and_clean('//*[@id="wr-location-name-id"]'),
+        'Wind Direction': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[4]'),
+        'UV Index': map_level(extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[2]/span[2]/span[1]/span[2]')),
+        'Pollen': map_level(extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[2]/span[1]/span[1]/span[2]')),
+        'Pollution': map_level(extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[2]/span[3]/span[1]/span[2]')),
+        'Chance of Precipitation(%)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[1]/div[2]/div[3]/div[3]/div[2]', suffix='%', convert_to_float=True),
+        'Sunset': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[1]/span[2]/span[2]'),
+        'Sunrise': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[1]/span[1]/span[2]'),
+    }
+
+
+def time_per_page(extract, trees, repeat):
+    """Returns the mean seconds spent extracting one page."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for tree in trees:
+            extract(tree)
+    return (time.perf_counter() - started) / (repeat * len(trees))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', nargs='*', help='saved forecast pages to use instead of generated ones')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.pages:
+        documents = []
+        for path in args.pages:
+            with open(path, 'rb') as f:
+                documents.append(f.read())
+    else:
+        documents = [render_forecast_page(seed=seed).encode('utf-8') for seed in range(5)]
+
+    started = time.perf_counter()
+    trees = [html.fromstring(document) for document in documents]
+    parse_cost = (time.perf_counter() - started) / len(trees)
+
+    for tree in trees:
+        if legacy_extract(tree) != extract_forecast(tree):
+            print("warning: old and new extraction disagree on a page")
+
+    legacy_cost = time_per_page(legacy_extract, trees, args.repeat)
+    table_cost = time_per_page(extract_forecast, trees, args.repeat)
+
+    print(f"pages: {len(trees)} (avg {sum(map(len, documents)) / len(documents) / 1024:.0f} KB)")
+    print(f"parse (html.fromstring):   {parse_cost * 1e3:8.3f} ms/page")
+    print(f"absolute XPath strings:    {legacy_cost * 1e3:8.3f} ms/page")
+    print(f"precompiled field table:   {table_cost * 1e3:8.3f} ms/page")
+    print(f"speed-up:                  {legacy_cost / table_cost:8.1f}x")
+
+    page = extract_forecast_page(trees[0])
+    values = sum(len(column) for part in ('hourly', 'daily') for column in page[part].values())
+    page_cost = time_per_page(extract_forecast_page, trees, args.repeat)
+    print(f"every hour and day:        {page_cost * 1e3:8.3f} ms/page "
+          f"({values + len(page['current'])} values vs {len(page['current'])})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Compares fetching the forecast and tide pages one after the other with the
+concurrent fetch layer, against the local stand-in server.
+
+Usage: python benchmarks/bench_fetch.py [--delay 0.3] [--ticks 5]
+
+Also checks that a failing tide page still produces a forecast row, and
+how many ticks the PageCache answers without parsing.
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extraction import extract_forecast
+from fetch import PageCache, fetch_and_parse
+from scraper import current_time_of_search, get_weather_data, scrape_tide_times
+from standin import StandInServer
+
+
+def sequential_tick(session, server):
+    """The old order of work: forecast page, then tide page."""
+    forecast = fetch_and_parse(session, server.forecast_url(), extract_forecast)
+    tides = scrape_tide_times(session, current_time_of_search()[:10], url=server.tide_url())
+    return {**forecast, **tides}
+
+
+def concurrent_tick(session, server):
+    return get_weather_data(session, forecast_url=server.forecast_url(), tide_url=server.tide_url())
+
+
+def time_ticks(tick, session, server, ticks):
+    started = time.perf_counter()
+    for _ in range(ticks):
+        row = tick(session, server)
+    return (time.perf_counter() - started) / ticks, row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--delay', type=float, default=0.3, help='seconds the stand-in waits per page')
+    parser.add_argument('--ticks', type=int, default=5)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    with StandInServer(delay=args.delay) as server:
+        sequential, row = time_ticks(sequential_tick, session, server, args.ticks)
+        concurrent, concurrent_row = time_ticks(concurrent_tick, session, server, args.ticks)
+        print(f"sequential: {sequential * 1e3:7.1f} ms/tick")
+        print(f"concurrent: {concurrent * 1e3:7.1f} ms/tick")
+        if any(row[key] != concurrent_row[key] for key in row):
+            print("warning: sequential and concurrent rows differ")
+
+    with StandInServer() as server:
+        cache = PageCache()
+        uncached, _ = time_ticks(concurrent_tick, session, server, args.ticks)
+        started = time.perf_counter()
+        for _ in range(args.ticks):
+            get_weather_data(session, forecast_url=server.forecast_url(), tide_url=server.tide_url(),
+                             cache=cache)
+        cached = (time.perf_counter() - started) / args.ticks
+        print(f"unchanged pages, no cache:   {uncached * 1e3:7.1f} ms/tick")
+        print(f"unchanged pages, PageCache:  {cached * 1e3:7.1f} ms/tick  {cache.stats()}")
+
+    with StandInServer(delay=args.delay, tide_status=503) as server:
+        row = concurrent_tick(session, server)
+        print(f"tide page failing: forecast kept = {row['Location'] != 'N/A'}, "
+              f"tide columns = {row['Low Tide Morning Time']!r}")
+
+    with StandInServer(delay=0, tide_delay=3) as server:
+        started = time.perf_counter()
+        row = get_weather_data(session, forecast_url=server.forecast_url(), tide_url=server.tide_url(),
+                               timeout=(1, 1))
+        print(f"tide page hanging:  row returned in {time.perf_counter() - started:.1f}s, "
+              f"tide columns = {row['Low Tide Morning Time']!r}")
+
+
+if __name__ == '__main__':
+    main()
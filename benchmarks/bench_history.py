@@ -0,0 +1,79 @@
+"""Times loading a long bbc_weather.csv history: full parse, cached load and appended tail.
+
+Usage: python benchmarks/bench_history.py [--rows 200000] [--check 2000]
+
+Also checks the vectorized parse against Observation.from_row on the
+first --check rows, including missing values and unit suffixes.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_append import COLUMNS, make_row
+from history import cache_paths, history_arrays, load_history
+from observation import read_csv_observations, to_record_batch
+
+
+def messy_row(i):
+    """make_row with the odd missing value and unit suffix the real log has."""
+    row = make_row(i)
+    if i % 11 == 0:
+        row['Pressure(mb)'] = '1012 mb'
+    if i % 13 == 0:
+        row['Low Tide Evening Time'] = 'N/A'
+        row['Low Tide Evening Height(M)'] = 'N/A'
+    if i % 17 == 0:
+        row['UV Index'] = 'Unknown'
+    return row
+
+
+def write_rows(path, start, count, mode='a'):
+    with open(path, mode, newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, lineterminator='\n')
+        if mode == 'w':
+            writer.writeheader()
+        for i in range(start, start + count):
+            writer.writerow(messy_row(i))
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f"{label:28s} {(time.perf_counter() - started) * 1e3:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--check', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bbc_weather.csv')
+        write_rows(path, 0, args.check, 'w')
+        expected = to_record_batch(list(read_csv_observations(path)))
+        table = load_history(path, use_cache=False)
+        mismatched = [name for name in expected.schema.names
+                      if expected.column(name).to_pylist() != table.column(name).to_pylist()]
+        print(f"vectorized parse matches Observation.from_row: {not mismatched} {mismatched or ''}")
+
+        write_rows(path, args.check, args.rows - args.check)
+        print(f"{args.rows} rows, {os.path.getsize(path) / 2**20:.0f} MB")
+        timed('row by row (Observation)', lambda: list(read_csv_observations(path)))
+        timed('full parse, no cache', lambda: load_history(path, use_cache=False))
+        timed('first load (builds cache)', lambda: load_history(path))
+        table = timed('cached load (mmap)', lambda: load_history(path))
+        timed('NumPy arrays', lambda: history_arrays(table))
+        write_rows(path, args.rows, 6)
+        table = timed('load after 6 new rows', lambda: load_history(path))
+        print(f"rows now {table.num_rows}, cache {os.path.getsize(cache_paths(path)[0]) / 2**20:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
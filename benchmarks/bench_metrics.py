@@ -0,0 +1,62 @@
+"""Measures what the metrics hooks cost, on and off, and shows what they record.
+
+Usage: python benchmarks/bench_metrics.py [--ticks 20]
+
+Runs uncached ticks against the local stand-in server with metrics off and
+on, then prints one cycle's JSON summary and the Prometheus output.
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import metrics
+from scraper import get_weather_data
+from standin import StandInServer
+
+
+def time_ticks(session, server, ticks):
+    started = time.perf_counter()
+    for _ in range(ticks):
+        get_weather_data(session, forecast_url=server.forecast_url(), tide_url=server.tide_url())
+    return (time.perf_counter() - started) / ticks
+
+
+def hook():
+    with metrics.timed('fetch', page='forecast'):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args()
+
+    metrics.disable()
+    off = min(timeit.repeat(hook, number=100000, repeat=5))
+    metrics.enable()
+    on = min(timeit.repeat(hook, number=100000, repeat=5))
+    print(f"one hook: {off * 10:.2f} us disabled, {on * 10:.2f} us enabled")
+
+    session = requests.Session()
+    with StandInServer() as server:
+        time_ticks(session, server, 2)
+        metrics.disable()
+        disabled = time_ticks(session, server, args.ticks)
+        metrics.enable()
+        enabled = time_ticks(session, server, args.ticks)
+        print(f"tick with metrics off: {disabled * 1e3:.1f} ms, on: {enabled * 1e3:.1f} ms")
+
+        metrics.cycle_summary()
+        time_ticks(session, server, 1)
+        print(metrics.cycle_summary(time_of_search='example'))
+    print(metrics.render())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measures time-range query latency against the size of the history.
+
+Usage: python benchmarks/bench_query.py [--sizes 10000 100000 1000000] [--pandas]
+
+For every size a synthetic bbc_weather.csv is generated, the index is built
+once, and then a one-day range, a one-hour range and the latest 48 rows are
+queried through query.ObservationLog. With --pandas the old way (read the
+whole CSV and filter) is timed too.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_append import START
+from bench_history import write_rows
+from query import ObservationLog, TimeIndex, index_path
+
+
+def best_of(function, repeat=20):
+    """Returns the fastest of repeat runs, in milliseconds, and the last result."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e3, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--pandas', action='store_true', help='also time read_csv plus a filter')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'build':>9} {'1 day':>9} {'1 hour':>9} {'latest 48':>9}"
+          + (f" {'pandas':>9}" if args.pandas else ''))
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bbc_weather.csv')
+            write_rows(path, 0, size, 'w')
+            started = time.perf_counter()
+            TimeIndex(path).refresh()
+            build = (time.perf_counter() - started) * 1e3
+
+            # A day and an hour from the middle of the history (rows are 10 minutes apart).
+            day = (START + timedelta(minutes=10 * (size // 2))).strftime('%Y-%m-%d')
+            log = ObservationLog(path)
+            one_day, rows = best_of(lambda: log.between(day, f'{day} 23:59'))
+            one_hour, _ = best_of(lambda: log.between(f'{day} 12:00', f'{day} 13:00'))
+            latest, _ = best_of(lambda: log.latest(48))
+            line = f"{size:9d} {build:7.0f}ms {one_day:7.2f}ms {one_hour:7.2f}ms {latest:7.2f}ms"
+            if args.pandas:
+                import pandas as pd
+
+                def whole_file():
+                    frame = pd.read_csv(path)
+                    return frame[frame['Time of Search'].str.startswith(day)]
+                line += f" {best_of(whole_file, repeat=1)[0]:7.0f}ms"
+            print(line + f"   ({len(rows)} rows/day, index {os.path.getsize(index_path(path)) / 2**20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Fills a page archive with synthetic snapshots and times re-extraction.
+
+Usage: python benchmarks/bench_reextract.py [--days 7] [--locations 2] [--workers 1 4]
+
+Forecast pages change every hour and tide pages once a day, so most
+10-minute fetches repeat an earlier body and are only parsed once.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from locations import Location, forecast_url, tide_url
+from page_archive import PageArchive, reextract
+from pages import render_forecast_page, render_tide_page
+from schema import london_tz
+
+
+def fill(root, locations, days):
+    """Writes days of 10-minute snapshots for each location; returns the number of fetches."""
+    archive = PageArchive(root)
+    first_day = date(2024, 7, 1)
+    fetches = 0
+    for n in range(days):
+        day = first_day + timedelta(days=n)
+        for location in locations:
+            tides = render_tide_page(day, seed=n).encode('utf-8')
+            archive.add(tide_url(location), tides, london_tz.localize(datetime(day.year, day.month, day.day)))
+            fetches += 1
+        for hour in range(24):
+            for location in locations:
+                page = render_forecast_page(location.name, seed=(n * 24 + hour), start_hour=hour).encode('utf-8')
+                for minute in range(0, 60, 10):
+                    fetched_at = london_tz.localize(datetime(day.year, day.month, day.day, hour, minute, 5))
+                    archive.add(forecast_url(location), page, fetched_at)
+                    fetches += 1
+    return fetches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--locations', type=int, default=2)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    locations = [Location(str(2643743 + i), f'2/{113 + i}', f'Place {i}') for i in range(args.locations)]
+    with tempfile.TemporaryDirectory() as root:
+        started = time.perf_counter()
+        fetches = fill(root, locations, args.days)
+        print(f"archived {fetches} fetches in {time.perf_counter() - started:.1f}s")
+
+        for workers in args.workers:
+            rows = []
+            started = time.perf_counter()
+            count, pages, failures = reextract(root, locations, lambda location, row: rows.append(row),
+                                               workers=workers)
+            elapsed = time.perf_counter() - started
+            with_tides = sum(row.high_tide_morning_time is not None for row in rows)
+            print(f"{workers} worker(s): {count} rows from {pages} distinct pages in {elapsed:.1f}s "
+                  f"({count / elapsed:.0f} rows/s), {with_tides} with tides, {failures} failed")
+
+
+if __name__ == '__main__':
+    main()
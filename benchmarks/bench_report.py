@@ -0,0 +1,66 @@
+"""Measures report.py's build time and page size against the length of the history.
+
+Usage: python benchmarks/bench_report.py [--days 30 180 365]
+
+For every length a noisy synthetic log is imported into a Parquet archive
+and the report is built three times: cold (empty cache), warm (nothing
+changed) and after one more day of observations has been archived.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from archive import ParquetArchive, compact, import_csv
+from check_aggregates import noisy_row, write_log
+from observation import Observation
+from report import CHARTS, archive_partitions, build_report
+
+
+def timed_build(root, out_path, cache_dir):
+    started = time.perf_counter()
+    computed, drawn = build_report(archive_partitions(root), out_path, cache_dir)
+    return time.perf_counter() - started, computed, drawn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 180, 365])
+    args = parser.parse_args()
+
+    print(f"{'days':>5} {'cold':>14} {'warm':>14} {'+1 day':>14} {'page':>8}")
+    for days in args.days:
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'bbc_weather.csv')
+            root = os.path.join(directory, 'archive')
+            out_path = os.path.join(directory, 'report.html')
+            cache_dir = os.path.join(directory, 'cache')
+            write_log(log_path, days)
+            import_csv(log_path, root)
+            compact(root)
+
+            cold = timed_build(root, out_path, cache_dir)
+            warm = timed_build(root, out_path, cache_dir)
+            rng = random.Random(days)
+            archive = ParquetArchive(root)
+            start = datetime(2024, 10, 20) + timedelta(days=days)
+            archive.extend([Observation.from_row(noisy_row(rng, start + timedelta(minutes=10 * i)))
+                            for i in range(144)])
+            archive.close()
+            added = timed_build(root, out_path, cache_dir)
+
+            def cell(result):
+                elapsed, computed, drawn = result
+                return f"{elapsed * 1e3:6.0f}ms {computed:3d}/{drawn}"
+            print(f"{days:5d} {cell(cold):>14} {cell(warm):>14} {cell(added):>14} "
+                  f"{os.path.getsize(out_path) / 1024:6.0f}KB")
+    print(f"(ms, then day partitions summarized / charts drawn out of {len(CHARTS)})")
+
+
+if __name__ == '__main__':
+    main()
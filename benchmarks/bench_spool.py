@@ -0,0 +1,124 @@
+"""Measures scrape-side latency with the spool in front of slow sinks, and checks crash safety.
+
+Usage: python benchmarks/bench_spool.py [--rows 200]
+
+Puts --rows observations through spool.Uploader into sinks that take 0 s,
+0.2 s and 2 s per batch (and one that fails for a while), and reports
+the put() latency the scrape loop sees. Then a child process is killed
+partway through, restarted on the same spool, and the CSV sink is checked
+to hold every row.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_append import make_row
+from observation import Observation
+from spool import Spool, Uploader
+from storage import AppendOnlyCSVStore
+
+
+def slow_sink(seconds, received):
+    def write(observations):
+        time.sleep(seconds)
+        received.extend(observations)
+    return write
+
+
+def flaky_sink(failures, received):
+    calls = [0]
+
+    def write(observations):
+        calls[0] += 1
+        if calls[0] <= failures:
+            raise ConnectionError('remote unavailable')
+        received.extend(observations)
+    return write
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def latency(directory, rows):
+    received = {name: [] for name in ('fast', 'slow', 'stalled', 'flaky')}
+    sinks = {'fast': slow_sink(0, received['fast']), 'slow': slow_sink(0.2, received['slow']),
+             'stalled': slow_sink(2, received['stalled']), 'flaky': flaky_sink(3, received['flaky'])}
+    spool = Spool(os.path.join(directory, 'latency.sqlite'))
+    uploader = Uploader(spool, sinks, batch_size=50, retry_delay=0.1).start()
+    observations = [Observation.from_row(make_row(i)) for i in range(rows)]
+    times = []
+    for i, observation in enumerate(observations):
+        started = time.perf_counter()
+        uploader.put(observation)
+        times.append(time.perf_counter() - started)
+        if i < 5:
+            # A trickle first, so the fast sink drains the spool empty in between.
+            time.sleep(0.05)
+    print(f"put() with sinks of 0 s, 0.2 s, 2 s per batch and one failing: "
+          f"p50 {percentile(times, 50) * 1e3:.2f} ms, p99 {percentile(times, 99) * 1e3:.2f} ms, "
+          f"max {max(times) * 1e3:.2f} ms")
+    print(f"waiting right after the last put: {uploader.pending()}")
+    uploader.stop(timeout=30)
+    print(f"after stop(): {spool.pending()}, received {({name: len(got) for name, got in received.items()})}")
+    return all(len(received[name]) == rows for name in ('fast', 'slow', 'stalled'))
+
+
+CHILD = """
+import os, sys, time
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+from bench_append import make_row
+from observation import Observation
+from spool import Spool, Uploader
+from storage import AppendOnlyCSVStore
+store = AppendOnlyCSVStore({csv!r})
+def write(observations):
+    time.sleep(0.01)
+    store.extend(observations)
+uploader = Uploader(Spool({spool!r}), {{'csv': write}}, batch_size=7).start()
+for i in range({start}, {end}):
+    uploader.put(Observation.from_row(make_row(i)))
+    if i == {crash_at}:
+        os._exit(1)   # no stop(), no flush: as if the process were killed
+uploader.stop()
+"""
+
+
+def crash(directory, rows):
+    csv_path = os.path.join(directory, 'crash.csv')
+    spool_path = os.path.join(directory, 'crash.sqlite')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    settings = dict(root=os.path.dirname(benchmarks), benchmarks=benchmarks, csv=csv_path, spool=spool_path)
+    subprocess.run([sys.executable, '-c', CHILD.format(start=0, end=rows, crash_at=rows // 2, **settings)])
+    written = sum(1 for _ in open(csv_path)) - 1 if os.path.exists(csv_path) else 0
+    print(f"killed after put #{rows // 2}: {written} row(s) had reached the CSV, "
+          f"{Spool(spool_path).pending()} waiting in the spool")
+    subprocess.run([sys.executable, '-c', CHILD.format(start=rows // 2 + 1, end=rows, crash_at=-1, **settings)],
+                   check=True)
+    store = AppendOnlyCSVStore(csv_path)
+    times = [row['Time of Search'] for row in store.read().to_dict('records')]
+    expected = [make_row(i)['Time of Search'] for i in range(rows)]
+    missing = sorted(set(expected) - set(times))
+    print(f"after restart: {len(times)} rows in the CSV, {len(missing)} missing, "
+          f"{len(times) - len(set(times))} delivered twice")
+    return not missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        delivered = latency(directory, args.rows)
+        if not crash(directory, args.rows) or not delivered:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
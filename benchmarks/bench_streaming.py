@@ -0,0 +1,137 @@
+"""Compares parsing whole pages into a DOM with streaming them through the pruning parser.
+
+Usage: python benchmarks/bench_streaming.py [--locations 32] [--rate 1000000]
+
+Three measurements on the stand-in pages (pages.py):
+  * CPU time per page, parsing from memory, and how much of it is read;
+  * peak heap (glibc's mallinfo2, which sees libxml2's allocations) with
+    --locations forecast pages being parsed at the same time, as in the crawler;
+  * time to row from the stand-in server sending at --rate bytes/s.
+Both paths must extract the same fields.
+"""
+import argparse
+import ctypes
+import gc
+import os
+import sys
+import time
+
+import requests
+from lxml import html
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extraction import extract_all_tides, extract_forecast, extract_forecast_page
+from fetch import STREAM_CHUNK_SIZE, PruningParser, fetch_and_parse, parse_and_extract, stream_and_extract
+from pages import render_forecast_page, render_tide_page
+from standin import StandInServer
+
+
+class BufferedResponse:
+    """Enough of a requests.Response to stream a body from memory, counting what is read."""
+
+    def __init__(self, content):
+        self.content = content
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            self.read += len(chunk)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+def best_of(function, repeat=30):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e3, result
+
+
+class _MallInfo2(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in
+                ['arena', 'ordblks', 'smblks', 'hblks', 'hblkhd', 'usmblks', 'fsmblks', 'uordblks', 'fordblks',
+                 'keepcost']]
+
+
+def heap_in_use():
+    """Bytes malloc has handed out, libxml2's trees included (glibc 2.33+)."""
+    mallinfo2 = ctypes.CDLL(None).mallinfo2
+    mallinfo2.restype = _MallInfo2
+    info = mallinfo2()
+    return info.uordblks + info.hblkhd
+
+
+def in_flight_memory(page, locations, stream):
+    """Returns the peak heap growth, in bytes, while locations copies of page are parsed at once.
+
+    The whole-DOM path holds every body and then every tree; the streamed
+    path feeds the parsers a chunk each in turn, as if the downloads were
+    arriving side by side, and keeps what each has parsed until all are done.
+    """
+    gc.collect()
+    before = heap_in_use()
+    if not stream:
+        bodies = [bytes(bytearray(page)) for _ in range(locations)]
+        trees = [html.fromstring(body) for body in bodies]
+        peak = heap_in_use() - before
+        del bodies, trees
+        return peak
+    parsers = [PruningParser(extract_forecast_page) for _ in range(locations)]
+    peak = 0
+    for start in range(0, len(page), STREAM_CHUNK_SIZE):
+        waiting = [parser for parser in parsers if not parser.done]
+        if not waiting:
+            break
+        for parser in waiting:
+            parser.feed(page[start:start + STREAM_CHUNK_SIZE])
+        peak = max(peak, heap_in_use() - before)
+    for parser in parsers:
+        parser.close()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=32, help='pages parsed at the same time')
+    parser.add_argument('--rate', type=float, default=1e6, help='bytes/s the stand-in sends at')
+    args = parser.parse_args()
+
+    forecast = render_forecast_page().encode('utf-8')
+    tide = render_tide_page().encode('utf-8')
+    print(f"parse from memory (chunks of {STREAM_CHUNK_SIZE // 1024} KB):")
+    for name, content, extract in [('forecast', forecast, extract_forecast),
+                                   ('forecast page', forecast, extract_forecast_page),
+                                   ('tides', tide, extract_all_tides)]:
+        whole, expected = best_of(lambda: parse_and_extract(content, extract))
+        response = BufferedResponse(content)
+        streamed, (_, result) = best_of(lambda: stream_and_extract(BufferedResponse(content), extract))
+        stream_and_extract(response, extract)
+        print(f"  {name:13} whole DOM {whole:6.2f} ms, streamed {streamed:6.2f} ms, "
+              f"read {response.read / 1024:.0f} of {len(content) / 1024:.0f} KB"
+              + ('' if result == expected else '  RESULTS DIFFER'))
+
+    for locations in (1, args.locations):
+        whole = in_flight_memory(forecast, locations, stream=False)
+        streamed = in_flight_memory(forecast, locations, stream=True)
+        print(f"peak heap, {locations:3d} forecast page(s) in flight: whole DOM {whole / 2**20:6.2f} MB, "
+              f"streamed {streamed / 2**20:6.2f} MB")
+
+    session = requests.Session()
+    with StandInServer(rate=args.rate) as server:
+        for name, url, extract in [('forecast', server.forecast_url(), extract_forecast),
+                                   ('tides', server.tide_url(), extract_all_tides)]:
+            whole, expected = best_of(lambda: fetch_and_parse(session, url, extract), repeat=5)
+            streamed, result = best_of(lambda: fetch_and_parse(session, url, extract, stream=True), repeat=5)
+            print(f"time to row at {args.rate / 1e6:g} MB/s, {name}: whole page {whole:6.1f} ms, "
+                  f"streamed {streamed:6.1f} ms" + ('' if result == expected else '  RESULTS DIFFER'))
+
+
+if __name__ == '__main__':
+    main()
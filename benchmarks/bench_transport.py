@@ -0,0 +1,81 @@
+"""Checks transport.Transport against the stand-in: connection reuse, compression and retries.
+
+Usage: python benchmarks/bench_transport.py [--runs 20]
+
+  * --runs scrapes with a new requests.Session each run (as test.py used to)
+    and with one Transport kept across runs, counting the TCP connections
+    the stand-in accepted;
+  * the forecast and tide pages fetched uncompressed and with the
+    Transport's Accept-Encoding, in bytes on the wire;
+  * a page whose first two answers are 503s, with and without Retry-After.
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extraction import extract_forecast
+from fetch import stream_and_extract
+from scraper import get_weather_data
+from standin import StandInServer
+from transport import Transport
+
+
+def scrape_runs(server, runs, new_session):
+    transport = Transport()
+    started = time.perf_counter()
+    for _ in range(runs):
+        session = requests.Session() if new_session else transport
+        get_weather_data(session, forecast_url=server.forecast_url(), tide_url=server.tide_url())
+    return (time.perf_counter() - started) / runs * 1e3, transport
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.runs} runs of get_weather_data (forecast and tide page each):")
+    for name, new_session in [('new Session per run', True), ('one Transport', False)]:
+        with StandInServer(compress=True) as server:
+            per_run, transport = scrape_runs(server, args.runs, new_session)
+            print(f"  {name:20} {server.connections:3d} connections for {server.requests} requests, "
+                  f"{per_run:5.1f} ms/run")
+    print(f"  Transport stats: {transport.stats()}")
+
+    print(f"bytes on the wire (Transport sends Accept-Encoding: {Transport().headers['Accept-Encoding']}):")
+    with StandInServer(compress=True) as server:
+        for name, url in [('forecast', server.forecast_url()), ('tides', server.tide_url())]:
+            plain = Transport()
+            plain.get(url, headers={'Accept-Encoding': 'identity'})
+            transport = Transport()
+            response = transport.get(url)
+            wire = transport.stats()['wire_bytes']
+            print(f"  {name:8} identity {plain.stats()['wire_bytes'] / 1024:6.1f} KB, "
+                  f"{response.headers.get('Content-Encoding')} {wire / 1024:6.1f} KB "
+                  f"({1 - wire / len(response.content):.0%} saved)")
+        transport = Transport()
+        stream_and_extract(transport.get(server.forecast_url(), stream=True), extract_forecast)
+        stats = transport.stats()
+        print(f"  forecast, streamed until the last field: {stats['wire_bytes'] / 1024:.1f} KB on the wire, "
+              f"{stats['body_bytes'] / 1024:.1f} KB decoded")
+
+    print("first two answers 503:")
+    for retry_after in (None, 1):
+        with StandInServer(busy=2, retry_after=retry_after) as server:
+            status = requests.get(server.forecast_url(), timeout=5).status_code
+        with StandInServer(busy=2, retry_after=retry_after) as server:
+            transport = Transport()
+            started = time.perf_counter()
+            response = transport.get(server.forecast_url())
+            elapsed = time.perf_counter() - started
+        print(f"  Retry-After {retry_after}: requests.Session gets {status}, Transport gets "
+              f"{response.status_code} after {transport.stats()['retries']} retries in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Checks incrementally maintained aggregates against a rebuild from scratch.
+
+Usage: python benchmarks/check_aggregates.py [--days 60]
+
+Writes a noisy synthetic log (missing values, repeated times, the clock
+changes), feeds half of it to Aggregates, saves, reloads and feeds the
+rest, then compares with aggregates.rebuild() over the whole log. Also
+times the updates, the rebuild and a daily summary read from the saved file.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aggregates import Aggregates, compare, rebuild
+from bench_append import COLUMNS
+from history import load_history
+from observation import read_csv_observations
+
+CONDITIONS = ['Sunny', 'Light cloud', 'Thick cloud', 'Light rain showers', 'Drizzle', 'N/A']
+
+
+def noisy_row(rng, when):
+    def number(low, high, missing=0.05):
+        return 'N/A' if rng.random() < missing else f'{rng.uniform(low, high):.1f}'
+
+    tides = {}
+    for name in ('Low Tide Morning', 'High Tide Morning', 'Low Tide Evening', 'High Tide Evening'):
+        tides[f'{name} Time'] = f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}'
+        tides[f'{name} Height(M)'] = number(0, 7, 0.1)
+    return {
+        'Time of Search': when.strftime('%Y-%m-%d %H:%M'),
+        'High Temperature(°C)': number(10, 30),
+        'Low Temperature(°C)': number(0, 15),
+        'Current Temperature(°C)': number(0, 30),
+        'Weather Condition': rng.choice(CONDITIONS),
+        'Wind Speed(mph)': number(0, 40),
+        'Humidity(%)': number(30, 100),
+        'Pressure(mb)': f'{rng.randint(960, 1050)} mb',
+        'Visibility': 'Good', 'Location': 'London', 'Wind Direction': 'Westerly',
+        'UV Index': 'Low', 'Pollen': 'Low', 'Pollution': 'Low',
+        'Chance of Precipitation(%)': number(0, 100),
+        'Sunset': '20:00', 'Sunrise': '06:00',
+        **tides,
+    }
+
+
+def write_log(path, days, seed=0):
+    rng = random.Random(seed)
+    # Starts before the clocks go back, so 01:00-01:59 appears twice.
+    when = datetime(2024, 10, 20)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        for _ in range(days * 144):
+            row = noisy_row(rng, when)
+            writer.writerow(row)
+            if rng.random() < 0.01:
+                writer.writerow(row)
+            when += timedelta(minutes=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, 'bbc_weather.csv')
+        state_path = os.path.join(directory, 'aggregates.json')
+        write_log(log_path, args.days)
+        observations = list(read_csv_observations(log_path))
+
+        half = len(observations) // 2
+        started = time.perf_counter()
+        first = Aggregates(state_path)
+        for observation in observations[:half]:
+            first.add(observation)
+        first.save()
+        second = Aggregates(state_path)
+        for observation in observations[half:]:
+            second.add(observation)
+        second.save()
+        incremental = (time.perf_counter() - started) / len(observations)
+
+        table = load_history(log_path, use_cache=False)
+        started = time.perf_counter()
+        rebuilt = rebuild(table)
+        rebuild_time = time.perf_counter() - started
+
+        differences = compare(second, rebuilt, rel_tol=1e-7)
+        for difference in differences[:20]:
+            print(difference)
+        print(f"{len(observations)} observations, {len(rebuilt.daily)} days: "
+              f"{'incremental matches rebuild' if not differences else f'{len(differences)} difference(s)'}")
+        print(f"incremental update: {incremental * 1e6:.0f} us/observation; rebuild: {rebuild_time * 1e3:.0f} ms")
+
+        started = time.perf_counter()
+        reloaded = Aggregates(state_path)
+        summary = reloaded.daily_summary('tide_height')
+        print(f"daily tide range from saved aggregates: {(time.perf_counter() - started) * 1e3:.1f} ms "
+              f"({os.path.getsize(state_path) / 1024:.0f} KB, {len(summary)} days)")
+        if differences:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Checks SheetSink's batching against a fake worksheet, without gspread or a network.
+
+Usage: python benchmarks/check_sheets.py
+
+FakeWorksheet records every append_rows call and can be told to fail the
+next few. Checked: rows go out once batch_size are waiting; once the
+oldest has waited max_delay (on a fake clock); a failed send keeps the
+rows buffered and sends each of them once when it succeeds; extend()
+sends straight away, bypassing the buffer; close() sends what is left.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from observation import Observation
+from sheets import SheetSink
+
+
+class FakeWorksheet:
+    """Enough of a gspread Worksheet for SheetSink: append_rows, recorded."""
+
+    def __init__(self):
+        self.calls = []
+        self.failures = 0
+
+    def append_rows(self, rows, value_input_option=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('quota exceeded')
+        self.calls.append([list(row) for row in rows])
+
+    @property
+    def rows(self):
+        return [row for call in self.calls for row in call]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def observations(count, start=datetime(2024, 7, 1, 9, 0)):
+    return [Observation.from_row({'Time of Search': (start + timedelta(minutes=30 * i)).strftime('%Y-%m-%d %H:%M'),
+                                  'Current Temperature(°C)': 15.0 + i})
+            for i in range(count)]
+
+
+def check_size_threshold():
+    worksheet = FakeWorksheet()
+    sink = SheetSink(worksheet, batch_size=3, max_delay=3600, clock=FakeClock())
+    sent = [sink.append(observation) for observation in observations(7)]
+    assert sent == [False, False, True, False, False, True, False], sent
+    assert [len(call) for call in worksheet.calls] == [3, 3], worksheet.calls
+    sink.close()
+    assert [len(call) for call in worksheet.calls] == [3, 3, 1], worksheet.calls
+
+
+def check_time_threshold():
+    worksheet = FakeWorksheet()
+    clock = FakeClock()
+    sink = SheetSink(worksheet, batch_size=6, max_delay=3600, clock=clock)
+    rows = observations(3)
+    assert not sink.append(rows[0])
+    clock.now = 1800
+    assert not sink.append(rows[1])
+    # The oldest row has now waited max_delay.
+    clock.now = 3600
+    assert sink.append(rows[2])
+    assert [len(call) for call in worksheet.calls] == [3], worksheet.calls
+    # The clock starts again from the next row queued, not the last send.
+    clock.now = 7000
+    assert not sink.append(observations(1)[0])
+
+
+def check_failed_send():
+    worksheet = FakeWorksheet()
+    sink = SheetSink(worksheet, batch_size=2, max_delay=3600, clock=FakeClock())
+    rows = observations(4)
+    worksheet.failures = 2
+    assert not sink.append(rows[0])
+    assert not sink.append(rows[1])  # first failure: both rows stay buffered
+    assert not sink.append(rows[2])  # second failure
+    assert len(sink.pending) == 3 and not worksheet.calls
+    assert sink.append(rows[3])
+    times = [row[0] for row in worksheet.rows]
+    assert times == [row.to_sheet_row()[0] for row in rows], times
+    assert not sink.pending
+
+
+def check_extend_bypasses_buffer():
+    worksheet = FakeWorksheet()
+    sink = SheetSink(worksheet, batch_size=6, max_delay=3600, clock=FakeClock())
+    sink.append(observations(1)[0])
+    sink.extend(observations(2, start=datetime(2024, 7, 2)))
+    assert [len(call) for call in worksheet.calls] == [2], worksheet.calls
+    assert len(sink.pending) == 1
+    worksheet.failures = 1
+    try:
+        sink.extend(observations(1))
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError('extend() should raise when append_rows fails')
+    assert len(worksheet.calls) == 1 and len(sink.pending) == 1
+
+
+def main():
+    failed = 0
+    for check in (check_size_threshold, check_time_threshold, check_failed_send, check_extend_bypasses_buffer):
+        try:
+            check()
+            print(f"{check.__name__}: ok")
+        except AssertionError as e:
+            failed += 1
+            print(f"{check.__name__}: FAILED {e}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""End-to-end load test: the crawler against a templated stand-in, storing to local files.
+
+Usage: python benchmarks/load_test.py [--locations 2000] [--cycles 2] [--workers 32]
+           [--delay 0.05] [--delay-jitter 0.1] [--error-rate 0.01] [--drift-rate 0.02]
+           [--tide-share 0.5] [--backend append|delta] [--stream]
+           [--out load_test.json] [--compare EARLIER.json]
+
+The stand-in (standin.TemplatedStandIn) runs in a process of its own and
+serves a different page for every synthetic location ID, with the given
+latency, share of 503s and share of locations whose markup has drifted. The
+crawler fetches, parses and stores each row in <geo_id>.csv under a
+temporary directory, as crawler.py does. Reported per run: rows/sec,
+latency percentiles for every stage metrics.timed() records, the share of
+fields that came back missing, and peak RSS. --out saves the results as
+JSON, and --compare prints the change from an earlier results file.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import metrics
+from crawler import Crawler, format_report, percentile
+from extraction import TIDE_FIELDS
+from locations import Location
+from schema import COLUMNS, is_missing
+from scraper import current_time_of_search
+from standin import FORECAST_PREFIX, TIDE_PREFIX, TemplatedStandIn
+from storage import open_store
+from tides import TideCache
+
+TIDE_COLUMNS = {field.name for field in TIDE_FIELDS}
+
+
+class SampleRegistry(metrics.Registry):
+    """A metrics registry that also keeps every stage duration, for percentiles."""
+
+    def __init__(self):
+        super().__init__()
+        self.samples = {}
+
+    def observe(self, stage, seconds, labels=()):
+        super().observe(stage, seconds, labels)
+        name = stage + ''.join(f'.{value}' for _, value in labels)
+        self.samples.setdefault(name, []).append(seconds)
+
+
+def serve(options, ready, stop):
+    """Runs the stand-in in its own process until stop is set."""
+    with TemplatedStandIn(**options) as server:
+        ready.put(server.base_url)
+        stop.wait()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, base_url, directory):
+    locations = [Location(str(1000000 + i), f'2/{i}' if i % 100 < args.tide_share * 100 else None)
+                 for i in range(args.locations)]
+    options = {'index': True} if args.backend == 'append' else {}
+    stores = {location.geo_id: open_store(os.path.join(directory, f'{location.geo_id}.csv'), args.backend, **options)
+              for location in locations}
+
+    missing = Counter()
+    fields = [0]
+    lock = threading.Lock()
+
+    def save(location, row):
+        with metrics.timed('store_write'):
+            stores[location.geo_id].append(row)
+        # Tide columns only count where the location has a tide station.
+        columns = [column.name for column in COLUMNS if location.tide_station or column.name not in TIDE_COLUMNS]
+        with lock:
+            fields[0] += len(columns)
+            missing.update(name for name in columns if is_missing(row[name]))
+
+    registry = SampleRegistry()
+    metrics.enable(registry)
+    crawler = Crawler(locations, workers=args.workers, per_host_interval=0, jitter=0,
+                      forecast_template=base_url + FORECAST_PREFIX + '{geo_id}',
+                      tide_template=base_url + TIDE_PREFIX + '{station}',
+                      tide_cache=TideCache(os.path.join(directory, 'tide_cache.json')), stream=args.stream)
+    setup_rss = peak_rss_mb()
+
+    cycles = []
+    for cycle in range(args.cycles):
+        before = sum(missing.values())
+        results, report = crawler.run_cycle(current_time_of_search(), on_row=save)
+        errors = Counter(type(result).__name__ for result in results.values() if isinstance(result, Exception))
+        cycles.append(dict(report._asdict(), missing_fields=sum(missing.values()) - before, errors=dict(errors)))
+        print(f"cycle {cycle + 1}: {format_report(report)}, {cycles[-1]['missing_fields']} missing field(s)"
+              + (f", errors {dict(errors)}" if errors else ''))
+    metrics.disable()
+
+    rows = sum(cycle['succeeded'] for cycle in cycles)
+    elapsed = sum(cycle['elapsed'] for cycle in cycles)
+    stages = {name: {'count': len(samples),
+                     **{f'p{q}_ms': round(percentile(samples, q) * 1e3, 3) for q in (50, 90, 99)},
+                     'max_ms': round(max(samples) * 1e3, 3)}
+              for name, samples in sorted(registry.samples.items())}
+    return {
+        'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'options': {name: value for name, value in vars(args).items() if name not in ('out', 'compare')},
+        'cycles': cycles,
+        'rows_per_second': rows / elapsed if elapsed else None,
+        'missing_field_share': sum(missing.values()) / fields[0] if fields[0] else None,
+        'missing_fields': dict(missing.most_common()),
+        'stages': stages,
+        'setup_rss_mb': round(setup_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def print_results(results):
+    print(f"{results['rows_per_second']:.1f} rows/s, missing fields {results['missing_field_share']:.2%}, "
+          f"peak RSS {results['peak_rss_mb']:.0f} MB (after setup {results['setup_rss_mb']:.0f} MB)")
+    most = list(results['missing_fields'].items())[:5]
+    if most:
+        print("most often missing: " + ', '.join(f"{name} {count}" for name, count in most))
+    print(f"{'stage':28} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stage in results['stages'].items():
+        print(f"{name:28} {stage['count']:7d} {stage['p50_ms']:9.2f} {stage['p90_ms']:9.2f} "
+              f"{stage['p99_ms']:9.2f} {stage['max_ms']:9.2f}")
+
+
+def compare(earlier, results):
+    """Prints how the headline numbers and stage percentiles moved since an earlier run."""
+    def change(old, new):
+        if old is None or new is None:
+            return f"{new}"
+        return f"{old:.2f} -> {new:.2f} ({(new - old) / old:+.0%})" if old else f"{old} -> {new:.2f}"
+
+    print(f"compared with {earlier.get('commit')} ({earlier.get('started')}):")
+    differing = {name: (earlier['options'].get(name), value) for name, value in results['options'].items()
+                 if earlier['options'].get(name) != value}
+    if differing:
+        print(f"  options differ: {differing}")
+    print(f"  rows/s       {change(earlier['rows_per_second'], results['rows_per_second'])}")
+    print(f"  peak RSS MB  {change(earlier['peak_rss_mb'], results['peak_rss_mb'])}")
+    for name, stage in results['stages'].items():
+        old = earlier['stages'].get(name)
+        if old:
+            print(f"  {name:26} p50 {change(old['p50_ms'], stage['p50_ms'])}, "
+                  f"p99 {change(old['p99_ms'], stage['p99_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--locations', type=int, default=2000)
+    parser.add_argument('--cycles', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds the stand-in waits per page')
+    parser.add_argument('--delay-jitter', type=float, default=0.1, help='up to this much more, at random')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='share of requests answered with a 503')
+    parser.add_argument('--drift-rate', type=float, default=0.02, help='share of locations with drifted markup')
+    parser.add_argument('--tide-share', type=float, default=0.5, help='share of locations with a tide station')
+    parser.add_argument('--backend', choices=['append', 'delta'], default='append')
+    parser.add_argument('--stream', action='store_true', help='parse pages as they download')
+    parser.add_argument('--out', help='save the results here as JSON')
+    parser.add_argument('--compare', help='an earlier --out file to compare with')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    ready, stop = context.Queue(), context.Event()
+    options = {'delay': args.delay, 'delay_jitter': args.delay_jitter, 'error_rate': args.error_rate,
+               'drift_rate': args.drift_rate}
+    server = context.Process(target=serve, args=(options, ready, stop), daemon=True)
+    server.start()
+    try:
+        base_url = ready.get(timeout=60)
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            results = run(args, base_url, directory)
+            print(f"{args.locations} locations x {args.cycles} cycle(s) in {time.perf_counter() - started:.1f}s")
+    finally:
+        stop.set()
+        server.join(10)
+
+    print_results(results)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved to {args.out}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
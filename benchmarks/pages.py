@@ -0,0 +1,141 @@
+"""Builds stand-in BBC forecast and tide pages for benchmarks.
+
+The pages have the same element paths the scraper reads, so every field
+resolves, plus enough filler markup to be roughly the size of the real
+pages. Run it directly to write a forecast/tide pair into a directory:
+
+    python benchmarks/pages.py benchmarks/fixtures
+"""
+import os
+import random
+import re
+import sys
+from datetime import date, timedelta
+
+from lxml import etree
+
+CONDITIONS = ['Sunny', 'Light cloud', 'Thick cloud', 'Light rain showers', 'Drizzle', 'Clear sky']
+VISIBILITY = ['Good', 'Very Good', 'Moderate', 'Poor']
+DIRECTIONS = ['Northerly', 'North Easterly', 'Easterly', 'South Easterly',
+              'Southerly', 'South Westerly', 'Westerly', 'North Westerly']
+LEVELS = ['L', 'M', 'H']
+
+_STEP = re.compile(r'(\w+)(?:\[(\d+)\])?')
+
+
+def ensure_path(node, path, text=None):
+    """Walks a relative XPath-like path from node, creating elements as needed."""
+    for step in path.split('/'):
+        tag, index = _STEP.fullmatch(step).groups()
+        index = int(index or 1)
+        children = [child for child in node if child.tag == tag]
+        while len(children) < index:
+            children.append(etree.SubElement(node, tag))
+        node = children[index - 1]
+    if text is not None:
+        node.text = text
+    return node
+
+
+def _filler(parent, rng, blocks):
+    """Adds navigation-like filler so the page is a realistic size."""
+    for i in range(blocks):
+        block = etree.SubElement(parent, 'div', {'class': f'wr-filler-{i % 17}'})
+        for j in range(8):
+            link = etree.SubElement(block, 'a', {'href': f'/weather/{rng.randint(1000000, 9999999)}'})
+            link.text = f'Related place {i}-{j}'
+
+
+# Markup changes the scraper should notice: 'id' renames an anchor element,
+# 'path' wraps part of the page in an extra element so relative paths miss.
+DRIFTS = ('id', 'path')
+
+
+def render_forecast_page(location='London', seed=0, hours=24, days=14, start_hour=0, filler=300, drift=None):
+    """Returns the HTML of a forecast page with hourly slots and day links.
+
+    drift ('id' or 'path', see DRIFTS) changes the markup the way a site
+    redesign might, so some fields can no longer be found.
+    """
+    rng = random.Random(seed)
+    root = etree.Element('html')
+    head = etree.SubElement(root, 'head')
+    etree.SubElement(head, 'meta', {'charset': 'utf-8'})
+    etree.SubElement(head, 'title').text = f'{location} - BBC Weather'
+    script = etree.SubElement(head, 'script')
+    script.text = 'window.__data = ' + repr([rng.random() for _ in range(4000)]) + ';'
+    body = etree.SubElement(root, 'body')
+    etree.SubElement(body, 'h1', {'id': 'wr-location-name-id'}).text = location
+
+    forecast = etree.SubElement(body, 'div', {'id': 'wr-forecast'})
+    days_nav = ensure_path(forecast, 'div[3]')
+    for n in range(days):
+        daylink = etree.SubElement(days_nav, 'a', {'id': f'daylink-{n}'})
+        high = rng.randint(12, 28)
+        temps = ensure_path(daylink, 'div[4]/div[1]/div/div[4]/div')
+        ensure_path(temps, 'div[1]/span[2]/span/span[1]', f'{high}°')
+        ensure_path(temps, 'div[2]/span[2]/span/span[1]', f'{high - rng.randint(4, 10)}°')
+
+    panel = ensure_path(forecast, 'div[4]/div/div[1]')
+    slots = ensure_path(panel, 'div[2]/div/div/div/div[2]/ol')
+    for h in range(hours):
+        button = ensure_path(slots, f'li[{h + 1}]/button')
+        ensure_path(button, 'div[1]/div[1]/span[1]', f'{(start_hour + h) % 24:02d}:00')
+        ensure_path(button, 'div[1]/div[2]/div[3]/div[2]/div/div/div[2]/span/span[1]', f'{rng.randint(8, 26)}°')
+        ensure_path(button, 'div[1]/div[2]/div[3]/div[3]/div[2]', f'{rng.randint(0, 100)}%')
+        ensure_path(button, 'div[1]/div[2]/div[3]/div[4]/div/span[3]/span/span[1]', str(rng.randint(1, 30)))
+        ensure_path(button, 'div[2]/div/span', rng.choice(CONDITIONS))
+        dl = ensure_path(button, 'div[2]/div/div/div[1]/dl')
+        ensure_path(dl, 'dd[1]', f'{rng.randint(40, 99)}%')
+        ensure_path(dl, 'dd[2]', f'{rng.randint(980, 1040)} mb')
+        ensure_path(dl, 'dd[3]', rng.choice(VISIBILITY))
+        ensure_path(button, 'div[2]/div/div/div[4]', rng.choice(DIRECTIONS))
+
+    details = ensure_path(panel, 'div[4]/div/div[1]')
+    ensure_path(details, 'div[1]/span[1]/span[2]', f'04:{rng.randint(30, 59):02d}')
+    ensure_path(details, 'div[1]/span[2]/span[2]', f'21:{rng.randint(0, 29):02d}')
+    for i in range(1, 4):
+        ensure_path(details, f'div[2]/span[{i}]/span[1]/span[2]', rng.choice(LEVELS))
+
+    if drift == 'id':
+        forecast.set('id', 'wr-forecast-v2')
+    elif drift == 'path':
+        wrapper = etree.Element('div', {'class': 'wr-hourly'})
+        slots.addprevious(wrapper)
+        wrapper.append(slots)
+    _filler(body, rng, filler)
+    return '<!DOCTYPE html>' + etree.tostring(root, method='html', encoding='unicode')
+
+
+def render_tide_page(first_date=None, days=7, seed=0, filler=100, drift=None):
+    """Returns the HTML of a tide table page with one section per day (drift as for forecast pages)."""
+    rng = random.Random(seed)
+    first_date = first_date or date.today()
+    root = etree.Element('html')
+    etree.SubElement(etree.SubElement(root, 'head'), 'meta', {'charset': 'utf-8'})
+    body = etree.SubElement(root, 'body')
+    for n in range(days):
+        day = first_date + timedelta(days=n)
+        section = etree.SubElement(body, 'section', {'id': f'section-{day:%Y-%m-%d}'})
+        if drift == 'id':
+            section.set('id', f'tides-{day:%Y-%m-%d}')
+        tbody = ensure_path(section if drift != 'path' else etree.SubElement(section, 'div'), 'table/tbody')
+        for row, base_hour in enumerate([3, 9, 15, 21], start=1):
+            height = rng.uniform(0.3, 1.2) if row % 2 else rng.uniform(5.5, 7.2)
+            ensure_path(tbody, f'tr[{row}]/td[1]/span', f'{base_hour:02d}:{rng.randint(0, 59):02d}')
+            ensure_path(tbody, f'tr[{row}]/td[2]', f'{height:.2f}')
+    _filler(body, rng, filler)
+    return '<!DOCTYPE html>' + etree.tostring(root, method='html', encoding='unicode')
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else 'fixtures'
+    os.makedirs(out_dir, exist_ok=True)
+    for name, page in [('forecast.html', render_forecast_page()), ('tide.html', render_tide_page())]:
+        with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+            f.write(page)
+        print(f"Wrote {name} ({len(page) / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Runs the Scheduler against a simulated clock and checks the slots it fires on.
+
+Usage: python benchmarks/sim_scheduler.py
+
+Nothing really sleeps, so a day of 10-minute slots takes a fraction of a second.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scheduler import Scheduler, SimulatedClock
+from schema import london_tz
+
+INTERVAL = 600
+
+
+def london(*args):
+    return london_tz.localize(datetime(*args))
+
+
+def run(start, job, runs, **kwargs):
+    """Runs job on a simulated clock; job gets (clock, slot). Returns (slots, scheduler)."""
+    clock = SimulatedClock(start)
+    slots = []
+
+    def tick(slot):
+        job(clock, slot)
+        slots.append(clock.now())
+
+    scheduler = Scheduler(tick, INTERVAL, clock=clock, retry_delay=15, **kwargs)
+    scheduler.run(max_runs=runs)
+    return slots, scheduler
+
+
+def check(name, condition):
+    print(f"{'ok  ' if condition else 'FAIL'} {name}")
+    return condition
+
+
+def no_drift():
+    """A job that takes 95s still starts every run on a 10-minute boundary."""
+    starts = []
+
+    def job(clock, slot):
+        starts.append(clock.now())
+        clock.advance(95)
+
+    run(london(2024, 7, 1, 9, 3, 17), job, 144)
+    return check('144 slow runs stay on :x0 boundaries',
+                 all(start.minute % 10 == 0 and start.second == 0 for start in starts)
+                 and starts[-1] - starts[0] == timedelta(seconds=143 * INTERVAL))
+
+
+def retries_with_backoff():
+    """Transient errors are retried after 15s, then 30s, not a whole interval later."""
+    attempts = []
+
+    def job(clock, slot):
+        attempts.append(clock.now())
+        if len(attempts) < 3:
+            raise ConnectionError('simulated outage')
+
+    run(london(2024, 7, 1, 9, 0), job, 1)
+    gaps = [(b - a).total_seconds() for a, b in zip(attempts, attempts[1:])]
+    return check(f'retried after {gaps}', gaps == [15, 30])
+
+
+def gives_up_at_next_slot():
+    """A slot that keeps failing is abandoned in time for the next one."""
+    starts = []
+
+    def job(clock, slot):
+        starts.append((slot, clock.now()))
+        if slot.minute == 0:
+            raise ConnectionError('simulated outage')
+
+    _, scheduler = run(london(2024, 7, 1, 9, 0), job, 2)
+    second = [now for slot, now in starts if slot.minute == 10]
+    return check('failing slot gives way to the next one on time',
+                 second == [london(2024, 7, 1, 9, 10)] and scheduler.missed == 1)
+
+
+def catches_up_after_downtime():
+    """With catch_up, slots missed while the process was down are run on restart."""
+    with tempfile.TemporaryDirectory() as directory:
+        state_path = os.path.join(directory, 'schedule.json')
+        run(london(2024, 7, 1, 9, 0), lambda clock, slot: None, 1, state_path=state_path)
+        slots = []
+        run(london(2024, 7, 1, 9, 55), lambda clock, slot: slots.append(slot), 6,
+            catch_up=True, state_path=state_path)
+    expected = [london(2024, 7, 1, 9, minute) for minute in (10, 20, 30, 40, 50)] + [london(2024, 7, 1, 10, 0)]
+    return check('back-filled 9:10-9:50 then ran 10:00', slots == expected)
+
+
+def skips_without_catch_up():
+    """Without catch_up, a job that overruns two slots just skips them."""
+    slots = []
+
+    def job(clock, slot):
+        slots.append(slot)
+        if len(slots) == 1:
+            clock.advance(25 * 60)
+
+    _, scheduler = run(london(2024, 7, 1, 9, 0), job, 2)
+    return check('overrun skips to 9:30', slots[1] == london(2024, 7, 1, 9, 30) and scheduler.missed == 2)
+
+
+def crosses_clock_change():
+    """Slots keep a steady 10 minutes across the end of British Summer Time."""
+    slots = []
+    run(london(2024, 10, 27, 0, 0), lambda clock, slot: slots.append(slot), 18)
+    gaps = {(b - a).total_seconds() for a, b in zip(slots, slots[1:])}
+    return check(f'18 slots over the BST change, gaps {gaps}', gaps == {INTERVAL})
+
+
+def main():
+    checks = [no_drift, retries_with_backoff, gives_up_at_next_slot, catches_up_after_downtime,
+              skips_without_catch_up, crosses_clock_change]
+    if not all([check_() for check_ in checks]):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
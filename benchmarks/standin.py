@@ -0,0 +1,246 @@
+"""A local HTTP server that stands in for bbc.com/bbc.co.uk weather pages.
+
+It serves the generated pages from pages.py on the same paths the scraper
+uses, with optional artificial delay and failures, so the fetch layer can
+be exercised without touching the real site:
+
+    with StandInServer(delay=0.3) as server:
+        get_weather_data(session, forecast_url=server.forecast_url(),
+                         tide_url=server.tide_url())
+
+TemplatedStandIn serves a different page for every location ID, with
+latency, errors and markup drift, for load tests (load_test.py).
+"""
+import gzip
+import hashlib
+import itertools
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytz
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from pages import DRIFTS, render_forecast_page, render_tide_page
+
+FORECAST_PREFIX = '/weather/'
+TIDE_PREFIX = '/weather/coast-and-sea/tide-tables/'
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections (and adds a 1 s SYN retry)
+    # when a crawler opens dozens at once.
+    request_queue_size = 256
+
+
+class StandInServer:
+    """Serves forecast and tide pages from 127.0.0.1 on a free port.
+
+    delay and tide_delay are seconds to wait before answering;
+    tide_status lets the tide page fail with an HTTP error. rate, in bytes
+    per second, sends bodies in 16 KB pieces at that speed, as over a slow
+    link. Pages carry an ETag and conditional requests for an unchanged
+    page get a 304. With compress=True pages are sent gzipped (or as br,
+    with brotli installed) to clients that accept it. The first `busy`
+    requests get a 503 carrying Retry-After: retry_after, if given.
+    connections counts the TCP connections accepted.
+    """
+
+    def __init__(self, delay=0.0, tide_delay=None, tide_status=200, rate=None, compress=False, busy=0,
+                 retry_after=None):
+        self.delay = delay
+        self.rate = rate
+        self.compress = compress
+        self.busy = busy
+        self.retry_after = retry_after
+        self.tide_delay = delay if tide_delay is None else tide_delay
+        self.tide_status = tide_status
+        today = datetime.now(pytz.timezone('Europe/London')).date()
+        self.forecast_page = render_forecast_page().encode('utf-8')
+        self.tide_page = render_tide_page(first_date=today).encode('utf-8')
+        self.requests = 0
+        self.not_modified = 0
+        self.connections = 0
+        self._encoded = {}
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def forecast_url(self, geo_id='2643743'):
+        return f'{self.base_url}{FORECAST_PREFIX}{geo_id}'
+
+    def tide_url(self, station='2/113'):
+        return f'{self.base_url}{TIDE_PREFIX}{station}'
+
+    def respond(self, path):
+        """Returns (status, delay, body) for a request path."""
+        if path.startswith(TIDE_PREFIX):
+            return self.tide_status, self.tide_delay, self.tide_page
+        if path.startswith(FORECAST_PREFIX):
+            return 200, self.delay, self.forecast_page
+        return 404, 0, b'Not found'
+
+    def encode(self, body, accept_encoding):
+        """Returns (content coding or None, body) for a client's Accept-Encoding."""
+        accepted = {coding.split(';')[0].strip() for coding in accept_encoding.split(',')}
+        for coding in ('br', 'gzip'):
+            if coding in accepted and (coding != 'br' or brotli is not None):
+                break
+        else:
+            return None, body
+        key = (hashlib.sha1(body).digest(), coding)
+        with self._lock:
+            encoded = self._encoded.get(key)
+        if encoded is None:
+            encoded = brotli.compress(body) if coding == 'br' else gzip.compress(body, 6)
+            with self._lock:
+                if len(self._encoded) >= 64:
+                    self._encoded.clear()
+                self._encoded[key] = encoded
+        return coding, encoded
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this, on a
+            # kept-alive connection the body waits for the client's delayed ACK.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    busy = server.busy > 0
+                    if busy:
+                        server.busy -= 1
+                if busy:
+                    self.send_response(503)
+                    if server.retry_after is not None:
+                        self.send_header('Retry-After', str(server.retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                status, delay, body = server.respond(self.path)
+                if delay:
+                    time.sleep(delay)
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                if status == 200 and server.compress:
+                    coding, body = server.encode(body, self.headers.get('Accept-Encoding', ''))
+                    if coding:
+                        self.send_header('Content-Encoding', coding)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                step = 16 * 1024 if server.rate else len(body)
+                for start in range(0, len(body), step):
+                    if server.rate:
+                        time.sleep(step / server.rate)
+                    self.wfile.write(body[start:start + step])
+
+            def handle(self):
+                with server._lock:
+                    server.connections += 1
+                try:
+                    super().handle()
+                except ConnectionError:
+                    # A streaming client hung up once it had what it needed.
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class TemplatedStandIn(StandInServer):
+    """A stand-in with a page of its own for every location ID, for load tests.
+
+    Each page is one of `variants` templates per kind, rendered once up
+    front, with the location's ID filled in, so thousands of IDs cost
+    little memory. Every answer waits `delay` seconds plus up to
+    `delay_jitter` more; `error_rate` of requests get a 503; `drift_rate` of
+    locations (picked by ID) get pages with drifted markup (pages.DRIFTS).
+    Pages change every `page_lifetime` seconds, or on every request if 0, so
+    that repeated cycles still download and parse.
+    """
+
+    NAME = '@@LOCATION@@'
+
+    def __init__(self, variants=8, delay=0.0, delay_jitter=0.0, error_rate=0.0, drift_rate=0.0, page_lifetime=0,
+                 rate=None, seed=0):
+        super().__init__(delay=delay, rate=rate)
+        self.delay_jitter = delay_jitter
+        self.error_rate = error_rate
+        self.drift_rate = drift_rate
+        self.page_lifetime = page_lifetime
+        self._rng = random.Random(seed)
+        self._requests = itertools.count()
+        today = datetime.now(pytz.timezone('Europe/London')).date()
+        self.templates = {}
+        for drift in (None,) + DRIFTS:
+            self.templates['forecast', drift] = [
+                render_forecast_page(self.NAME, seed=seed + i, drift=drift).encode('utf-8') for i in range(variants)]
+            self.templates['tide', drift] = [
+                render_tide_page(today, seed=seed + i, drift=drift).encode('utf-8') for i in range(variants)]
+
+    def respond(self, path):
+        if path.startswith(TIDE_PREFIX):
+            kind, location_id = 'tide', path[len(TIDE_PREFIX):]
+        elif path.startswith(FORECAST_PREFIX):
+            kind, location_id = 'forecast', path[len(FORECAST_PREFIX):]
+        else:
+            return 404, 0, b'Not found'
+        delay = self.delay + self._rng.uniform(0, self.delay_jitter)
+        if self._rng.random() < self.error_rate:
+            return 503, delay, b'Service Unavailable'
+
+        key = zlib.crc32(location_id.encode())
+        drift = DRIFTS[key % len(DRIFTS)] if (key >> 8) % 10000 < self.drift_rate * 10000 else None
+        if self.page_lifetime:
+            generation = int(time.monotonic() / self.page_lifetime)
+        else:
+            generation = next(self._requests)
+        templates = self.templates[kind, drift]
+        body = templates[(key + generation) % len(templates)]
+        if kind == 'forecast':
+            body = body.replace(self.NAME.encode(), location_id.encode())
+        # Keeps every location's body distinct, as on the real site.
+        return 200, delay, body + f'<!-- {location_id} -->'.encode()
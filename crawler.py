@@ -0,0 +1,213 @@
+"""Scrapes every location in the registry once per cycle.
+
+Usage: python crawler.py locations.json [--out-dir DIR] [--interval 600] [--workers 16]
+
+Each location's rows go to <out-dir>/<geo_id>.csv. Cycles start on --interval
+boundaries of the London clock (:00, :10, ... for 600).
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import metrics
+from fetch import DEFAULT_TIMEOUT, PageCache
+from locations import FORECAST_URL_TEMPLATE, TIDE_URL_TEMPLATE, forecast_url, load_locations, tide_url
+from page_archive import ArchivingSession, PageArchive
+from scheduler import Scheduler
+from scraper import current_time_of_search, get_weather_data
+from storage import open_store
+from tides import TideCache
+from transport import Transport
+
+CycleReport = namedtuple('CycleReport', ['locations', 'succeeded', 'failed', 'elapsed',
+                                         'throughput', 'p50', 'p95'])
+
+
+def percentile(values, q):
+    """Returns the q-th percentile (0-100) of values by nearest rank."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by at least min_interval seconds."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Blocks until a request to url's host is allowed."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RateLimitedSession:
+    """Wraps a requests.Session so every GET goes through a HostRateLimiter."""
+
+    def __init__(self, session, limiter):
+        self.session = session
+        self.limiter = limiter
+
+    def get(self, url, **kwargs):
+        self.limiter.wait(url)
+        return self.session.get(url, **kwargs)
+
+
+class Crawler:
+    """Runs get_weather_data for many locations with bounded concurrency.
+
+    Location starts are spread at random over the first `jitter` seconds of
+    a cycle, at most `workers` locations are in flight at once, and requests
+    to each host are at least `per_host_interval` seconds apart. With a
+    page_archive.PageArchive every downloaded page is kept as well. With
+    stream=True pages are parsed as they arrive and only as far as needed
+    (fetch.PruningParser), which keeps memory down with many workers.
+    """
+
+    def __init__(self, locations, session=None, workers=16, per_host_interval=0.1, jitter=30.0,
+                 timeout=DEFAULT_TIMEOUT, forecast_template=FORECAST_URL_TEMPLATE,
+                 tide_template=TIDE_URL_TEMPLATE, tide_cache=None, page_archive=None, stream=False):
+        self.locations = list(locations)
+        # Enough kept-alive connections per host for every worker.
+        session = session or Transport(pool_size=workers)
+        if page_archive is not None:
+            session = ArchivingSession(session, page_archive)
+        self.session = RateLimitedSession(session, HostRateLimiter(per_host_interval))
+        self.workers = workers
+        self.jitter = jitter
+        self.timeout = timeout
+        self.forecast_template = forecast_template
+        self.tide_template = tide_template
+        self.cache = PageCache(max_entries=max(256, 2 * len(self.locations)), stream=stream)
+        self.tide_cache = tide_cache if tide_cache is not None else TideCache()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawl')
+
+    def scrape(self, location, time_of_search):
+        """Scrapes one location; returns (row, seconds taken)."""
+        started = time.perf_counter()
+        row = get_weather_data(self.session, time_of_search,
+                               forecast_url=forecast_url(location, self.forecast_template),
+                               tide_url=tide_url(location, self.tide_template),
+                               timeout=self.timeout, cache=self.cache,
+                               tide_cache=self.tide_cache)
+        return row, time.perf_counter() - started
+
+    def run_cycle(self, time_of_search=None, on_row=None):
+        """Scrapes every location once and returns (results, CycleReport).
+
+        results maps each geo_id to its row, or to the exception that stopped
+        it. on_row(location, row) is called from the worker as rows arrive.
+        """
+        if time_of_search is None:
+            time_of_search = current_time_of_search()
+
+        def job(location):
+            row, seconds = self.scrape(location, time_of_search)
+            if on_row is not None:
+                on_row(location, row)
+            return row, seconds
+
+        offsets = sorted((random.uniform(0, self.jitter), i) for i in range(len(self.locations)))
+        started = time.monotonic()
+        futures = {}
+        for offset, i in offsets:
+            delay = started + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            location = self.locations[i]
+            futures[location.geo_id] = self._executor.submit(job, location)
+
+        results = {}
+        latencies = []
+        for geo_id, future in futures.items():
+            try:
+                results[geo_id], seconds = future.result()
+                latencies.append(seconds)
+            except Exception as e:
+                results[geo_id] = e
+        elapsed = time.monotonic() - started
+
+        report = CycleReport(
+            locations=len(self.locations),
+            succeeded=len(latencies),
+            failed=len(self.locations) - len(latencies),
+            elapsed=elapsed,
+            throughput=len(latencies) / elapsed if elapsed else float('nan'),
+            p50=percentile(latencies, 50),
+            p95=percentile(latencies, 95),
+        )
+        return results, report
+
+
+def format_report(report):
+    """Formats a CycleReport as a one-line summary."""
+    return (f"{report.succeeded}/{report.locations} locations in {report.elapsed:.1f}s "
+            f"({report.throughput:.1f}/s), {report.failed} failed, "
+            f"p50 {report.p50 * 1e3:.0f} ms, p95 {report.p95 * 1e3:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('locations', help='JSON location registry')
+    parser.add_argument('--out-dir', default='.')
+    parser.add_argument('--interval', type=float, default=600, help='seconds between cycles')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--per-host-interval', type=float, default=0.1)
+    parser.add_argument('--jitter', type=float, default=30.0)
+    parser.add_argument('--tide-cache', default='tide_cache.json', help='file the tide tables are kept in')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this port')
+    parser.add_argument('--metrics-file', help='write Prometheus metrics to this file after each cycle')
+    parser.add_argument('--pages', help='directory to archive raw pages in, for page_archive.py reextract')
+    parser.add_argument('--stream', action='store_true',
+                        help='parse pages as they download, keeping only the parts read from')
+    args = parser.parse_args()
+
+    locations = load_locations(args.locations)
+    if args.metrics_port or args.metrics_file:
+        metrics.enable()
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+    os.makedirs(args.out_dir, exist_ok=True)
+    stores = {location.geo_id: open_store(os.path.join(args.out_dir, f'{location.geo_id}.csv'), index=True)
+              for location in locations}
+
+    def save(location, row):
+        with metrics.timed('store_write'):
+            stores[location.geo_id].append(row)
+
+    crawler = Crawler(locations, workers=args.workers, per_host_interval=args.per_host_interval,
+                      jitter=min(args.jitter, args.interval / 2), tide_cache=TideCache(args.tide_cache),
+                      page_archive=PageArchive(args.pages) if args.pages else None, stream=args.stream)
+
+    def cycle(slot):
+        results, report = crawler.run_cycle(slot.strftime('%Y-%m-%d %H:%M'), on_row=save)
+        for geo_id, result in results.items():
+            if isinstance(result, Exception):
+                print(f"{geo_id}: {result}")
+        print(format_report(report), crawler.cache.stats())
+        if metrics.enabled():
+            print(metrics.cycle_summary(time_of_search=slot.strftime('%Y-%m-%d %H:%M'),
+                                        elapsed=round(report.elapsed, 3)))
+            if args.metrics_file:
+                metrics.write_textfile(args.metrics_file)
+
+    Scheduler(cycle, args.interval).run()
+
+
+if __name__ == '__main__':
+    main()
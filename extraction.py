@@ -0,0 +1,224 @@
+from collections import namedtuple
+
+from lxml import etree
+
+
+def map_level(code):
+    """Maps single-letter codes to descriptive levels."""
+    return {'L': 'Low', 'M': 'Medium', 'H': 'High'}.get(code, 'Unknown')
+
+
+# A node that several fields hang off. Top-level anchors (parent None) name
+# an element id, which may contain {placeholders}; all of a page's ids are
+# found in a single pass. Other anchors are an XPath relative to their parent,
+# so the long shared prefix of the forecast page is only walked once per page.
+Anchor = namedtuple('Anchor', ['name', 'parent', 'xpath'])
+
+# Matching on the id attribute axis is much cheaper in libxml2 than testing
+# @id on every element with //*[@id=...].
+_ID_LOOKUP = etree.XPath('//@id[contains($ids, concat(" ", ., " "))]/..')
+_TIDE_SECTIONS = etree.XPath('//@id[starts-with(., "section-")]/..')
+
+# One value on the page: where it lives relative to its anchor, what to strip
+# off the end of the text, how to convert it and what to use when it's missing.
+Field = namedtuple('Field', ['name', 'anchor', 'xpath', 'suffix', 'convert', 'missing'],
+                   defaults=[None, None, 'N/A'])
+
+FORECAST_ANCHORS = [
+    Anchor('wr-forecast', None, 'wr-forecast'),
+    Anchor('today', None, 'daylink-0'),
+    Anchor('location', None, 'wr-location-name-id'),
+    Anchor('forecast', 'wr-forecast', etree.XPath('div[4]/div/div[1]')),
+    Anchor('hour', 'forecast', etree.XPath('div[2]/div/div/div/div[2]/ol/li[1]/button')),
+    Anchor('details', 'forecast', etree.XPath('div[4]/div/div[1]')),
+]
+
+# In the same order as the columns of bbc_weather.csv.
+FORECAST_FIELDS = [
+    Field('High Temperature(°C)', 'today', etree.XPath('div[4]/div[1]/div/div[4]/div/div[1]/span[2]/span/span[1]'), suffix='°', convert=float),
+    Field('Low Temperature(°C)', 'today', etree.XPath('div[4]/div[1]/div/div[4]/div/div[2]/span[2]/span/span[1]'), suffix='°', convert=float),
+    Field('Current Temperature(°C)', 'hour', etree.XPath('div[1]/div[2]/div[3]/div[2]/div/div/div[2]/span/span[1]'), suffix='°', convert=float),
+    Field('Weather Condition', 'hour', etree.XPath('div[2]/div/span')),
+    Field('Wind Speed(mph)', 'hour', etree.XPath('div[1]/div[2]/div[3]/div[4]/div/span[3]/span/span[1]')),
+    Field('Humidity(%)', 'hour', etree.XPath('div[2]/div/div/div[1]/dl/dd[1]'), suffix='%', convert=float),
+    Field('Pressure(mb)', 'hour', etree.XPath('div[2]/div/div/div[1]/dl/dd[2]'), suffix=' mb'),
+    Field('Visibility', 'hour', etree.XPath('div[2]/div/div/div[1]/dl/dd[3]')),
+    Field('Location', 'location', etree.XPath('.')),
+    Field('Wind Direction', 'hour', etree.XPath('div[2]/div/div/div[4]')),
+    Field('UV Index', 'details', etree.XPath('div[2]/span[2]/span[1]/span[2]'), convert=map_level, missing='Unknown'),
+    Field('Pollen', 'details', etree.XPath('div[2]/span[1]/span[1]/span[2]'), convert=map_level, missing='Unknown'),
+    Field('Pollution', 'details', etree.XPath('div[2]/span[3]/span[1]/span[2]'), convert=map_level, missing='Unknown'),
+    Field('Chance of Precipitation(%)', 'hour', etree.XPath('div[1]/div[2]/div[3]/div[3]/div[2]'), suffix='%', convert=float),
+    Field('Sunset', 'details', etree.XPath('div[1]/span[2]/span[2]')),
+    Field('Sunrise', 'details', etree.XPath('div[1]/span[1]/span[2]')),
+]
+
+
+def _slot_field(name, source, anchor, convert=None):
+    """Reuses a current-conditions field for every hourly slot or day link, as a typed column."""
+    field = next(field for field in FORECAST_FIELDS if field.name == source)
+    return field._replace(name=name, anchor=anchor, convert=convert or field.convert, missing=None)
+
+
+# Paths below are relative to each li/button of the hourly list (the
+# current-hour fields read li[1]) and to each daylink-N (today is daylink-0).
+_HOUR_SLOTS = etree.XPath('div[2]/div/div/div/div[2]/ol/li/button')
+_DAY_LINKS = etree.XPath('//@id[starts-with(., "daylink-")]/..')
+
+HOURLY_FIELDS = [
+    Field('time', 'slot', etree.XPath('div[1]/div[1]/span[1]'), missing=None),
+    _slot_field('temperature', 'Current Temperature(°C)', 'slot'),
+    _slot_field('weather_condition', 'Weather Condition', 'slot'),
+    _slot_field('wind_speed', 'Wind Speed(mph)', 'slot', convert=float),
+    _slot_field('wind_direction', 'Wind Direction', 'slot'),
+    _slot_field('humidity', 'Humidity(%)', 'slot'),
+    _slot_field('pressure', 'Pressure(mb)', 'slot', convert=float),
+    _slot_field('visibility', 'Visibility', 'slot'),
+    _slot_field('precipitation_chance', 'Chance of Precipitation(%)', 'slot'),
+]
+
+DAILY_FIELDS = [
+    _slot_field('high_temperature', 'High Temperature(°C)', 'day'),
+    _slot_field('low_temperature', 'Low Temperature(°C)', 'day'),
+]
+
+TIDE_ANCHORS = [
+    Anchor('section', None, 'section-{date}'),
+]
+
+# Rows of a day's tide table: low morning, high morning, low evening, high evening.
+TIDE_FIELDS = [
+    Field('Low Tide Morning Time', 'section', etree.XPath('table/tbody/tr[1]/td[1]/span')),
+    Field('Low Tide Morning Height(M)', 'section', etree.XPath('table/tbody/tr[1]/td[2]')),
+    Field('High Tide Morning Time', 'section', etree.XPath('table/tbody/tr[2]/td[1]/span')),
+    Field('High Tide Morning Height(M)', 'section', etree.XPath('table/tbody/tr[2]/td[2]')),
+    Field('Low Tide Evening Time', 'section', etree.XPath('table/tbody/tr[3]/td[1]/span')),
+    Field('Low Tide Evening Height(M)', 'section', etree.XPath('table/tbody/tr[3]/td[2]')),
+    Field('High Tide Evening Time', 'section', etree.XPath('table/tbody/tr[4]/td[1]/span')),
+    Field('High Tide Evening Height(M)', 'section', etree.XPath('table/tbody/tr[4]/td[2]')),
+]
+
+
+def resolve_anchors(tree, anchors, **variables):
+    """Looks up every anchor once and returns them by name (None if not found).
+
+    Anchors must come after their parent in the list.
+    """
+    ids = {anchor.name: anchor.xpath.format(**variables) for anchor in anchors if anchor.parent is None}
+    found = {}
+    for elem in _ID_LOOKUP(tree, ids=' ' + ' '.join(ids.values()) + ' '):
+        found.setdefault(elem.get('id'), elem)
+
+    nodes = {name: found.get(element_id) for name, element_id in ids.items()}
+    for anchor in anchors:
+        if anchor.parent is None:
+            continue
+        context = nodes.get(anchor.parent)
+        matches = anchor.xpath(context) if context is not None else None
+        nodes[anchor.name] = matches[0] if matches else None
+    return nodes
+
+
+def extract_field(field, nodes):
+    """Reads, strips and converts a single field relative to its anchor."""
+    context = nodes.get(field.anchor)
+    if context is None:
+        return field.missing
+    elem = field.xpath(context)
+    if not elem:
+        return field.missing
+
+    text = (elem[0].text or '').strip()
+    if field.suffix and text.endswith(field.suffix):
+        text = text[:-len(field.suffix)]
+    if field.convert is None:
+        return text
+    try:
+        return field.convert(text)
+    except ValueError:
+        return field.missing
+
+
+def extract_fields(tree, fields, anchors, **variables):
+    """Extracts every field in the table from a parsed page, in table order.
+
+    variables fill the placeholders in top-level anchor ids.
+    """
+    nodes = resolve_anchors(tree, anchors, **variables)
+    return {field.name: extract_field(field, nodes) for field in fields}
+
+
+def extract_forecast(tree):
+    """Extracts the current conditions from a parsed forecast page."""
+    return extract_fields(tree, FORECAST_FIELDS, FORECAST_ANCHORS)
+
+
+def extract_columns(contexts, fields, anchor):
+    """Extracts fields relative to each context node into one list per field."""
+    columns = {field.name: [] for field in fields}
+    for context in contexts:
+        nodes = {anchor: context}
+        for field in fields:
+            columns[field.name].append(extract_field(field, nodes))
+    return columns
+
+
+def extract_forecast_page(tree):
+    """Extracts the current conditions and every hourly slot and day link from a forecast page.
+
+    Returns {'current': the extract_forecast dict, 'hourly': HOURLY_FIELDS
+    columns, 'daily': DAILY_FIELDS columns plus 'day' (0 for today)}.
+    Column values are None where missing.
+    """
+    nodes = resolve_anchors(tree, FORECAST_ANCHORS)
+    current = {field.name: extract_field(field, nodes) for field in FORECAST_FIELDS}
+
+    forecast = nodes.get('forecast')
+    hourly = extract_columns(_HOUR_SLOTS(forecast) if forecast is not None else [], HOURLY_FIELDS, 'slot')
+
+    links = {}
+    for link in _DAY_LINKS(tree):
+        try:
+            links.setdefault(int(link.get('id')[len('daylink-'):]), link)
+        except ValueError:
+            continue
+    days = sorted(links)
+    daily = {'day': days}
+    daily.update(extract_columns([links[day] for day in days], DAILY_FIELDS, 'day'))
+    return {'current': current, 'hourly': hourly, 'daily': daily}
+
+
+def extract_tides(tree, date):
+    """Extracts one day's tide times and heights from a parsed tide page.
+
+    date is a 'YYYY-MM-DD' string matching the page's section-<date> ids.
+    """
+    return extract_fields(tree, TIDE_FIELDS, TIDE_ANCHORS, date=date)
+
+
+def extract_all_tides(tree):
+    """Extracts the tide times and heights for every day listed on a tide page.
+
+    Returns a dict mapping 'YYYY-MM-DD' to that day's tide columns.
+    """
+    days = {}
+    for section in _TIDE_SECTIONS(tree):
+        date = section.get('id')[len('section-'):]
+        nodes = {'section': section}
+        days.setdefault(date, {field.name: extract_field(field, nodes) for field in TIDE_FIELDS})
+    return days
+
+
+# What fetch.stream_and_extract keeps of a page for each extract function:
+# the subtrees under elements with one of ids or an id starting with one of
+# prefixes. Reading stops once every id in required has closed and, for
+# prefix matches, the element holding them has closed too.
+StreamTargets = namedtuple('StreamTargets', ['ids', 'prefixes', 'required'])
+
+STREAM_TARGETS = {
+    extract_forecast: StreamTargets(frozenset(['wr-forecast', 'daylink-0', 'wr-location-name-id']), (),
+                                    frozenset(['wr-forecast', 'daylink-0', 'wr-location-name-id'])),
+    extract_forecast_page: StreamTargets(frozenset(['wr-forecast', 'wr-location-name-id']), ('daylink-',),
+                                         frozenset(['wr-forecast', 'daylink-0', 'wr-location-name-id'])),
+    extract_all_tides: StreamTargets(frozenset(), ('section-',), frozenset()),
+}
@@ -0,0 +1,293 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from lxml import etree, html
+
+import metrics
+from extraction import STREAM_TARGETS
+
+# (connect, read) seconds handed to requests for every page.
+DEFAULT_TIMEOUT = (5, 20)
+
+# Bytes read from the socket at a time when streaming a page into the parser.
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Shared by every call so a tick doesn't pay for starting threads. Sized for
+# the crawler, where many locations fetch their extra pages at the same time.
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='fetch')
+
+
+def fetch_page(session, url, timeout=DEFAULT_TIMEOUT):
+    """Downloads a page and returns its body, raising on HTTP errors."""
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+class PageCache:
+    """Skips downloading and parsing pages that haven't changed.
+
+    Requests carry If-None-Match/If-Modified-Since from the last response
+    for the same URL. Extracted results are kept in an LRU keyed by what was
+    extracted and a hash of the page body, so a 304, or a 200 with the same
+    bytes as before, skips parsing and XPath evaluation entirely. Cached
+    results are shared between callers and must not be modified.
+
+    With stream=True, pages whose extract has extraction.STREAM_TARGETS are
+    parsed while they download and only read up to the last field needed
+    (see stream_and_extract). A 304 still skips them entirely, but a 200
+    with unchanged bytes is parsed again.
+    """
+
+    def __init__(self, max_entries=256, stream=False):
+        self.max_entries = max_entries
+        self.stream = stream
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._validators = OrderedDict()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Returns the hit/miss counters."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified}
+
+    def fetch_and_parse(self, session, url, extract, key, timeout=DEFAULT_TIMEOUT):
+        """Like fetch_and_parse, reusing earlier work where the page is unchanged.
+
+        key names what extract computes (e.g. ('tides', date)) and must
+        change whenever extract would give a different result for the same page.
+        """
+        with self._lock:
+            validators = self._validators.get(url)
+        headers = {}
+        digest = None
+        if validators:
+            etag, last_modified, digest = validators
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        page = str(key)
+        stream = self.stream and extract in STREAM_TARGETS
+        with metrics.timed('fetch', page=page):
+            response = session.get(url, timeout=timeout, headers=headers, stream=stream)
+        if response.status_code == 304 and digest is not None:
+            response.close()
+            with self._lock:
+                self.not_modified += 1
+            result = self._lookup((key, digest))
+            if result is not None:
+                return result
+            # The result was evicted; fall back to a full download.
+            with metrics.timed('fetch', page=page):
+                response = session.get(url, timeout=timeout, stream=stream)
+        response.raise_for_status()
+
+        result = None
+        if stream:
+            # Keyed by the bytes read up to the last target, which is all the result depends on.
+            digest, result = stream_and_extract(response, extract, page)
+            with self._lock:
+                self.misses += 1
+        else:
+            digest = hashlib.sha1(response.content).hexdigest()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            if etag or last_modified:
+                self._validators[url] = (etag, last_modified, digest)
+                self._validators.move_to_end(url)
+                while len(self._validators) > self.max_entries * 4:
+                    self._validators.popitem(last=False)
+            else:
+                self._validators.pop(url, None)
+
+        if result is None:
+            result = self._lookup((key, digest))
+            if result is not None:
+                return result
+            result = parse_and_extract(response.content, extract, page)
+        with self._lock:
+            self._results[(key, digest)] = result
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    def _lookup(self, cache_key):
+        """Returns the cached result for cache_key, counting the hit or miss."""
+        with self._lock:
+            result = self._results.get(cache_key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._results.move_to_end(cache_key)
+            return result
+
+
+class PruningParser:
+    """Parses a page fed in pieces, keeping only what extract needs.
+
+    Just the subtrees extraction.STREAM_TARGETS[extract] names are kept.
+    Every other element is emptied and removed from the tree once it
+    closes; the targets' ancestors stay (without their other children), so
+    ids and relative paths resolve as in the whole page. feed() returns
+    True once every target has been seen, and close() returns what extract
+    makes of the tree.
+    """
+
+    def __init__(self, extract):
+        self.extract = extract
+        self.targets = STREAM_TARGETS[extract]
+        self._parser = etree.HTMLPullParser(events=('start', 'end'))
+        self._depth = 0
+        self._kept = set()
+        self._ancestors = set()
+        self._waiting = set(self.targets.required)
+        # Parents of prefix-matched targets; more matches may follow until they close.
+        self._containers = set()
+
+    @property
+    def done(self):
+        return bool(self._kept) and not self._waiting and not self._containers
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                self._start(elem)
+            else:
+                self._end(elem)
+        return self.done
+
+    def close(self):
+        return self.extract(self._parser.close())
+
+    def _start(self, elem):
+        if self._depth:
+            self._depth += 1
+            return
+        element_id = elem.get('id')
+        if element_id is None or not (element_id in self.targets.ids
+                                      or element_id.startswith(self.targets.prefixes)):
+            return
+        self._depth = 1
+        self._kept.add(elem)
+        parent = elem.getparent()
+        if element_id not in self.targets.ids:
+            self._containers.add(parent)
+        while parent is not None and parent not in self._ancestors:
+            self._ancestors.add(parent)
+            parent = parent.getparent()
+
+    def _end(self, elem):
+        if self._waiting:
+            self._waiting.discard(elem.get('id'))
+        if self._depth:
+            self._depth -= 1
+            return
+        self._containers.discard(elem)
+        if elem in self._ancestors:
+            return
+        elem.clear()
+        # Closed siblings before this one have been emptied already; drop them.
+        parent = elem.getparent()
+        previous = elem.getprevious()
+        while previous is not None:
+            before = previous.getprevious()
+            if previous not in self._kept and previous not in self._ancestors:
+                parent.remove(previous)
+            previous = before
+
+
+def stream_and_extract(response, extract, page='page'):
+    """Parses a streamed response with a PruningParser as it arrives.
+
+    Reading stops as soon as every target has been seen; the rest of the
+    body is never downloaded (so the connection isn't reused). Returns
+    (sha1 of the bytes read, what extract returned).
+    """
+    parser = PruningParser(extract)
+    digest = hashlib.sha1()
+    try:
+        with metrics.timed('stream', page=page):
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+                if parser.feed(chunk):
+                    break
+    finally:
+        response.close()
+    with metrics.timed('extract', page=page):
+        return digest.hexdigest(), parser.close()
+
+
+def parse_and_extract(content, extract, page='page'):
+    """Parses a page body and runs extract on the tree, timing each step."""
+    with metrics.timed('parse', page=page):
+        tree = html.fromstring(content)
+    with metrics.timed('extract', page=page):
+        return extract(tree)
+
+
+def fetch_and_parse(session, url, extract, timeout=DEFAULT_TIMEOUT, cache=None, key=None, stream=False):
+    """Downloads a page, parses it and runs extract on the tree.
+
+    With a PageCache and a key, unchanged pages reuse the earlier result
+    (and the cache's stream setting applies). Otherwise stream=True parses
+    the page as it downloads, see stream_and_extract.
+    """
+    if cache is not None and key is not None:
+        return cache.fetch_and_parse(session, url, extract, key, timeout)
+    page = str(key) if key is not None else 'page'
+    if stream and extract in STREAM_TARGETS:
+        with metrics.timed('fetch', page=page):
+            response = session.get(url, timeout=timeout, stream=True)
+        response.raise_for_status()
+        return stream_and_extract(response, extract, page)[1]
+    with metrics.timed('fetch', page=page):
+        content = fetch_page(session, url, timeout)
+    return parse_and_extract(content, extract, page)
+
+
+def fetch_all(session, jobs, timeout=DEFAULT_TIMEOUT, cache=None):
+    """Fetches and parses several pages at once over the shared session.
+
+    jobs maps a name to a (url, extract, key) tuple, key being the PageCache
+    key for that result (or None). The result maps each name to what extract
+    returned, or to the exception that stopped that page, so one failed page
+    never throws away the others. The first job runs in the calling thread,
+    the rest on the shared pool.
+    """
+    # requests' read timeout is per socket read, so also cap the whole page.
+    limit = sum(timeout) if isinstance(timeout, tuple) else timeout
+    deadline = time.monotonic() + limit
+
+    names = list(jobs)
+    futures = {
+        name: _executor.submit(fetch_and_parse, session, *jobs[name][:2], timeout, cache, jobs[name][2])
+        for name in names[1:]
+    }
+
+    results = {}
+    if names:
+        url, extract, key = jobs[names[0]]
+        try:
+            results[names[0]] = fetch_and_parse(session, url, extract, timeout, cache, key)
+        except Exception as e:
+            results[names[0]] = e
+
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except TimeoutError:
+            results[name] = TimeoutError(f"{jobs[name][0]} took longer than {limit}s")
+        except Exception as e:
+            results[name] = e
+    return results
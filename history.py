@@ -0,0 +1,197 @@
+"""Loads the bbc_weather.csv history as typed columns, with an on-disk cache.
+
+The first load parses the CSV in one vectorized pass with pyarrow
+(missing markers to nulls, unit suffixes stripped, HH:MM times put on the
+day of the search, rows sorted by time) and saves the result next to it
+as an uncompressed Arrow file. Later loads memory-map that file. When
+the CSV has only grown since, just the new rows at the end are parsed.
+
+    table = load_history('bbc_weather.csv')        # pyarrow.Table, archive.SCHEMA columns
+    arrays = history_arrays(table)                 # dict of NumPy arrays
+"""
+import hashlib
+import io
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+
+from observation import arrow_schema
+from schema import COLUMNS, MISSING
+from storage import read_header
+
+SCHEMA = arrow_schema()
+
+# Bumped whenever the conversion changes, so older caches are rebuilt.
+CACHE_VERSION = 1
+
+# How much of the already-parsed file is checksummed to tell an append
+# from a rewrite.
+_CHECK_BYTES = 4096
+
+_NUMBER = r'^-?(\d+\.?\d*|\.\d+)$'
+
+
+def cache_paths(csv_path):
+    """Returns the (Arrow file, metadata file) cache paths for a CSV log."""
+    return csv_path + '.arrow', csv_path + '.arrow.json'
+
+
+def _strings(table, name):
+    """Returns a column as trimmed strings with the missing markers turned into nulls."""
+    if name not in table.column_names:
+        return pa.nulls(table.num_rows, pa.string())
+    column = pc.utf8_trim_whitespace(table.column(name).combine_chunks().cast(pa.string()))
+    return pc.if_else(pc.is_in(column, value_set=pa.array(sorted(MISSING))), pa.scalar(None, pa.string()), column)
+
+
+def _london(strings, format):
+    """Parses London local times; ambiguous ones at the end of BST read as GMT, as pytz does."""
+    naive = pc.strptime(strings, format=format, unit='s', error_is_null=True)
+    return pc.assume_timezone(naive, 'Europe/London', ambiguous='latest', nonexistent='earliest')
+
+
+def convert(raw):
+    """Turns a table of CSV strings (keyed by CSV header) into SCHEMA columns sorted by time.
+
+    Rows without a readable time of search are dropped.
+    """
+    searched = _strings(raw, 'Time of Search')
+    day = pc.utf8_slice_codeunits(searched, 0, 10)
+    arrays = []
+    for column, field in zip(COLUMNS, SCHEMA):
+        values = _strings(raw, column.name)
+        if column.kind == 'timestamp':
+            values = _london(values, '%Y-%m-%d %H:%M')
+        elif column.kind == 'clock':
+            values = _london(pc.binary_join_element_wise(day, values, ' '), '%Y-%m-%d %H:%M')
+        elif column.kind == 'float':
+            values = pc.replace_substring_regex(values, r'[^0-9.\-]', '')
+            values = pc.if_else(pc.match_substring_regex(values, _NUMBER), values,
+                                pa.scalar(None, pa.string())).cast(pa.float64())
+        elif column.kind == 'category':
+            values = values.dictionary_encode()
+        arrays.append(values.cast(field.type))
+    table = pa.Table.from_arrays(arrays, schema=SCHEMA)
+    table = table.filter(pc.is_valid(table.column('time_of_search')))
+    return _sorted(table)
+
+
+def parse_csv(source, column_names=None):
+    """Reads CSV bytes (a path or file object) as strings and converts them.
+
+    column_names is given when source has no header line (a tail).
+    """
+    read_options = pcsv.ReadOptions(column_names=column_names, block_size=1 << 22)
+    convert_options = pcsv.ConvertOptions(column_types={column.name: pa.string() for column in COLUMNS},
+                                          strings_can_be_null=False)
+    return convert(pcsv.read_csv(source, read_options=read_options, convert_options=convert_options))
+
+
+def _digest(f, end):
+    """Checksums the bytes just before end, to recognise the file later."""
+    start = max(0, end - _CHECK_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(end - start)).hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+
+def _write_cache(table, arrow_path, meta_path, meta):
+    # One chunk per column and no compression, so the file can be mapped as-is.
+    table = table.combine_chunks()
+    tmp_path = arrow_path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, arrow_path)
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _read_cache(arrow_path):
+    return pa.ipc.open_file(pa.memory_map(arrow_path, 'r')).read_all()
+
+
+def _sorted(table):
+    return table.take(pc.sort_indices(table, [('time_of_search', 'ascending')]))
+
+
+def load_history(csv_path, use_cache=True):
+    """Returns the whole log as a typed Arrow table, oldest first.
+
+    The table's columns are archive.SCHEMA's; missing values are nulls and
+    times are London-aware timestamps. The cache is rebuilt whenever the
+    CSV's size or mtime no longer match it, reparsing only appended rows
+    where possible. A last line still being written is left for next time.
+    """
+    arrow_path, meta_path = cache_paths(csv_path)
+    stat = os.stat(csv_path)
+    meta = _read_meta(meta_path) if use_cache and os.path.exists(arrow_path) else None
+    if meta and meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        return _read_cache(arrow_path)
+
+    header = read_header(csv_path)
+    with open(csv_path, 'rb') as f:
+        if meta and meta['header'] == header and stat.st_size >= meta['offset'] \
+                and _digest(f, meta['offset']) == meta['check']:
+            # Only lines were added: parse those and add them to the cached rows.
+            f.seek(meta['offset'])
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            table = _read_cache(arrow_path)
+            if end:
+                tail = parse_csv(io.BytesIO(data[:end]), column_names=header)
+                ordered = (not table.num_rows or not tail.num_rows
+                           or pc.min(tail.column('time_of_search')).as_py()
+                           >= pc.max(table.column('time_of_search')).as_py())
+                table = pa.concat_tables([table, tail]).unify_dictionaries()
+                if not ordered:
+                    table = _sorted(table)
+            offset = meta['offset'] + end
+        else:
+            f.seek(0)
+            data = f.read()
+            offset = data.rfind(b'\n') + 1
+            if header is None or data.count(b'\n', 0, offset) < 2:
+                table = SCHEMA.empty_table()
+            else:
+                table = parse_csv(io.BytesIO(data[:offset]))
+        check = _digest(f, offset)
+
+    if not use_cache:
+        return table
+    _write_cache(table, arrow_path, meta_path, {
+        'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+        'offset': offset, 'check': check, 'header': header,
+    })
+    return _read_cache(arrow_path)
+
+
+def history_arrays(table):
+    """Returns the table's columns as NumPy arrays, keyed by field name.
+
+    Floats are float64 with NaN for missing, timestamps datetime64[s] in UTC
+    with NaT, categories and text object arrays with None.
+    """
+    arrays = {}
+    for field in table.schema:
+        column = table.column(field.name)
+        if pa.types.is_floating(field.type):
+            arrays[field.name] = column.fill_null(float('nan')).to_numpy()
+        elif pa.types.is_timestamp(field.type):
+            arrays[field.name] = column.cast(pa.timestamp('s')).to_numpy()
+        else:
+            arrays[field.name] = column.to_numpy()
+    return arrays
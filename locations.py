@@ -0,0 +1,46 @@
+import json
+from collections import namedtuple
+
+FORECAST_URL_TEMPLATE = 'https://www.bbc.com/weather/{geo_id}'
+TIDE_URL_TEMPLATE = 'https://www.bbc.co.uk/weather/coast-and-sea/tide-tables/{station}'
+
+# A place to scrape. geo_id is the number at the end of its BBC forecast URL;
+# tide_station is the '<region>/<station>' part of a tide table URL, or None
+# for places without one.
+Location = namedtuple('Location', ['geo_id', 'tide_station', 'name'], defaults=[None, None])
+
+LONDON = Location('2643743', '2/113', 'London')
+
+
+def load_locations(file_path):
+    """Reads the location registry from a JSON file.
+
+    The file holds a list of objects with a geo_id and optionally a
+    tide_station and name, e.g.
+    [{"name": "London", "geo_id": "2643743", "tide_station": "2/113"}]
+    """
+    with open(file_path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    locations = []
+    seen = set()
+    for entry in entries:
+        geo_id = str(entry['geo_id'])
+        if geo_id in seen:
+            raise ValueError(f"Location {geo_id} is listed more than once in {file_path}")
+        seen.add(geo_id)
+        tide_station = entry.get('tide_station')
+        locations.append(Location(geo_id, str(tide_station) if tide_station else None, entry.get('name')))
+    return locations
+
+
+def forecast_url(location, template=FORECAST_URL_TEMPLATE):
+    """Returns the forecast page URL for a location."""
+    return template.format(geo_id=location.geo_id)
+
+
+def tide_url(location, template=TIDE_URL_TEMPLATE):
+    """Returns the tide table URL for a location, or None if it has no station."""
+    if not location.tide_station:
+        return None
+    return template.format(station=location.tide_station)
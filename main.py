@@ -1,169 +1,110 @@
-from google.colab import drive
+from aggregates import Aggregates
+from archive import ForecastArchive, ParquetArchive
+from fetch import PageCache
+import metrics
+from observation import Observation
+from page_archive import ArchivingSession, PageArchive
+from scheduler import Scheduler
+from scraper import get_weather_and_forecast
+from spool import Spool, Uploader, move_tree
+from storage import open_store
+from tides import TideCache
+from transport import Transport
 import os
-import time
-import requests
-from datetime import datetime
-import pandas as pd
-from lxml import html
-import pytz
+import threading
 
-# Get today's date in the required format (e.g., '2023-07-12')
-today_date = datetime.now().strftime('%Y-%m-%d')
-
-# Define London timezone
-london_tz = pytz.timezone('Europe/London')
-
-# Get the current time in London timezone
-now_london = datetime.now(london_tz)
-
-# Format the current time as YYYY-MM-DD HH:MM in London time
-time_of_search = now_london.strftime('%Y-%m-%d %H:%M')
-
-def map_level(code):
-    """Maps single-letter codes to descriptive levels."""
-    return {'L': 'Low', 'M': 'Medium', 'H': 'High'}.get(code, 'Unknown')
-
-
-
-def scrape_tide_times(session):
-    """Scrapes tide times and heights from the specified URL."""
-    url = 'https://www.bbc.co.uk/weather/coast-and-sea/tide-tables/2/113'
-    response = session.get(url)
-    tree = html.fromstring(response.content)
-
-    tide_times = []
-
-    # Extract low tide times and heights
-    low_tide_xpath_morning_time = f'//*[@id="section-{today_date}"]/table/tbody/tr[1]/td[1]/span'
-    low_tide_xpath_morning_height = f'//*[@id="section-{today_date}"]/table/tbody/tr[1]/td[2]'
-    low_tide_xpath_evening_time = f'//*[@id="section-{today_date}"]/table/tbody/tr[3]/td[1]/span'
-    low_tide_xpath_evening_height = f'//*[@id="section-{today_date}"]/table/tbody/tr[3]/td[2]'
-
-    low_tide_elem_morning_time = tree.xpath(low_tide_xpath_morning_time)
-    low_tide_elem_morning_height = tree.xpath(low_tide_xpath_morning_height)
-    low_tide_elem_evening_time = tree.xpath(low_tide_xpath_evening_time)
-    low_tide_elem_evening_height = tree.xpath(low_tide_xpath_evening_height)
-    
-    low_tide_time_morning = low_tide_elem_morning_time[0].text.strip() if low_tide_elem_morning_time else "N/A"
-    low_tide_height_morning = low_tide_elem_morning_height[0].text.strip() if low_tide_elem_morning_height else "N/A"
-    low_tide_time_evening = low_tide_elem_evening_time[0].text.strip() if low_tide_elem_evening_time else "N/A"
-    low_tide_height_evening = low_tide_elem_evening_height[0].text.strip() if low_tide_elem_evening_height else "N/A"
-
-    tide_times.append((low_tide_time_morning, low_tide_height_morning, low_tide_time_evening, low_tide_height_evening))
-
-    # Extract high tide times and heights
-    high_tide_xpath_morning_time = f'//*[@id="section-{today_date}"]/table/tbody/tr[2]/td[1]/span'
-    high_tide_xpath_morning_height = f'//*[@id="section-{today_date}"]/table/tbody/tr[2]/td[2]'
-    high_tide_xpath_evening_time = f'//*[@id="section-{today_date}"]/table/tbody/tr[4]/td[1]/span'
-    high_tide_xpath_evening_height = f'//*[@id="section-{today_date}"]/table/tbody/tr[4]/td[2]'
-
-    high_tide_elem_morning_time = tree.xpath(high_tide_xpath_morning_time)
-    high_tide_elem_morning_height = tree.xpath(high_tide_xpath_morning_height)
-    high_tide_elem_evening_time = tree.xpath(high_tide_xpath_evening_time)
-    high_tide_elem_evening_height = tree.xpath(high_tide_xpath_evening_height)
-
-    high_tide_time_morning = high_tide_elem_morning_time[0].text.strip() if high_tide_elem_morning_time else "N/A"
-    high_tide_height_morning = high_tide_elem_morning_height[0].text.strip() if high_tide_elem_morning_height else "N/A"
-    high_tide_time_evening = high_tide_elem_evening_time[0].text.strip() if high_tide_elem_evening_time else "N/A"
-    high_tide_height_evening = high_tide_elem_evening_height[0].text.strip() if high_tide_elem_evening_height else "N/A"
-
-    tide_times.append((high_tide_time_morning, high_tide_height_morning, high_tide_time_evening, high_tide_height_evening))
-
-    return tide_times
-
-
-def convert_to_datetime(time_str):
-    """Converts a string time format into datetime format."""
-    try:
-        return datetime.strptime(time_str, '%H:%M')
-    except ValueError:
-        return "N/A"
-
-
-def get_weather_data(session):
-    """Fetches weather data from the specified URL and returns it as a dictionary."""
-    url = 'https://www.bbc.com/weather/2643743'
-    response = session.get(url)
-    tree = html.fromstring(response.content)
-
-    # Helper function to extract and clean data
-    def extract_and_clean(xpath, elem_index=0, suffix=None, convert_to_float=False):
-        elem = tree.xpath(xpath)
-        if elem:
-            text = elem[elem_index].text.strip()
-            if suffix:
-                text = text[:-len(suffix)]
-            return float(text) if convert_to_float else text
-        return "N/A"
-
-    # Fetch tide times dynamically
-    tide_times = scrape_tide_times(session)
-
-    weather_data = {
-        'Time of Search': time_of_search,
-        'High Temperature(°C)': extract_and_clean('//*[@id="daylink-0"]/div[4]/div[1]/div/div[4]/div/div[1]/span[2]/span/span[1]', suffix='°', convert_to_float=True),
-        'Low Temperature(°C)': extract_and_clean('//*[@id="daylink-0"]/div[4]/div[1]/div/div[4]/div/div[2]/span[2]/span/span[1]', suffix='°', convert_to_float=True),
-        'Current Temperature(°C)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[1]/div[2]/div[3]/div[2]/div/div/div[2]/span/span[1]', suffix='°', convert_to_float=True),
-        'Weather Condition': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/span'),
-        'Wind Speed(mph)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[1]/div[2]/div[3]/div[4]/div/span[3]/span/span[1]'),
-        'Humidity(%)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[1]/dl/dd[1]', suffix='%', convert_to_float=True),
-        'Pressure(mb)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[1]/dl/dd[2]', suffix=' mb'),
-        'Visibility': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[1]/dl/dd[3]'),
-        'Location': extract_and_clean('//*[@id="wr-location-name-id"]'),
-        'Wind Direction': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[2]/div/div/div[4]'),
-        'UV Index': map_level(extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[2]/span[2]/span[1]/span[2]')),
-        'Pollen': map_level(extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[2]/span[1]/span[1]/span[2]')),
-        'Pollution': map_level(extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[2]/span[3]/span[1]/span[2]')),
-        'Chance of Precipitation(%)': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[2]/div/div/div/div[2]/ol/li[1]/button/div[1]/div[2]/div[3]/div[3]/div[2]', suffix='%', convert_to_float=True),
-        'Sunset': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[1]/span[2]/span[2]'),
-        'Sunrise': extract_and_clean('//*[@id="wr-forecast"]/div[4]/div/div[1]/div[4]/div/div[1]/div[1]/span[1]/span[2]'),
-        'Low Tide Morning Time': tide_times[0][0],
-        'Low Tide Morning Height(M)': tide_times[0][1],
-        'High Tide Morning Time': tide_times[1][0],
-        'High Tide Morning Height(M)': tide_times[1][1],
-        'Low Tide Evening Time': tide_times[0][2],
-        'Low Tide Evening Height(M)': tide_times[0][3],
-        'High Tide Evening Time': tide_times[1][2],
-        'High Tide Evening Height(M)': tide_times[1][3],
-        
-    }
-
-    return weather_data
-
-def save_to_google_drive(df, file_path):
-    """Saves DataFrame to Google Drive."""
-    df.to_csv(file_path, index=False)
+def save_to_google_drive(store, observations):
+    """Appends a batch of observations to the log on Google Drive."""
+    store.extend(observations)
 
 def main():
+    from google.colab import drive
     drive.mount('/content/drive', force_remount=True)  # Ensure persistent authorization
-    session = requests.Session()
+    metrics.enable()
+    # Files written during a run go to local disk first; the uploader moves them
+    # to the same place on Drive, so a stalled mount never holds up a scrape.
+    outbox = '/content/bbc_weather_outbox'
+    metrics_path = os.path.join(outbox, 'bbc_weather_metrics.prom')
+    # Every page fetched is kept so fields can be re-extracted if the markup changes
+    pages = PageArchive(os.path.join(outbox, 'bbc_weather_pages'))
+    session = ArchivingSession(Transport(), pages)
     file_path = '/content/drive/My Drive/bbc_weather.csv'
-
-    while True:
+    # The .idx next to it lets query.py answer time-range questions without reading it all
+    store = open_store(file_path, index=True)
+    archive = ParquetArchive('/content/drive/My Drive/bbc_weather_archive')
+    # Every hourly slot and day on the page, for forecast-vs-actual comparisons
+    forecasts = ForecastArchive(os.path.join(outbox, 'bbc_weather_forecasts'))
+    # Daily and per-condition statistics for the reports, updated each run
+    aggregates = Aggregates('/content/drive/My Drive/bbc_weather_aggregates.json')
+    cache = PageCache()
+    tide_cache = TideCache('tide_cache.json')
+
+    def update_aggregates(observations):
+        for observation in observations:
+            aggregates.add(observation)
+        aggregates.save()
+
+    remount_lock = threading.Lock()
+
+    def remount(sink, error):
+        # The CSV sink stands for Drive; the others would only remount it again.
+        if sink != 'drive_csv':
+            return
+        with remount_lock:
+            print("Reconnecting Google Drive...")
+            drive.mount('/content/drive', force_remount=True)
+
+    # Each observation is committed to local disk first; background threads copy it
+    # to Drive, retrying until it gets there, so a slow or lost mount never costs a row.
+    uploader = Uploader(Spool('/content/bbc_weather_spool.sqlite'), {
+        'drive_csv': lambda observations: save_to_google_drive(store, observations),
+        'archive': archive.extend,
+        'aggregates': update_aggregates,
+        'drive_files': lambda observations: move_tree(outbox, '/content/drive/My Drive'),
+    }, on_error=remount).start()
+
+    def run_once(slot):
+        time_of_search = slot.strftime('%Y-%m-%d %H:%M')
+        # A failed scrape raises; the scheduler retries shortly, backing off if it keeps failing
+        weather_data, forecast = get_weather_and_forecast(session, time_of_search, cache=cache,
+                                                          tide_cache=tide_cache)
+        observation = Observation.from_row(weather_data)
+
+        # Print the fetched weather data
+        print("Weather data fetched:")
+        for key, value in weather_data.items():
+            print(f"{key}: {value}")
+
+        # These go to the outbox before the row is spooled, so the upload the
+        # put() sets off takes them to Drive too. A failure is only reported:
+        # raising would make the scheduler scrape and spool the slot again.
         try:
-            weather_data = get_weather_data(session)
-
-            # Print the fetched weather data
-            print("Weather data fetched:")
-            for key, value in weather_data.items():
-                print(f"{key}: {value}")
-
-            df = pd.DataFrame([weather_data])
-            if os.path.exists(file_path):
-                existing_df = pd.read_csv(file_path)
-                df = pd.concat([df, existing_df], ignore_index=True)
-
-            save_to_google_drive(df, file_path)
+            with metrics.timed('archive_write'):
+                forecasts.append(forecast)
+        except Exception as e:
+            print(f"Couldn't write forecasts, will retry next run: {e}")
+        # One JSON line with where this run's time went, plus a Prometheus file
+        print(metrics.cycle_summary(time_of_search=time_of_search))
+        try:
+            metrics.write_textfile(metrics_path)
+        except OSError as e:
+            print(f"Couldn't write {metrics_path}: {e}")
 
-            print(f"Weather data saved to {file_path}")
+        uploader.put(observation)
+        print(f"Weather data spooled for {file_path}; still to upload: {uploader.pending()}")
+        print(f"Page cache: {cache.stats()}")
 
-            time.sleep(1800)  # Wait for 30 minutes before fetching data again
+    # Runs at :00 and :30 London time, however long each run takes
+    try:
+        Scheduler(run_once, 1800).run()
+    finally:
+        # Forecast tables are written several at a time; don't lose the unwritten ones.
+        # Whatever is still in the outbox afterwards goes to Drive after the next start's first run.
+        try:
+            forecasts.close()
         except Exception as e:
-            print(f"Error occurred: {e}")
-            print("Reconnecting Google Drive...")
-            drive.mount('/content/drive', force_remount=True)  # Remount Google Drive
-            print("Reconnected. Retrying in 30 minutes...")
-            time.sleep(1800)  # Wait for 30 minutes before retrying
+            print(f"Couldn't flush forecasts on exit: {e}")
+        uploader.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,184 @@
+"""Timing and counting hooks for the scrape loop.
+
+Off until enable() is called; until then timed() hands back a shared
+no-op context manager and count() returns straight away, so the hooks can
+stay in the hot path. Once enabled, stage timings are kept as
+Prometheus histograms (render(), write_textfile(), serve()) and summed per
+cycle for a one-line JSON log (cycle_summary()).
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the stage histogram buckets.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_METRIC = 'weather_stage_seconds'
+
+_NULL = contextlib.nullcontext()
+_registry = None
+
+
+class Registry:
+    """Histograms of stage durations and plain counters, plus per-cycle totals."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._cycle_stages = {}
+        self._cycle_counts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, labels=()):
+        key = (('stage', stage),) + labels
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect_left(self.buckets, seconds)
+            if i < len(self.buckets):
+                histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            self._cycle_stages[stage] = self._cycle_stages.get(stage, 0.0) + seconds
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+            cycle_key = name + ''.join(f'.{value}' for _, value in labels)
+            self._cycle_counts[cycle_key] = self._cycle_counts.get(cycle_key, 0) + amount
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = [f'# TYPE {STAGE_METRIC} histogram']
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._histograms.items()):
+                labels = _labels(key)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{STAGE_METRIC}_bucket{_labels(key + (("le", f"{bound:g}"),))} {cumulative}')
+                lines.append(f'{STAGE_METRIC}_bucket{_labels(key + (("le", "+Inf"),))} {count}')
+                lines.append(f'{STAGE_METRIC}_sum{labels} {total:.6f}')
+                lines.append(f'{STAGE_METRIC}_count{labels} {count}')
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f'# TYPE weather_{name}_total counter')
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f'weather_{name}_total{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def cycle_summary(self, **fields):
+        """Returns this cycle's stage totals and counts as a dict and starts a new cycle."""
+        with self._lock:
+            summary = dict(fields)
+            summary['stages'] = {stage: round(seconds, 4) for stage, seconds in self._cycle_stages.items()}
+            summary['counts'] = self._cycle_counts
+            self._cycle_stages = {}
+            self._cycle_counts = {}
+        return summary
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Timer:
+    __slots__ = ('registry', 'stage', 'labels', 'started')
+
+    def __init__(self, registry, stage, labels):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.stage, time.perf_counter() - self.started, self.labels)
+        return False
+
+
+def enable(registry=None):
+    """Turns the hooks on and returns the registry they record into."""
+    global _registry
+    _registry = registry or Registry()
+    return _registry
+
+
+def disable():
+    global _registry
+    _registry = None
+
+
+def enabled():
+    return _registry is not None
+
+
+def timed(stage, **labels):
+    """Times the with-block as one observation of stage; free when metrics are off."""
+    if _registry is None:
+        return _NULL
+    return _Timer(_registry, stage, tuple(sorted(labels.items())))
+
+
+def count(name, amount=1, **labels):
+    """Adds to the weather_<name>_total counter; does nothing when metrics are off."""
+    if _registry is not None:
+        _registry.inc(name, tuple(sorted(labels.items())), amount)
+
+
+def render():
+    return _registry.render() if _registry is not None else ''
+
+
+def write_textfile(file_path):
+    """Writes the metrics to a .prom file, e.g. for node_exporter's textfile collector."""
+    if _registry is None:
+        return
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(_registry.render())
+    os.replace(tmp_path, file_path)
+
+
+def cycle_summary(**fields):
+    """Returns one JSON line with this cycle's stage timings and counts, or None when off."""
+    if _registry is None:
+        return None
+    return json.dumps(_registry.cycle_summary(**fields), sort_keys=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host=''):
+    """Serves /metrics over HTTP from a background thread and returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
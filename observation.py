@@ -0,0 +1,170 @@
+import csv
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from extraction import FORECAST_FIELDS, TIDE_FIELDS
+from schema import COLUMN_NAMES, COLUMNS, coerce_row, is_missing
+
+MISSING_TEXT = 'N/A'
+
+# How the scraper writes each column, so rows formatted from an Observation
+# match those bbc_weather.csv already holds: numbers it converts print as
+# Python floats ('12.0'), numbers it keeps as page text have no trailing
+# '.0' ('1012'), and UV, pollen and pollution are 'Unknown' when missing.
+_SCRAPED_FIELDS = {field.name: field for field in FORECAST_FIELDS + TIDE_FIELDS}
+
+
+@dataclass(slots=True)
+class Observation:
+    """One scrape of a location, with typed values and None where a field was missing.
+
+    Fields follow the columns of bbc_weather.csv (see schema.COLUMNS).
+    Timestamps are timezone-aware London times.
+    """
+    time_of_search: datetime
+    high_temperature: Optional[float] = None
+    low_temperature: Optional[float] = None
+    current_temperature: Optional[float] = None
+    weather_condition: Optional[str] = None
+    wind_speed: Optional[float] = None
+    humidity: Optional[float] = None
+    pressure: Optional[float] = None
+    visibility: Optional[str] = None
+    location: Optional[str] = None
+    wind_direction: Optional[str] = None
+    uv_index: Optional[str] = None
+    pollen: Optional[str] = None
+    pollution: Optional[str] = None
+    precipitation_chance: Optional[float] = None
+    sunset: Optional[datetime] = None
+    sunrise: Optional[datetime] = None
+    low_tide_morning_time: Optional[datetime] = None
+    low_tide_morning_height: Optional[float] = None
+    high_tide_morning_time: Optional[datetime] = None
+    high_tide_morning_height: Optional[float] = None
+    low_tide_evening_time: Optional[datetime] = None
+    low_tide_evening_height: Optional[float] = None
+    high_tide_evening_time: Optional[datetime] = None
+    high_tide_evening_height: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds an observation from a dict keyed by CSV column name.
+
+        Works for get_weather_data's result as well as csv.DictReader rows.
+        """
+        observation = cls(**coerce_row(row))
+        if observation.time_of_search is None:
+            raise ValueError(f"Row has no usable 'Time of Search': {row.get('Time of Search')!r}")
+        return observation
+
+    @classmethod
+    def from_csv_row(cls, values, header=COLUMN_NAMES):
+        """Builds an observation from a list of CSV values in header order."""
+        return cls.from_row(dict(zip(header, values)))
+
+    def values(self):
+        """Returns the typed values in column order."""
+        return [getattr(self, column.field) for column in COLUMNS]
+
+    def to_csv_row(self):
+        """Returns the values formatted the way bbc_weather.csv stores them."""
+        return [_format(column, getattr(self, column.field)) for column in COLUMNS]
+
+    def to_sheet_row(self):
+        """Returns the values for a spreadsheet row: numbers stay numbers."""
+        return [value if column.kind == 'float' and value is not None
+                else _format(column, value)
+                for column, value in zip(COLUMNS, self.values())]
+
+    def to_dict(self):
+        """Returns the CSV-formatted values keyed by CSV column name."""
+        return dict(zip(COLUMN_NAMES, self.to_csv_row()))
+
+
+def _format(column, value):
+    field = _SCRAPED_FIELDS.get(column.name)
+    if value is None:
+        return field.missing if field is not None else MISSING_TEXT
+    if column.kind == 'timestamp':
+        return value.strftime('%Y-%m-%d %H:%M')
+    if column.kind == 'clock':
+        return value.strftime('%H:%M')
+    if column.kind == 'float':
+        if field is not None and field.convert is float:
+            return str(value)
+        return f'{value:.6f}'.rstrip('0').rstrip('.')
+    return value
+
+
+def read_csv_observations(file_path):
+    """Yields an Observation for each row of a bbc_weather.csv log.
+
+    Rows whose time of search can't be read are skipped.
+    """
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        for values in reader:
+            if not values or is_missing(values[0]):
+                continue
+            try:
+                yield Observation.from_csv_row(values, header)
+            except ValueError:
+                continue
+
+
+def arrow_schema():
+    """Returns the Arrow schema for observation record batches."""
+    import pyarrow as pa
+    types = {
+        'timestamp': pa.timestamp('s', tz='Europe/London'),
+        'clock': pa.timestamp('s', tz='Europe/London'),
+        'float': pa.float64(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'text': pa.string(),
+    }
+    return pa.schema([pa.field(column.field, types[column.kind]) for column in COLUMNS])
+
+
+def to_record_batch(observations):
+    """Converts a list of observations into one Arrow RecordBatch, column by column."""
+    import pyarrow as pa
+    schema = arrow_schema()
+    columns = [pa.array([getattr(observation, field.name) for observation in observations], type=field.type)
+               for field in schema]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def numpy_dtype():
+    """Returns the structured NumPy dtype for observation arrays.
+
+    Timestamps are UTC datetime64[s]; text and categories are Python objects.
+    """
+    import numpy as np
+    kinds = {'timestamp': 'datetime64[s]', 'clock': 'datetime64[s]', 'float': 'f8',
+             'category': object, 'text': object}
+    return np.dtype([(column.field, kinds[column.kind]) for column in COLUMNS])
+
+
+def to_numpy(observations):
+    """Converts a list of observations into a structured NumPy array.
+
+    Missing numbers become NaN and missing timestamps NaT.
+    """
+    import numpy as np
+    dtype = numpy_dtype()
+    array = np.empty(len(observations), dtype=dtype)
+    for column in COLUMNS:
+        values = [getattr(observation, column.field) for observation in observations]
+        if column.kind in ('timestamp', 'clock'):
+            array[column.field] = [np.datetime64(int(value.timestamp()), 's') if value is not None
+                                   else np.datetime64('NaT') for value in values]
+        elif column.kind == 'float':
+            array[column.field] = [np.nan if value is None else value for value in values]
+        else:
+            array[column.field] = values
+    return array
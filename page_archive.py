@@ -0,0 +1,248 @@
+"""Keeps every fetched page so fields can be re-extracted later.
+
+Usage:
+    python page_archive.py reextract PAGES_DIR --csv OUT.csv [--locations locations.json]
+    python page_archive.py reextract PAGES_DIR --parquet ARCHIVE_DIR [--start YYYY-MM-DD] [--end ...]
+
+Page bodies are stored gzipped once per distinct content, as
+PAGES_DIR/blobs/<sha1[:2]>/<sha1>.html.gz, and every fetch is listed in
+PAGES_DIR/index/YYYY-MM-DD.csv (London time, url, sha1). When the markup
+changes and fields come back "N/A", fix extraction.py and re-extract.
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import os
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from lxml import html
+
+from extraction import extract_all_tides, extract_forecast
+from locations import FORECAST_URL_TEMPLATE, LONDON, TIDE_URL_TEMPLATE, forecast_url, load_locations, tide_url
+from observation import Observation
+from schema import london_tz
+
+INDEX_COLUMNS = ['fetched_at', 'url', 'sha1']
+
+
+class PageArchive:
+    """Content-addressed, gzipped store of raw pages with a per-day fetch index."""
+
+    def __init__(self, root):
+        self.root = root
+        self._last_digest = {}
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], f'{digest}.html.gz')
+
+    def index_path(self, day):
+        return os.path.join(self.root, 'index', f'{day}.csv')
+
+    def add(self, url, content, fetched_at=None):
+        """Stores a page body (if it isn't stored already) and records the fetch.
+
+        Returns the body's SHA-1.
+        """
+        digest = hashlib.sha1(content).hexdigest()
+        path = self.blob_path(digest)
+        if digest not in self._known and not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._known.add(digest)
+            self._last_digest[url] = digest
+        self.record(url, digest, fetched_at)
+        return digest
+
+    def record(self, url, digest, fetched_at=None):
+        """Adds a line to the fetch index for a page that is already stored."""
+        fetched_at = fetched_at or datetime.now(london_tz)
+        path = self.index_path(fetched_at.strftime('%Y-%m-%d'))
+        with self._lock:
+            new_file = not os.path.exists(path)
+            if new_file:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                if new_file:
+                    writer.writerow(INDEX_COLUMNS)
+                writer.writerow([fetched_at.strftime('%Y-%m-%d %H:%M:%S'), url, digest])
+
+    def record_not_modified(self, url, fetched_at=None):
+        """Records a 304 as another fetch of the last body seen for url."""
+        with self._lock:
+            digest = self._last_digest.get(url)
+        if digest is not None:
+            self.record(url, digest, fetched_at)
+
+    def read(self, digest):
+        """Returns a stored page body."""
+        with gzip.open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    def days(self):
+        """Returns the days that have an index file, oldest first."""
+        directory = os.path.join(self.root, 'index')
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.csv')] for name in os.listdir(directory) if name.endswith('.csv'))
+
+    def iter_index(self, start=None, end=None):
+        """Yields (fetched_at, url, sha1) for every fetch, day by day; start/end are inclusive days."""
+        for day in self.days():
+            if (start and day < start) or (end and day > end):
+                continue
+            with open(self.index_path(day), newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if len(row) == len(INDEX_COLUMNS):
+                        yield tuple(row)
+
+
+class ArchivingSession:
+    """Wraps a requests.Session so every page it downloads is kept in a PageArchive."""
+
+    def __init__(self, session, archive):
+        self.session = session
+        self.archive = archive
+
+    def get(self, url, **kwargs):
+        response = self.session.get(url, **kwargs)
+        try:
+            if response.status_code == 200:
+                self.archive.add(url, response.content)
+            elif response.status_code == 304:
+                self.archive.record_not_modified(url)
+        except OSError as e:
+            print(f"Could not archive {url}: {e}")
+        return response
+
+
+def _extract_blob(task):
+    """Runs in a worker process: parses one stored page and extracts its fields."""
+    path, kind = task
+    try:
+        with gzip.open(path, 'rb') as f:
+            tree = html.fromstring(f.read())
+        return extract_forecast(tree) if kind == 'forecast' else extract_all_tides(tree)
+    except Exception as e:
+        return e
+
+
+def reextract(root, locations=(LONDON,), on_row=None, start=None, end=None, workers=None,
+              forecast_template=FORECAST_URL_TEMPLATE, tide_template=TIDE_URL_TEMPLATE):
+    """Rebuilds observations from the page archive with the current field definitions.
+
+    Each distinct page body is parsed once, on a pool of worker processes
+    (one per core by default). Rows come back in time order: every
+    archived forecast page becomes a row stamped with the minute it was
+    fetched, with that day's tides from the latest tide page fetched for
+    the location by then. on_row(location, observation) is called for
+    each. Returns (rows, pages_extracted, failures).
+    """
+    archive = PageArchive(root)
+    pages = {}
+    for location in locations:
+        pages[forecast_url(location, forecast_template)] = ('forecast', location)
+        station = tide_url(location, tide_template)
+        if station:
+            pages[station] = ('tides', location)
+
+    # A tide page covers the week ahead, so look back that far for the first days' tides.
+    index_start = start and (date.fromisoformat(start) - timedelta(days=7)).isoformat()
+    # Tide pages sort ahead of forecasts fetched in the same minute, as in a live tick.
+    entries = sorted((fetched_at[:16], pages[url][0] == 'forecast', fetched_at, url, digest)
+                     for fetched_at, url, digest in archive.iter_index(index_start, end)
+                     if url in pages and (pages[url][0] == 'tides' or not start or fetched_at[:10] >= start))
+
+    tasks = {}
+    for _, _, _, url, digest in entries:
+        tasks.setdefault(digest, (archive.blob_path(digest), pages[url][0]))
+
+    # A page's result is dropped after its last use, so memory stays flat over years of pages.
+    uses = Counter(digest for *_, digest in entries)
+    window = 16 * (workers or os.cpu_count() or 1)
+    rows = failures = 0
+    results = {}
+    tide_days = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Pages are submitted a window at a time in the order they were first
+        # fetched, so rows are written while later pages are still being
+        # extracted and only the window's results wait in memory.
+        remaining = iter(tasks.items())
+        submitted = deque()
+        for minute, _, _, url, digest in entries:
+            while digest not in results:
+                for task_digest, task in islice(remaining, window - len(submitted)):
+                    submitted.append((task_digest, executor.submit(_extract_blob, task)))
+                done_digest, future = submitted.popleft()
+                results[done_digest] = future.result()
+            uses[digest] -= 1
+            result = results[digest] if uses[digest] else results.pop(digest)
+            kind, location = pages[url]
+            if isinstance(result, Exception):
+                failures += 1
+                continue
+            if kind == 'tides':
+                tide_days.setdefault(url, {}).update(result)
+                continue
+            row = {'Time of Search': minute}
+            row.update(result)
+            station = tide_url(location, tide_template)
+            row.update(tide_days.get(station, {}).get(minute[:10], {}))
+            if on_row is not None:
+                on_row(location, Observation.from_row(row))
+            rows += 1
+    return rows, len(tasks), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    reextract_parser = commands.add_parser('reextract', help='rebuild observations from archived pages')
+    reextract_parser.add_argument('root')
+    output = reextract_parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--csv', help='CSV log to append the rows to')
+    output.add_argument('--parquet', help='Parquet archive directory to write the rows to')
+    reextract_parser.add_argument('--locations', help='JSON location registry (default: London)')
+    reextract_parser.add_argument('--start', help='first day, YYYY-MM-DD')
+    reextract_parser.add_argument('--end', help='last day, YYYY-MM-DD')
+    reextract_parser.add_argument('--workers', type=int, help='processes (default: one per core)')
+    args = parser.parse_args()
+
+    locations = load_locations(args.locations) if args.locations else [LONDON]
+    if args.parquet:
+        from archive import ParquetArchive
+        parquet = ParquetArchive(args.parquet, flush_rows=10000)
+        rows, pages, failures = reextract(args.root, locations, lambda location, observation:
+                                          parquet.append(observation), args.start, args.end, args.workers)
+        parquet.close()
+    else:
+        from storage import open_store
+        store = open_store(args.csv)
+        batch = []
+
+        def on_row(location, observation):
+            batch.append(observation)
+            if len(batch) >= 1000:
+                store.extend(batch)
+                batch.clear()
+
+        rows, pages, failures = reextract(args.root, locations, on_row, args.start, args.end, args.workers)
+        store.extend(batch)
+    print(f"Re-extracted {rows} rows from {pages} distinct pages ({failures} failed)")
+
+
+if __name__ == '__main__':
+    main()
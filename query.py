@@ -0,0 +1,294 @@
+"""Time-range queries over bbc_weather.csv without reading the whole log.
+
+A sidecar index (bbc_weather.csv.idx) holds one (time, byte offset) pair
+per row, sorted by time. Queries binary-search the memory-mapped index and
+read just the matching lines from the memory-mapped CSV:
+
+    log = ObservationLog('bbc_weather.csv')
+    log.between('2024-07-01', '2024-07-08')     # [Observation], oldest first
+    log.latest(48)                              # the last 48, oldest first
+
+AppendOnlyCSVStore adds to the index as it writes (index=True). Rows
+appended by anything else are picked up by the next query, and an index
+that no longer matches the CSV (rewritten, migrated) is rebuilt.
+
+    python query.py bbc_weather.csv 2024-07-01 2024-07-08
+    python query.py bbc_weather.csv --latest 10
+"""
+import argparse
+import csv
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from datetime import date, datetime
+
+from observation import Observation
+from schema import COLUMN_NAMES, london_time, parse_timestamp
+from storage import read_header
+
+MAGIC = b'WIDX'
+VERSION = 1
+
+# magic, version, number of entries, bytes of the CSV indexed and a checksum
+# of the bytes just before that; padded to 48 so the entries that follow
+# stay 8-byte aligned. Written after the entries, so a crash in between
+# leaves the old, still consistent, index.
+HEADER = struct.Struct('<4sIqq20s4x')
+ENTRY = struct.Struct('<qq')
+
+# How much of the indexed part of the CSV is checksummed to tell an append
+# from a rewrite.
+_CHECK_BYTES = 4096
+
+
+def index_path(csv_path):
+    return csv_path + '.idx'
+
+
+def to_key(moment):
+    """Returns the index key (epoch seconds) for a time.
+
+    Takes an aware datetime, a naive one or a date in London time, or a
+    'YYYY-MM-DD' / 'YYYY-MM-DD HH:MM' string.
+    """
+    if isinstance(moment, str):
+        moment = moment.strip()
+        if len(moment) == 10:
+            moment = date.fromisoformat(moment)
+        else:
+            parsed = parse_timestamp(moment)
+            if parsed is None:
+                raise ValueError(f"Can't read time {moment!r}")
+            moment = parsed
+    if isinstance(moment, datetime):
+        if moment.tzinfo is None:
+            moment = london_time(moment.year, moment.month, moment.day, moment.hour, moment.minute)
+    elif isinstance(moment, date):
+        moment = london_time(moment.year, moment.month, moment.day, 0, 0)
+    return int(moment.timestamp())
+
+
+def _row_key(text):
+    moment = parse_timestamp(text)
+    return int(moment.timestamp()) if moment is not None else None
+
+
+def _digest(f, end):
+    start = max(0, end - _CHECK_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(end - start)).digest()
+
+
+def _read_state(path):
+    """Returns (entries, bytes covered, checksum) from an index file, or None."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, count, covered, check = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return count, covered, check
+
+
+def _scan(csv_file, start, header):
+    """Returns ([(key, offset)], end) for the complete lines from start on."""
+    column = header.index('Time of Search') if 'Time of Search' in header else 0
+    csv_file.seek(start)
+    data = csv_file.read()
+    end = data.rfind(b'\n') + 1
+    entries = []
+    position = 0
+    while position < end:
+        line_end = data.index(b'\n', position)
+        line = data[position:line_end].decode('utf-8')
+        if column == 0 and not line.startswith('"'):
+            # The usual layout: an unquoted time first, no need for the csv module.
+            text = line.split(',', 1)[0]
+        else:
+            values = next(csv.reader([line]), None)
+            text = values[column] if values and len(values) > column else None
+        key = _row_key(text) if text else None
+        if key is not None:
+            entries.append((key, start + position))
+        position = line_end + 1
+    return entries, start + end
+
+
+class TimeIndex:
+    """The sorted (time, offset) sidecar of one CSV log."""
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = index_path(csv_path)
+
+    def _write(self, entries, covered, check):
+        """Rewrites the whole index with entries (any order)."""
+        entries.sort()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(entries), covered, check))
+            f.write(b''.join(ENTRY.pack(key, offset) for key, offset in entries))
+        os.replace(tmp_path, self.path)
+        return len(entries)
+
+    def _extend(self, count, entries, covered, check):
+        """Adds entries for the bytes up to covered, in place when they keep the order."""
+        ordered = all(a[0] <= b[0] for a, b in zip(entries, entries[1:]))
+        with open(self.path, 'r+b') as f:
+            if count and entries:
+                f.seek(HEADER.size + (count - 1) * ENTRY.size)
+                ordered = ordered and entries[0][0] >= ENTRY.unpack(f.read(ENTRY.size))[0]
+            if not ordered:
+                # A backfill, or the repeated hour when the clocks go back.
+                f.seek(HEADER.size)
+                existing = list(ENTRY.iter_unpack(f.read(count * ENTRY.size)))
+                return self._write(existing + entries, covered, check)
+            f.seek(HEADER.size + count * ENTRY.size)
+            f.write(b''.join(ENTRY.pack(key, offset) for key, offset in entries))
+            f.truncate()
+            f.flush()
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, count + len(entries), covered, check))
+        return count + len(entries)
+
+    def refresh(self):
+        """Brings the index up to date with the CSV and returns how many rows it holds."""
+        if not os.path.exists(self.csv_path):
+            return 0
+        header = read_header(self.csv_path)
+        if header is None:
+            return 0
+        with open(self.csv_path, 'rb') as csv_file:
+            state = _read_state(self.path)
+            size = os.fstat(csv_file.fileno()).st_size
+            if state and state[1] <= size and _digest(csv_file, state[1]) == state[2]:
+                count, covered, _ = state
+                if covered == size:
+                    return count
+                entries, end = _scan(csv_file, covered, header)
+                if end == covered:
+                    return count
+                return self._extend(count, entries, end, _digest(csv_file, end))
+            csv_file.seek(0)
+            start = len(csv_file.readline())
+            entries, end = _scan(csv_file, start, header)
+            return self._write(entries, end, _digest(csv_file, end))
+
+    def appended(self, start, lines):
+        """Records rows the caller has just appended at byte offset start.
+
+        lines is [(time text, encoded line)] in the order written. If the
+        index doesn't end exactly at start, it is refreshed from the CSV instead.
+        """
+        state = _read_state(self.path)
+        if state is None or state[1] != start:
+            self.refresh()
+            return
+        entries = []
+        position = start
+        for text, line in lines:
+            key = _row_key(text)
+            if key is not None:
+                entries.append((key, position))
+            position += len(line)
+        with open(self.csv_path, 'rb') as csv_file:
+            self._extend(state[0], entries, position, _digest(csv_file, position))
+
+
+class ObservationLog:
+    """Range and latest-N queries over a CSV log through its TimeIndex."""
+
+    def __init__(self, csv_path, refresh=True):
+        self.csv_path = csv_path
+        self.index = TimeIndex(csv_path)
+        self.refresh = refresh
+
+    def _query(self, choose):
+        """Maps the index and CSV, lets choose(keys, count) pick a slice, and reads those rows."""
+        count = len(self)
+        if not count:
+            return []
+        header = read_header(self.csv_path)
+        with open(self.index.path, 'rb') as index_file, open(self.csv_path, 'rb') as csv_file:
+            with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index_map, \
+                    mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+                view = memoryview(index_map)[HEADER.size:HEADER.size + count * ENTRY.size].cast('q')
+                try:
+                    low, high = choose(view, count)
+                    offsets = [view[2 * i + 1] for i in range(low, high)]
+                finally:
+                    view.release()
+                lines = []
+                for offset in offsets:
+                    end = csv_map.find(b'\n', offset)
+                    lines.append(csv_map[offset:end if end >= 0 else len(csv_map)].decode('utf-8'))
+        observations = []
+        for values in csv.reader(lines):
+            try:
+                observations.append(Observation.from_csv_row(values, header))
+            except ValueError:
+                continue
+        return observations
+
+    def between(self, start=None, end=None):
+        """Returns the observations with start <= time of search < end, oldest first.
+
+        start and end are anything to_key() takes; None leaves that side open.
+        """
+        low_key = to_key(start) if start is not None else None
+        high_key = to_key(end) if end is not None else None
+
+        def choose(view, count):
+            low = _bisect(view, count, low_key) if low_key is not None else 0
+            high = _bisect(view, count, high_key) if high_key is not None else count
+            return low, max(low, high)
+        return self._query(choose)
+
+    def latest(self, n):
+        """Returns the n most recent observations, oldest first."""
+        return self._query(lambda view, count: (max(0, count - n), count))
+
+    def __len__(self):
+        """Returns the number of indexed observations, catching up first if refresh is on."""
+        if self.refresh:
+            return self.index.refresh()
+        state = _read_state(self.index.path)
+        return state[0] if state else 0
+
+
+def _bisect(view, count, key):
+    """Returns the first entry whose key is >= key."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if view[2 * middle] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path')
+    parser.add_argument('start', nargs='?', help="'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM', London time")
+    parser.add_argument('end', nargs='?', help='exclusive')
+    parser.add_argument('--latest', type=int, help='the last N observations instead of a range')
+    args = parser.parse_args()
+
+    log = ObservationLog(args.csv_path)
+    observations = log.latest(args.latest) if args.latest else log.between(args.start, args.end)
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    writer.writerow(COLUMN_NAMES)
+    for observation in observations:
+        writer.writerow(observation.to_csv_row())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,571 @@
+"""Builds the weather report as one small, self-contained HTML page, without R.
+
+Usage:
+    python report.py ARCHIVE_DIR [--out report.html] [--cache DIR] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    python report.py --csv bbc_weather.csv [...]
+
+Draws the charts from r_report.rmd (temperature over time, daily tide
+range, temperature by weather condition, correlation matrix, histograms,
+sunrise/sunset, chance of rain) as inline SVG: no JavaScript, no base64
+images. Each day partition is summarized once (daily and per-condition
+statistics, correlation co-moments, histogram counts, and its time series
+cut to PER_DAY_POINTS with LTTB). The summary is cached under the
+partition's fingerprint, so a new run only reads days that changed. Long
+series are cut to --points with LTTB again before drawing, so the page
+stays the same size however much history there is. Charts whose inputs
+haven't changed are reused from the cache as they are.
+"""
+import argparse
+import glob
+import hashlib
+import html
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from aggregates import Aggregates, _merge, _new_stats, rebuild, summarize
+from schema import london_tz
+
+# Bumped whenever a summary or chart changes, so older cache entries are ignored.
+CACHE_VERSION = 2
+
+PER_DAY_POINTS = 72
+SERIES = ['current_temperature', 'high_temperature', 'precipitation_chance']
+# Histogram bin widths, as in the R report.
+HISTOGRAMS = {'high_temperature': 2, 'wind_speed': 1}
+
+WIDTH, HEIGHT = 760, 300
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 56, 20, 34, 46
+COLORS = ['#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f']
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: returns threshold (x, y) points that keep the line's shape.
+
+    The first and last points are kept; every bucket in between gives the
+    point forming the largest triangle with the previous pick and the next
+    bucket's average. Points with a NaN y are dropped first.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        picked.append(a)
+    picked.append(n - 1)
+    return x[picked], y[picked]
+
+
+# Sources: lists of (day, fingerprint, load), where load() returns that day's
+# rows as an Arrow table with archive.SCHEMA's columns.
+
+def archive_partitions(root):
+    """The day partitions of a Parquet archive, fingerprinted by their files' names, sizes and mtimes."""
+    import pyarrow.dataset as ds
+    from archive import SCHEMA
+
+    partitions = []
+    for directory in sorted(glob.glob(os.path.join(root, 'date=*'))):
+        files = sorted(glob.glob(os.path.join(directory, '*.parquet')))
+        if not files:
+            continue
+        digest = hashlib.sha1()
+        for path in files:
+            stat = os.stat(path)
+            digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+        day = os.path.basename(directory)[len('date='):]
+        partitions.append((day, digest.hexdigest(),
+                           lambda files=files: ds.dataset(files, format='parquet', schema=SCHEMA).to_table()))
+    return partitions
+
+
+def csv_partitions(csv_path):
+    """The days of a CSV log (through history.load_history), fingerprinted by their rows."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from history import load_history
+
+    table = load_history(csv_path)
+    if not table.num_rows:
+        return []
+    days = pc.strftime(table.column('time_of_search'), format='%Y-%m-%d').to_pylist()
+    partitions = []
+    start = 0
+    # The table is sorted by time, so each day is one contiguous slice.
+    for i in range(1, len(days) + 1):
+        if i == len(days) or days[i] != days[start]:
+            part = table.slice(start, i - start)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, part.schema) as writer:
+                writer.write_table(part)
+            partitions.append((days[start], hashlib.sha1(sink.getvalue()).hexdigest(), lambda part=part: part))
+            start = i
+    return partitions
+
+
+def summarize_partition(table):
+    """Returns the JSON-able summary of one day's rows that the charts are drawn from."""
+    table = table.sort_by('time_of_search')
+    times = table.column('time_of_search').cast('int64').to_numpy().astype(float)
+    series = {}
+    for metric in SERIES:
+        values = table.column(metric).fill_null(math.nan).to_numpy()
+        x, y = lttb(times, values, PER_DAY_POINTS)
+        series[metric] = [x.tolist(), y.tolist()]
+
+    histograms = {}
+    for metric, width in HISTOGRAMS.items():
+        values = table.column(metric).drop_null().to_numpy()
+        bins, counts = np.unique(np.floor(values / width).astype(int), return_counts=True)
+        histograms[metric] = {str(b): int(c) for b, c in zip(bins, counts)}
+
+    sun = {}
+    for name in ('sunrise', 'sunset'):
+        values = table.column(name).drop_null()
+        if len(values):
+            moment = values[len(values) - 1].as_py()
+            sun[name] = moment.hour * 60 + moment.minute
+
+    return {'version': CACHE_VERSION, 'rows': table.num_rows, 'aggregates': rebuild(table).state(),
+            'series': series, 'histograms': histograms, 'sun': sun}
+
+
+def load_summaries(partitions, cache_dir):
+    """Returns {day: summary}, reading only partitions whose fingerprint isn't cached."""
+    directory = os.path.join(cache_dir, 'days')
+    os.makedirs(directory, exist_ok=True)
+    summaries = {}
+    computed = 0
+    for day, fingerprint, load in partitions:
+        path = os.path.join(directory, f'{day}-{fingerprint[:16]}.json')
+        summary = None
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                summary = json.load(f)
+            if summary.get('version') != CACHE_VERSION:
+                summary = None
+        if summary is None:
+            summary = summarize_partition(load())
+            computed += 1
+            for stale in glob.glob(os.path.join(directory, f'{day}-*.json')):
+                os.remove(stale)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f)
+            os.replace(tmp_path, path)
+        summaries[day] = summary
+    return summaries, computed
+
+
+# SVG drawing. Every chart is a WIDTH x HEIGHT <svg> with a title, axes and
+# one kind of mark.
+
+def _nice_ticks(low, high, count=6):
+    if not high > low:
+        high = low + 1
+    raw = (high - low) / count
+    step = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 2.5, 5, 10):
+        if step * multiple >= raw:
+            step *= multiple
+            break
+    first = math.ceil(low / step) * step
+    return [first + i * step for i in range(int((high - first) / step + 1e-9) + 1)]
+
+
+# Naive London wall-clock times are counted in seconds from here.
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _day_start(day):
+    """Epoch seconds of London midnight on a 'YYYY-MM-DD' day, as the data is London time."""
+    return london_tz.localize(datetime.strptime(day, '%Y-%m-%d')).timestamp()
+
+
+def _wall_clock(t):
+    return (datetime.fromtimestamp(t, london_tz).replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def _time_ticks(low, high, count=7):
+    """[(epoch seconds, label)] on London hours or midnights between low and high."""
+    low, high = _wall_clock(low), _wall_clock(high)
+    span = high - low
+    for step in (3600, 3 * 3600, 6 * 3600, 86400, 2 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+                 91 * 86400, 365 * 86400):
+        if span / step <= count:
+            break
+    first = math.ceil(low / step) * step
+    label = '%H:%M' if step < 86400 else '%d %b' if span < 300 * 86400 else '%b %Y'
+    ticks = []
+    tick = first
+    while tick <= high:
+        local = _EPOCH + timedelta(seconds=tick)
+        ticks.append((london_tz.localize(local).timestamp(), local.strftime(label)))
+        tick += step
+    return ticks
+
+
+def _clock_ticks(low, high, count=6):
+    """Ticks on whole hours (or half hours) for values in minutes after midnight."""
+    for step in (30, 60, 120, 180, 240, 360):
+        if (high - low) / step <= count:
+            break
+    first = math.floor(low / step) * step
+    return [first + i * step for i in range(max(1, math.ceil((high - first) / step)) + 1)]
+
+
+def _format(value):
+    return f'{value:g}' if abs(value) < 1e6 else f'{value:.3g}'
+
+
+class _Chart:
+    """Maps data to pixels for one chart and collects its SVG elements."""
+
+    def __init__(self, title, x_range, y_range, x_label='', y_label=''):
+        self.x0, self.x1 = x_range
+        self.y0, self.y1 = y_range
+        if not self.x1 > self.x0:
+            self.x1 = self.x0 + 1
+        if not self.y1 > self.y0:
+            self.y1 = self.y0 + 1
+        self.left, self.right = MARGIN_LEFT, WIDTH - MARGIN_RIGHT
+        self.top, self.bottom = MARGIN_TOP, HEIGHT - MARGIN_BOTTOM
+        self.parts = [f'<text x="{WIDTH / 2}" y="20" class="title">{html.escape(title)}</text>']
+        if x_label:
+            self.parts.append(f'<text x="{(self.left + self.right) / 2}" y="{HEIGHT - 6}" class="label">'
+                              f'{html.escape(x_label)}</text>')
+        if y_label:
+            self.parts.append(f'<text x="14" y="{(self.top + self.bottom) / 2}" class="label" '
+                              f'transform="rotate(-90 14 {(self.top + self.bottom) / 2})">{html.escape(y_label)}</text>')
+
+    def x(self, value):
+        return self.left + (value - self.x0) / (self.x1 - self.x0) * (self.right - self.left)
+
+    def y(self, value):
+        return self.bottom - (value - self.y0) / (self.y1 - self.y0) * (self.bottom - self.top)
+
+    def y_axis(self, ticks, format=_format):
+        for tick in ticks:
+            y = self.y(tick)
+            self.parts.append(f'<line x1="{self.left}" x2="{self.right}" y1="{y:.1f}" y2="{y:.1f}" class="grid"/>'
+                              f'<text x="{self.left - 6}" y="{y + 4:.1f}" class="tick" text-anchor="end">'
+                              f'{format(tick)}</text>')
+
+    def x_axis(self, ticks):
+        """ticks is [(value, label)]."""
+        for value, label in ticks:
+            x = self.x(value)
+            self.parts.append(f'<text x="{x:.1f}" y="{self.bottom + 16}" class="tick">{html.escape(label)}</text>')
+        self.parts.append(f'<line x1="{self.left}" x2="{self.right}" y1="{self.bottom}" y2="{self.bottom}" '
+                          f'class="axis"/>')
+
+    def line(self, xs, ys, color, dots=False):
+        points = ' '.join(f'{self.x(x):.1f},{self.y(y):.1f}' for x, y in zip(xs, ys))
+        self.parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+        if dots:
+            self.parts.extend(f'<circle cx="{self.x(x):.1f}" cy="{self.y(y):.1f}" r="2.5" fill="{color}"/>'
+                              for x, y in zip(xs, ys))
+
+    def legend(self, names):
+        for i, (name, color) in enumerate(names):
+            x = self.left + 10 + i * 170
+            self.parts.append(f'<rect x="{x}" y="{self.top - 4}" width="10" height="10" fill="{color}"/>'
+                              f'<text x="{x + 14}" y="{self.top + 5}" class="tick" text-anchor="start">'
+                              f'{html.escape(name)}</text>')
+
+    def svg(self):
+        return (f'<svg viewBox="0 0 {WIDTH} {HEIGHT}" width="{WIDTH}" height="{HEIGHT}" '
+                f'xmlns="http://www.w3.org/2000/svg">{"".join(self.parts)}</svg>')
+
+
+def line_chart(title, series, y_label, time_axis=True, x_label='', dots=False, y_ticks=_nice_ticks,
+               y_format=_format):
+    """series is [(name, xs, ys)]; xs are epoch seconds when time_axis is set."""
+    series = [(name, list(xs), list(ys)) for name, xs, ys in series if len(xs)]
+    if not series:
+        return _empty(title)
+    all_x = [x for _, xs, _ in series for x in xs]
+    all_y = [y for _, _, ys in series for y in ys]
+    ticks = y_ticks(min(all_y), max(all_y))
+    chart = _Chart(title, (min(all_x), max(all_x)), (min(ticks), max(ticks)), x_label, y_label)
+    chart.y_axis(ticks, y_format)
+    x_ticks = _time_ticks(chart.x0, chart.x1) if time_axis else [(t, _format(t)) for t in _nice_ticks(chart.x0, chart.x1)]
+    chart.x_axis(x_ticks)
+    for (name, xs, ys), color in zip(series, COLORS):
+        chart.line(xs, ys, color, dots)
+    if len(series) > 1:
+        chart.legend([(name, color) for (name, _, _), color in zip(series, COLORS)])
+    return chart.svg()
+
+
+def bar_chart(title, labels, values, y_label, errors=None, x_label='', rotate=False, gap=0.2):
+    if not labels:
+        return _empty(title)
+    errors = errors or [0] * len(values)
+    top = max(v + e for v, e in zip(values, errors))
+    y_ticks = _nice_ticks(min(0, min(values)), top)
+    chart = _Chart(title, (0, len(labels)), (min(y_ticks), max(y_ticks)), x_label, y_label)
+    if rotate:
+        chart.bottom -= 40
+    chart.y_axis(y_ticks)
+    for i, (label, value, error) in enumerate(zip(labels, values, errors)):
+        x0, x1 = chart.x(i + gap / 2), chart.x(i + 1 - gap / 2)
+        y = chart.y(value)
+        chart.parts.append(f'<rect x="{x0:.1f}" y="{min(y, chart.y(0)):.1f}" width="{x1 - x0:.1f}" '
+                           f'height="{abs(chart.y(0) - y):.1f}" fill="{COLORS[0]}"/>')
+        if error:
+            middle = (x0 + x1) / 2
+            chart.parts.append(f'<line x1="{middle:.1f}" x2="{middle:.1f}" y1="{chart.y(value - error):.1f}" '
+                               f'y2="{chart.y(value + error):.1f}" stroke="#333"/>')
+        if label is not None:
+            x = (x0 + x1) / 2
+            if rotate:
+                chart.parts.append(f'<text x="{x:.1f}" y="{chart.bottom + 10}" class="tick" text-anchor="end" '
+                                   f'transform="rotate(-35 {x:.1f} {chart.bottom + 10})">{html.escape(label)}</text>')
+            else:
+                chart.parts.append(f'<text x="{x:.1f}" y="{chart.bottom + 16}" class="tick">{html.escape(label)}</text>')
+    chart.parts.append(f'<line x1="{chart.left}" x2="{chart.right}" y1="{chart.y(0):.1f}" y2="{chart.y(0):.1f}" '
+                       f'class="axis"/>')
+    return chart.svg()
+
+
+def histogram(title, counts, width, x_label):
+    """counts maps bin number (value // width) to a count."""
+    if not counts:
+        return _empty(title)
+    bins = range(min(counts), max(counts) + 1)
+    labels = [_format(b * width) if len(bins) <= 25 or b % 2 == 0 else '' for b in bins]
+    return bar_chart(title, labels, [counts.get(b, 0) for b in bins], 'Frequency', x_label=x_label, gap=0.04)
+
+
+def heatmap(title, labels, matrix):
+    size = len(labels)
+    cell = min((HEIGHT - MARGIN_TOP - 90) / size, 40)
+    left = WIDTH / 2 - cell * size / 2 + 40
+    parts = [f'<text x="{WIDTH / 2}" y="20" class="title">{html.escape(title)}</text>']
+    for i, label in enumerate(labels):
+        parts.append(f'<text x="{left - 6}" y="{MARGIN_TOP + 10 + (i + 0.6) * cell:.1f}" class="tick" '
+                     f'text-anchor="end">{html.escape(label)}</text>')
+        x = left + (i + 0.5) * cell
+        y = MARGIN_TOP + 16 + size * cell
+        parts.append(f'<text x="{x:.1f}" y="{y:.1f}" class="tick" text-anchor="end" '
+                     f'transform="rotate(-35 {x:.1f} {y:.1f})">{html.escape(label)}</text>')
+        for j in range(size):
+            value = matrix[i][j]
+            if value is None:
+                color, text = '#eee', ''
+            else:
+                # Blue for negative, red for positive correlations.
+                strength = int(255 * (1 - min(abs(value), 1)))
+                color = f'rgb({strength},{strength},255)' if value < 0 else f'rgb(255,{strength},{strength})'
+                text = f'{value:.2f}'
+            parts.append(f'<rect x="{left + j * cell:.1f}" y="{MARGIN_TOP + 10 + i * cell:.1f}" width="{cell:.1f}" '
+                         f'height="{cell:.1f}" fill="{color}" stroke="#fff"/>'
+                         f'<text x="{left + (j + 0.5) * cell:.1f}" y="{MARGIN_TOP + 14 + (i + 0.5) * cell:.1f}" '
+                         f'class="cell">{text}</text>')
+    return (f'<svg viewBox="0 0 {WIDTH} {HEIGHT}" width="{WIDTH}" height="{HEIGHT}" '
+            f'xmlns="http://www.w3.org/2000/svg">{"".join(parts)}</svg>')
+
+
+def _empty(title):
+    return (f'<svg viewBox="0 0 {WIDTH} 60" width="{WIDTH}" height="60" xmlns="http://www.w3.org/2000/svg">'
+            f'<text x="{WIDTH / 2}" y="20" class="title">{html.escape(title)}</text>'
+            f'<text x="{WIDTH / 2}" y="44" class="tick">No data</text></svg>')
+
+
+def _clock(minutes):
+    return f'{int(minutes) // 60:02d}:{int(minutes) % 60:02d}'
+
+
+# The charts. Each takes the merged Aggregates, {day: summary} and the
+# options, and returns an SVG string.
+
+def _joined_series(summaries, metric, points):
+    xs, ys = [], []
+    for day in sorted(summaries):
+        x, y = summaries[day]['series'][metric]
+        xs.extend(x)
+        ys.extend(y)
+    return lttb(xs, ys, points)
+
+
+def temperature_chart(aggregates, summaries, points):
+    series = []
+    for metric, name in (('high_temperature', 'High temperature'), ('current_temperature', 'Current temperature')):
+        xs, ys = _joined_series(summaries, metric, points)
+        series.append((name, xs, ys))
+    return line_chart('Temperature Over Time', series, 'Temperature (°C)')
+
+
+def tide_chart(aggregates, summaries, points):
+    days = aggregates.daily_summary('tide_height')
+    xs = [_day_start(day) for day, _ in days]
+    return line_chart('Daily Maximum and Minimum Tide Heights',
+                      [('Maximum tide height', xs, [s.max for _, s in days]),
+                       ('Minimum tide height', xs, [s.min for _, s in days])], 'Tide Height (m)')
+
+
+def condition_chart(aggregates, summaries, points):
+    rows = [(condition, summary) for condition, summary in aggregates.condition_summary('high_temperature').items()
+            if summary.count]
+    rows.sort(key=lambda row: row[1].mean)
+    errors = [summary.sd / math.sqrt(summary.count) if summary.sd else 0 for _, summary in rows]
+    return bar_chart('Average High Temperature by Weather Condition', [condition for condition, _ in rows],
+                     [summary.mean for _, summary in rows], 'Average High Temperature (°C)', errors=errors,
+                     rotate=True)
+
+
+def correlation_chart(aggregates, summaries, points):
+    labels, matrix = aggregates.correlation_matrix()
+    return heatmap('Correlation Matrix', [label.replace('_', ' ') for label in labels], matrix)
+
+
+def histogram_chart(metric, title, x_label):
+    def chart(aggregates, summaries, points):
+        counts = {}
+        for summary in summaries.values():
+            for b, count in summary['histograms'][metric].items():
+                counts[int(b)] = counts.get(int(b), 0) + count
+        return histogram(title, counts, HISTOGRAMS[metric], x_label)
+    return chart
+
+
+def sun_chart(aggregates, summaries, points):
+    series = []
+    for name in ('sunrise', 'sunset'):
+        days = [(day, summary['sun'][name]) for day, summary in sorted(summaries.items()) if name in summary['sun']]
+        xs = [_day_start(day) for day, _ in days]
+        xs, ys = lttb(xs, [minutes for _, minutes in days], points)
+        series.append((name.capitalize(), xs, ys))
+    return line_chart('Sunrise and Sunset Times', series, 'Time', y_ticks=_clock_ticks, y_format=_clock)
+
+
+def precipitation_chart(aggregates, summaries, points):
+    xs, ys = _joined_series(summaries, 'precipitation_chance', points)
+    return line_chart('Chance of Precipitation Over Time', [('Chance of precipitation', xs, ys)],
+                      'Chance of Precipitation (%)')
+
+
+CHARTS = [
+    ('temperature', temperature_chart),
+    ('tides', tide_chart),
+    ('conditions', condition_chart),
+    ('correlation', correlation_chart),
+    ('high_temperature_histogram', histogram_chart('high_temperature', 'Distribution of High Temperatures',
+                                                   'High Temperature (°C)')),
+    ('wind_histogram', histogram_chart('wind_speed', 'Distribution of Wind Speed', 'Wind Speed (mph)')),
+    ('sun', sun_chart),
+    ('precipitation', precipitation_chart),
+]
+
+
+def _summary_table(aggregates):
+    total = {}
+    for metrics in aggregates.daily.values():
+        for metric, stats in metrics.items():
+            _merge(total.setdefault(metric, _new_stats()), stats)
+    rows = []
+    for metric, stats in sorted(total.items()):
+        summary = summarize(stats)
+        cells = [metric.replace('_', ' '), str(summary.count)] + [
+            '' if value is None else f'{value:.2f}' for value in (summary.mean, summary.sd, summary.min, summary.max)]
+        rows.append('<tr>' + ''.join(f'<td>{html.escape(cell)}</td>' for cell in cells) + '</tr>')
+    return ('<table><tr><th>Field</th><th>Count</th><th>Mean</th><th>SD</th><th>Min</th><th>Max</th></tr>'
+            + ''.join(rows) + '</table>')
+
+
+STYLE = '''body{font-family:sans-serif;max-width:800px;margin:2em auto;color:#222}
+svg{display:block;margin:1.5em 0}.title{font-size:15px;font-weight:bold;text-anchor:middle}
+.label{font-size:12px;text-anchor:middle}.tick{font-size:10px;text-anchor:middle;fill:#444}
+.cell{font-size:10px;text-anchor:middle}.grid{stroke:#e5e5e5}.axis{stroke:#888}
+table{border-collapse:collapse;font-size:13px}td,th{padding:2px 10px;text-align:right}
+td:first-child,th:first-child{text-align:left}tr:nth-child(even){background:#f4f4f4}'''
+
+
+def build_report(partitions, out_path, cache_dir, points=800):
+    """Writes the HTML report and returns (partitions summarized anew, charts redrawn)."""
+    summaries, computed = load_summaries(partitions, cache_dir)
+    aggregates = Aggregates()
+    for day in sorted(summaries):
+        day_aggregates = Aggregates()
+        day_aggregates._load(summaries[day]['aggregates'])
+        aggregates.merge(day_aggregates)
+
+    # A chart is redrawn only if a partition it is drawn from, or the options, changed.
+    inputs = hashlib.sha1(json.dumps([CACHE_VERSION, points, [(day, fingerprint)
+                                                               for day, fingerprint, _ in partitions]]).encode())
+    chart_dir = os.path.join(cache_dir, 'charts')
+    os.makedirs(chart_dir, exist_ok=True)
+    svgs = []
+    drawn = 0
+    for name, draw in CHARTS:
+        path = os.path.join(chart_dir, f'{name}-{inputs.hexdigest()[:16]}.svg')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                svgs.append(f.read())
+            continue
+        svg = draw(aggregates, summaries, points)
+        drawn += 1
+        for stale in glob.glob(os.path.join(chart_dir, f'{name}-*.svg')):
+            os.remove(stale)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(svg)
+        svgs.append(svg)
+
+    rows = sum(summary['rows'] for summary in summaries.values())
+    days = sorted(summaries)
+    period = f'{days[0]} to {days[-1]}' if days else 'no data'
+    page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Weather Data Analysis</title>'
+            f'<style>{STYLE}</style></head><body><h1>Weather Data Analysis</h1>'
+            f'<p>{rows} observations over {len(days)} days ({period}). '
+            f'Generated {datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M")} UTC.</p>'
+            f'<h2>Summary</h2>{_summary_table(aggregates)}<h2>Charts</h2>{"".join(svgs)}</body></html>')
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(page)
+    os.replace(tmp_path, out_path)
+    return computed, drawn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('archive', nargs='?', help='Parquet archive directory (archive.py)')
+    parser.add_argument('--csv', help='read a bbc_weather.csv log instead of an archive')
+    parser.add_argument('--out', default='report.html')
+    parser.add_argument('--cache', help='where summaries and charts are kept (default: next to --out)')
+    parser.add_argument('--start', help='first day to include, YYYY-MM-DD')
+    parser.add_argument('--end', help='last day to include, YYYY-MM-DD')
+    parser.add_argument('--points', type=int, default=800, help='most points drawn per line')
+    args = parser.parse_args()
+    if bool(args.archive) == bool(args.csv):
+        parser.error('give either an archive directory or --csv')
+
+    started = time.perf_counter()
+    partitions = archive_partitions(args.archive) if args.archive else csv_partitions(args.csv)
+    partitions = [p for p in partitions
+                  if (args.start is None or p[0] >= args.start) and (args.end is None or p[0] <= args.end)]
+    cache_dir = args.cache or os.path.splitext(args.out)[0] + '_cache'
+    computed, drawn = build_report(partitions, args.out, cache_dir, args.points)
+    print(f"Wrote {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB) in {time.perf_counter() - started:.2f}s: "
+          f"{len(partitions)} days, {computed} summarized, {drawn}/{len(CHARTS)} charts drawn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import metrics
+from schema import london_tz
+
+
+class SystemClock:
+    """The real clocks: London wall time to pick slots, monotonic time to wait."""
+
+    def now(self):
+        return datetime.now(london_tz)
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """A clock that only moves when something sleeps on it or advances it.
+
+    Lets a Scheduler run through a day of slots instantly; every sleep is
+    recorded in sleeps.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.elapsed = 0.0
+        self.sleeps = []
+
+    def now(self):
+        return (self.start + timedelta(seconds=self.elapsed)).astimezone(london_tz)
+
+    def monotonic(self):
+        return self.elapsed
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """Moves time forward, e.g. to stand in for a slow job."""
+        self.elapsed += max(0.0, seconds)
+
+
+def slot_at_or_after(moment, interval):
+    """Returns the first slot boundary at or after moment, as a London datetime.
+
+    Boundaries are whole multiples of interval seconds since the epoch, so
+    any interval that divides an hour lands on :00, :10, ... London time.
+    """
+    seconds = moment.timestamp()
+    boundary = -(-seconds // interval) * interval
+    return datetime.fromtimestamp(boundary, timezone.utc).astimezone(london_tz)
+
+
+class Scheduler:
+    """Runs job(slot) on fixed wall-clock boundaries instead of sleeping a fixed gap.
+
+    slot is the London datetime the run was scheduled for, so the work done
+    in a run never pushes the next one later. Waits are measured on the
+    monotonic clock. If job raises, it is retried after retry_delay seconds,
+    doubling up to max_retry_delay, until it succeeds or the next slot comes
+    round. With catch_up, slots missed while the job overran or the process
+    was down (remembered in state_path) are run straight away, oldest first,
+    up to max_catch_up of them.
+    """
+
+    def __init__(self, job, interval, clock=None, retry_delay=15, max_retry_delay=300,
+                 catch_up=False, max_catch_up=12, state_path=None):
+        self.job = job
+        self.interval = interval
+        self.clock = clock or SystemClock()
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.catch_up = catch_up
+        self.max_catch_up = max_catch_up
+        self.state_path = state_path
+        self.last_slot = self._load_state()
+        self.missed = 0
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return datetime.fromisoformat(json.load(f)['last_slot']).astimezone(london_tz)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable schedule state {self.state_path}: {e}")
+            return None
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_slot': self.last_slot.isoformat()}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def sleep_until(self, moment):
+        """Sleeps until the wall-clock moment, timing the wait on the monotonic clock."""
+        deadline = self.clock.monotonic() + (moment - self.clock.now()).total_seconds()
+        while True:
+            remaining = deadline - self.clock.monotonic()
+            if remaining <= 0:
+                return
+            self.clock.sleep(remaining)
+
+    def next_slots(self):
+        """Returns the slots to run next: any missed ones to catch up, then the upcoming one."""
+        now = self.clock.now()
+        upcoming = slot_at_or_after(now, self.interval)
+        if self.last_slot is None:
+            return [upcoming]
+        step = timedelta(seconds=self.interval)
+        first_due = slot_at_or_after(self.last_slot + step, self.interval)
+        upcoming = max(upcoming, first_due)
+        missed = []
+        slot = first_due
+        while slot < upcoming and slot <= now:
+            missed.append(slot)
+            slot = (slot + step).astimezone(london_tz)
+        if not self.catch_up:
+            self.missed += len(missed)
+            return [upcoming]
+        skipped = max(0, len(missed) - self.max_catch_up)
+        self.missed += skipped
+        return missed[skipped:] + [upcoming]
+
+    def run_slot(self, slot):
+        """Runs the job for one slot, retrying with backoff until it succeeds or the slot is over.
+
+        Returns True if the job succeeded.
+        """
+        next_slot = slot + timedelta(seconds=self.interval)
+        delay = self.retry_delay
+        while True:
+            try:
+                self.job(slot)
+                return True
+            except Exception as e:
+                metrics.count('job_errors')
+                retry_at = self.clock.now() + timedelta(seconds=delay)
+                if retry_at >= next_slot:
+                    print(f"Slot {slot:%Y-%m-%d %H:%M} failed ({e}); giving up until the next slot")
+                    return False
+                print(f"Slot {slot:%Y-%m-%d %H:%M} failed ({e}); retrying in {delay:g}s")
+                self.sleep_until(retry_at)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    def run(self, max_runs=None):
+        """Runs slots forever, or until max_runs slots have been attempted."""
+        runs = 0
+        while max_runs is None or runs < max_runs:
+            for slot in self.next_slots():
+                if max_runs is not None and runs >= max_runs:
+                    break
+                self.sleep_until(slot)
+                if not self.run_slot(slot):
+                    self.missed += 1
+                self.last_slot = slot
+                self._save_state()
+                runs += 1
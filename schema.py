@@ -0,0 +1,134 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+from datetime import datetime
+
+import pytz
+
+london_tz = pytz.timezone('Europe/London')
+
+# One column of bbc_weather.csv: its CSV header, the snake_case name used by
+# the typed stores, and what kind of value it holds:
+#   timestamp - 'YYYY-MM-DD HH:MM' London time
+#   clock     - 'HH:MM' London time on the day of the observation
+#   float     - a number, possibly with a unit suffix
+#   category  - one of a small set of labels
+#   text      - free text
+Column = namedtuple('Column', ['name', 'field', 'kind'])
+
+COLUMNS = [
+    Column('Time of Search', 'time_of_search', 'timestamp'),
+    Column('High Temperature(°C)', 'high_temperature', 'float'),
+    Column('Low Temperature(°C)', 'low_temperature', 'float'),
+    Column('Current Temperature(°C)', 'current_temperature', 'float'),
+    Column('Weather Condition', 'weather_condition', 'category'),
+    Column('Wind Speed(mph)', 'wind_speed', 'float'),
+    Column('Humidity(%)', 'humidity', 'float'),
+    Column('Pressure(mb)', 'pressure', 'float'),
+    Column('Visibility', 'visibility', 'category'),
+    Column('Location', 'location', 'text'),
+    Column('Wind Direction', 'wind_direction', 'category'),
+    Column('UV Index', 'uv_index', 'category'),
+    Column('Pollen', 'pollen', 'category'),
+    Column('Pollution', 'pollution', 'category'),
+    Column('Chance of Precipitation(%)', 'precipitation_chance', 'float'),
+    Column('Sunset', 'sunset', 'clock'),
+    Column('Sunrise', 'sunrise', 'clock'),
+    Column('Low Tide Morning Time', 'low_tide_morning_time', 'clock'),
+    Column('Low Tide Morning Height(M)', 'low_tide_morning_height', 'float'),
+    Column('High Tide Morning Time', 'high_tide_morning_time', 'clock'),
+    Column('High Tide Morning Height(M)', 'high_tide_morning_height', 'float'),
+    Column('Low Tide Evening Time', 'low_tide_evening_time', 'clock'),
+    Column('Low Tide Evening Height(M)', 'low_tide_evening_height', 'float'),
+    Column('High Tide Evening Time', 'high_tide_evening_time', 'clock'),
+    Column('High Tide Evening Height(M)', 'high_tide_evening_height', 'float'),
+]
+
+COLUMN_NAMES = [column.name for column in COLUMNS]
+
+# Values the scraper writes when a field could not be read.
+MISSING = {'', 'N/A', 'Unknown', 'nan', 'NaN'}
+
+_NOT_NUMBER = re.compile(r'[^0-9.\-]')
+
+
+def is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value
+    return isinstance(value, str) and value.strip() in MISSING
+
+
+def parse_float(value):
+    """Parses a number such as 12.0, '1012', '1012 mb' or '72%'; None if missing."""
+    if is_missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(_NOT_NUMBER.sub('', value))
+    except ValueError:
+        return None
+
+
+def parse_text(value):
+    """Returns a stripped string, or None if missing."""
+    if is_missing(value):
+        return None
+    return str(value).strip()
+
+
+@lru_cache(maxsize=4096)
+def _london_offset(year, month, day, hour):
+    """Returns the pytz tzinfo (GMT or BST) in force at that London hour."""
+    return london_tz.localize(datetime(year, month, day, hour)).tzinfo
+
+
+def london_time(year, month, day, hour, minute):
+    """Returns an aware London datetime, much faster than localize() per value."""
+    return datetime(year, month, day, hour, minute, tzinfo=_london_offset(year, month, day, hour))
+
+
+def parse_timestamp(value):
+    """Parses 'YYYY-MM-DD HH:MM' London time into an aware datetime; None if missing."""
+    if is_missing(value):
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else london_tz.localize(value)
+    value = value.strip()
+    try:
+        return london_time(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                           int(value[11:13]), int(value[14:16]))
+    except ValueError:
+        return None
+
+
+def parse_clock(value, day):
+    """Parses 'HH:MM' as London time on the date of day; None if missing."""
+    if is_missing(value) or day is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    value = value.strip()
+    try:
+        return london_time(day.year, day.month, day.day, int(value[0:2]), int(value[3:5]))
+    except ValueError:
+        return None
+
+
+def coerce_row(row):
+    """Converts a scraped or CSV row (keyed by CSV header) into typed values keyed by field."""
+    time_of_search = parse_timestamp(row.get('Time of Search'))
+    typed = {}
+    for column in COLUMNS:
+        value = row.get(column.name)
+        if column.kind == 'timestamp':
+            typed[column.field] = parse_timestamp(value)
+        elif column.kind == 'clock':
+            typed[column.field] = parse_clock(value, time_of_search)
+        elif column.kind == 'float':
+            typed[column.field] = parse_float(value)
+        else:
+            typed[column.field] = parse_text(value)
+    return typed
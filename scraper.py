@@ -0,0 +1,160 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+import pytz
+
+import metrics
+from extraction import TIDE_FIELDS, extract_all_tides, extract_forecast, extract_forecast_page
+from fetch import DEFAULT_TIMEOUT, fetch_all, fetch_and_parse
+from locations import LONDON, forecast_url, tide_url
+from schema import is_missing
+
+FORECAST_URL = forecast_url(LONDON)
+TIDE_URL = tide_url(LONDON)
+
+# Define London timezone
+london_tz = pytz.timezone('Europe/London')
+
+
+def current_time_of_search():
+    """Returns the current London time formatted as YYYY-MM-DD HH:MM."""
+    return datetime.now(london_tz).strftime('%Y-%m-%d %H:%M')
+
+
+def scrape_tide_times(session, today_date=None, url=TIDE_URL, timeout=DEFAULT_TIMEOUT, cache=None,
+                      tide_cache=None):
+    """Scrapes today's tide times and heights from the tide table page.
+
+    With a tides.TideCache the page is only fetched when today isn't cached yet.
+    """
+    if today_date is None:
+        today_date = datetime.now(london_tz).strftime('%Y-%m-%d')
+    with metrics.timed('scrape_tide_times'):
+        if tide_cache is not None:
+            tide_times = tide_cache.get(url, today_date)
+            if tide_times is not None:
+                return tide_times
+        days = fetch_and_parse(session, url, extract_all_tides, timeout, cache, 'tide_days')
+        if tide_cache is not None:
+            tide_cache.update(url, days)
+        return days.get(today_date) or missing_tide_times()
+
+
+def missing_tide_times():
+    """Returns the tide columns filled with their missing value."""
+    return {field.name: field.missing for field in TIDE_FIELDS}
+
+
+def convert_to_datetime(time_str):
+    """Converts a string time format into datetime format."""
+    try:
+        return datetime.strptime(time_str, '%H:%M')
+    except ValueError:
+        return "N/A"
+
+
+def get_weather_data(session, time_of_search=None, forecast_url=FORECAST_URL, tide_url=TIDE_URL,
+                     timeout=DEFAULT_TIMEOUT, cache=None, tide_cache=None):
+    """Fetches weather data from the specified URL and returns it as a dictionary.
+
+    The forecast and tide pages are downloaded at the same time. If the tide
+    page fails the row is still returned, with the tide columns set to "N/A";
+    a failed forecast page raises. Pass tide_url=None for places without a
+    tide station. Pass a fetch.PageCache to skip re-parsing unchanged pages
+    and a tides.TideCache to skip the tide page on days already cached.
+    """
+    weather_data, _ = _scrape(session, time_of_search, forecast_url, tide_url, timeout, cache, tide_cache,
+                              extract_forecast, 'forecast')
+    return weather_data
+
+
+def get_weather_and_forecast(session, time_of_search=None, forecast_url=FORECAST_URL, tide_url=TIDE_URL,
+                             timeout=DEFAULT_TIMEOUT, cache=None, tide_cache=None):
+    """Like get_weather_data, but also returns the page's whole forecast.
+
+    Returns (weather_data, ForecastTable); the table comes from the same
+    download and parse as the row.
+    """
+    weather_data, page = _scrape(session, time_of_search, forecast_url, tide_url, timeout, cache, tide_cache,
+                                 extract_forecast_page, 'forecast_page', current_of=itemgetter('current'))
+    return weather_data, forecast_table(page, weather_data['Time of Search'])
+
+
+# Column arrays for one forecast page. hourly has a row per hourly slot and
+# daily a row per day link; both start with issued_at (the time of search)
+# and target_time ('YYYY-MM-DD HH:MM' for slots, 'YYYY-MM-DD' for days).
+ForecastTable = namedtuple('ForecastTable', ['hourly', 'daily'])
+
+
+def forecast_table(page, time_of_search):
+    """Stamps extract_forecast_page's columns with issue and target times."""
+    issued = datetime.strptime(time_of_search, '%Y-%m-%d %H:%M')
+    day = issued.date()
+    previous_hour = issued.hour
+    targets = []
+    for label in page['hourly']['time']:
+        try:
+            hour, minute = int(label[:2]), int(label[3:5])
+        except (TypeError, ValueError):
+            targets.append(None)
+            continue
+        # The slots run on past midnight into the next day; a small step back
+        # is just a slot that started before the time of search.
+        if hour < previous_hour - 12:
+            day += timedelta(days=1)
+        previous_hour = hour
+        targets.append(f'{day:%Y-%m-%d} {hour:02d}:{minute:02d}')
+
+    hourly = {'issued_at': [time_of_search] * len(targets), 'target_time': targets}
+    hourly.update((name, values) for name, values in page['hourly'].items() if name != 'time')
+    days = page['daily']['day']
+    daily = {'issued_at': [time_of_search] * len(days),
+             'target_time': [f'{issued.date() + timedelta(days=n):%Y-%m-%d}' for n in days]}
+    daily.update((name, values) for name, values in page['daily'].items() if name != 'day')
+    return ForecastTable(hourly, daily)
+
+
+def _scrape(session, time_of_search, forecast_url, tide_url, timeout, cache, tide_cache,
+            extract, key, current_of=None):
+    """Fetches a forecast and its tides; returns (weather_data, what extract returned).
+
+    current_of picks the current-conditions dict out of extract's result
+    when extract returns more than that.
+    """
+    with metrics.timed('get_weather_data'):
+        if time_of_search is None:
+            time_of_search = current_time_of_search()
+        today_date = time_of_search[:10]
+
+        tide_times = None
+        if tide_url and tide_cache is not None:
+            tide_times = tide_cache.get(tide_url, today_date)
+
+        jobs = {'forecast': (forecast_url, extract, key)}
+        if tide_url and tide_times is None:
+            jobs['tides'] = (tide_url, extract_all_tides, 'tide_days')
+        results = fetch_all(session, jobs, timeout, cache)
+
+        page = results['forecast']
+        if isinstance(page, Exception):
+            raise page
+        days = results.get('tides')
+        if isinstance(days, Exception):
+            print(f"Could not fetch tide times: {days}")
+        elif days is not None:
+            if tide_cache is not None:
+                tide_cache.update(tide_url, days)
+            tide_times = days.get(today_date)
+        if tide_times is None:
+            tide_times = missing_tide_times()
+
+        weather_data = {'Time of Search': time_of_search}
+        weather_data.update(current_of(page) if current_of else page)
+        weather_data.update(tide_times)
+
+    if metrics.enabled():
+        for name, value in weather_data.items():
+            if is_missing(value):
+                metrics.count('missing_fields', field=name)
+    return weather_data, page
@@ -0,0 +1,132 @@
+import time
+
+from observation import Observation
+from schema import COLUMN_NAMES
+
+SCOPE = ['https://spreadsheets.google.com/feeds',
+         'https://www.googleapis.com/auth/drive']
+
+
+def open_spreadsheet(credentials_path, sheet_url):
+    """Authorizes with a service-account JSON key file and opens the spreadsheet."""
+    # Imported here so SheetSink can be used (and tested) without them installed.
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, SCOPE)
+    gc = gspread.authorize(credentials)
+    return gc.open_by_url(sheet_url)
+
+
+def column_letter(n):
+    """Returns the spreadsheet column letter for a 1-based column number."""
+    letters = ''
+    while n:
+        n, remainder = divmod(n - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def ensure_newest_first_view(spreadsheet, source, columns, title='Newest first'):
+    """Adds a tab that shows the source worksheet sorted newest first.
+
+    The sort is a formula, so rows are appended to the source tab in time
+    order and nobody has to shift existing rows to keep the newest on top.
+    """
+    if title in [worksheet.title for worksheet in spreadsheet.worksheets()]:
+        return spreadsheet.worksheet(title)
+    last = column_letter(len(columns))
+    name = "'%s'" % source.title.replace("'", "''")
+    formula = (f'={{{name}!A1:{last}1; '
+               f'SORT(FILTER({name}!A2:{last}, {name}!A2:A<>""), 1, FALSE)}}')
+    view = spreadsheet.add_worksheet(title=title, rows=1, cols=len(columns))
+    view.update_acell('A1', formula)
+    return view
+
+
+class SheetSink:
+    """Buffers observations and sends them to a worksheet in batches.
+
+    The worksheet handle is kept for the life of the sink, and buffered
+    rows go out in one append_rows call once batch_size rows are waiting
+    or the oldest has waited max_delay seconds. Anything with gspread's
+    append_rows(rows, value_input_option=...) works as the worksheet.
+    """
+
+    def __init__(self, worksheet, batch_size=6, max_delay=3600, clock=time.monotonic):
+        self.worksheet = worksheet
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.clock = clock
+        self.columns = None
+        self.pending = []
+        self._oldest = None
+
+    @classmethod
+    def from_credentials(cls, credentials_path, sheet_url, newest_first_view=None, **kwargs):
+        """Opens the first sheet of a spreadsheet once and wraps it in a sink.
+
+        newest_first_view, if given, is the column list used to set up the
+        'Newest first' tab (see ensure_newest_first_view).
+        """
+        spreadsheet = open_spreadsheet(credentials_path, sheet_url)
+        worksheet = spreadsheet.sheet1
+        if newest_first_view:
+            ensure_newest_first_view(spreadsheet, worksheet, newest_first_view)
+        return cls(worksheet, **kwargs)
+
+    def append(self, row):
+        """Queues one observation and flushes if a threshold has been reached.
+
+        row is an observation.Observation or a dict keyed by column name.
+        Returns True if rows were sent to the sheet. A failed send is
+        reported and the rows stay buffered for the next append or flush;
+        it doesn't raise, since the caller retrying would queue the row twice.
+        """
+        if isinstance(row, Observation):
+            if self.columns is None:
+                self.columns = COLUMN_NAMES
+            self.pending.append(row.to_sheet_row())
+        else:
+            if self.columns is None:
+                self.columns = list(row.keys())
+            self.pending.append([row.get(column, 'N/A') for column in self.columns])
+        if self._oldest is None:
+            self._oldest = self.clock()
+
+        if len(self.pending) >= self.batch_size or self.clock() - self._oldest >= self.max_delay:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Couldn't update the Google Sheet, keeping {len(self.pending)} row(s) for later: {e}")
+                return False
+            return True
+        return False
+
+    def extend(self, rows):
+        """Sends rows straight away in one append_rows call, bypassing the buffer.
+
+        For callers that keep their own queue (spool.Uploader); raises if
+        the call fails so they can send the rows again.
+        """
+        values = []
+        for row in rows:
+            if isinstance(row, Observation):
+                values.append(row.to_sheet_row())
+            else:
+                values.append([row.get(column, 'N/A') for column in self.columns or list(row.keys())])
+        if values:
+            self.worksheet.append_rows(values, value_input_option='RAW')
+
+    def flush(self):
+        """Sends every buffered row in one append_rows call.
+
+        If the call fails the rows stay buffered for the next flush.
+        """
+        if not self.pending:
+            return
+        self.worksheet.append_rows(self.pending, value_input_option='RAW')
+        self.pending = []
+        self._oldest = None
+
+    def close(self):
+        self.flush()
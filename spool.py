@@ -0,0 +1,249 @@
+"""A local write-ahead spool between the scraper and its remote sinks.
+
+Each observation is committed to a SQLite database on local disk (WAL
+mode, fsynced) as soon as it is scraped. An Uploader then sends the rows
+to each sink (Drive CSV, Parquet, Google Sheet, ...) from its own
+background thread, in batches, retrying with backoff. A slow or failing
+sink only delays its own rows, never the scrape, and rows survive a crash
+until every sink has taken them:
+
+    spool = Spool('spool.sqlite')
+    uploader = Uploader(spool, {'csv': store.extend, 'sheet': sheet.extend})
+    uploader.start()
+    ...
+    uploader.put(observation)     # returns once the row is on local disk
+
+Delivery is at least once: a sink whose write succeeded just before a
+crash gets that batch again on restart.
+
+    python spool.py status spool.sqlite
+    python spool.py drop spool.sqlite SINK      # forget a sink that was removed
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from observation import Observation
+
+
+class Spool:
+    """Observations in a SQLite table, with a read position per sink."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(file_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # Every commit reaches the disk before put() returns.
+        self._db.execute('PRAGMA synchronous=FULL')
+        # AUTOINCREMENT: ids must never be reused once delivered rows are deleted.
+        self._db.execute('CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS sinks (name TEXT PRIMARY KEY, done INTEGER NOT NULL)')
+
+    def add_sink(self, name):
+        """Starts tracking a sink; a new one gets every row still in the spool."""
+        with self._lock:
+            self._db.execute('INSERT OR IGNORE INTO sinks VALUES (?, 0)', (name,))
+
+    def remove_sink(self, name):
+        """Stops keeping rows for a sink that is no longer used."""
+        with self._lock:
+            self._db.execute('DELETE FROM sinks WHERE name = ?', (name,))
+            self._db.execute('DELETE FROM rows WHERE id <= (SELECT MIN(done) FROM sinks)')
+
+    def put(self, observation):
+        """Commits one observation (or dict keyed by column name) and returns its id."""
+        if isinstance(observation, Observation):
+            observation = observation.to_dict()
+        with self._lock:
+            return self._db.execute('INSERT INTO rows (row) VALUES (?)', (json.dumps(observation),)).lastrowid
+
+    def read(self, sink, limit):
+        """Returns up to limit [(id, Observation)] the sink hasn't taken yet, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, row FROM rows WHERE id > (SELECT done FROM sinks WHERE name = ?) '
+                'ORDER BY id LIMIT ?', (sink, limit)).fetchall()
+        return [(row_id, Observation.from_row(json.loads(row))) for row_id, row in rows]
+
+    def ack(self, sink, last_id):
+        """Marks every row up to last_id as delivered to the sink, and drops rows all sinks have."""
+        with self._lock:
+            self._db.execute('UPDATE sinks SET done = ? WHERE name = ? AND done < ?', (last_id, sink, last_id))
+            self._db.execute('DELETE FROM rows WHERE id <= (SELECT MIN(done) FROM sinks)')
+
+    def pending(self):
+        """Returns {sink: rows waiting for it}."""
+        with self._lock:
+            return dict(self._db.execute(
+                'SELECT name, (SELECT COUNT(*) FROM rows WHERE id > done) FROM sinks ORDER BY name').fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Uploader:
+    """Drains a Spool into sinks, one background thread per sink.
+
+    sinks maps a name to a function taking a list of Observations; it
+    should raise if the rows weren't stored. Failed batches are retried
+    after retry_delay seconds, doubling up to max_retry_delay, and
+    on_error(name, exception) is called each time (to remount Drive, say).
+    A sink that has fallen behind catches up in batches of up to batch_size.
+    """
+
+    def __init__(self, spool, sinks, batch_size=100, retry_delay=5, max_retry_delay=300, on_error=None):
+        self.spool = spool
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.on_error = on_error
+        self._wake = {name: threading.Event() for name in sinks}
+        self._stopping = threading.Event()
+        self._threads = []
+        for name in sinks:
+            spool.add_sink(name)
+
+    def start(self):
+        for name in self.sinks:
+            thread = threading.Thread(target=self._drain, args=(name,), name=f'upload-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, observation):
+        """Commits the observation to the spool and wakes the sink threads."""
+        with metrics.timed('spool_put'):
+            row_id = self.spool.put(observation)
+        for event in self._wake.values():
+            event.set()
+        return row_id
+
+    def send(self, name):
+        """Sends the sink's next batch; returns how many rows went, raising if the sink failed."""
+        batch = self.spool.read(name, self.batch_size)
+        if not batch:
+            return 0
+        with metrics.timed('upload', sink=name):
+            self.sinks[name]([observation for _, observation in batch])
+        self.spool.ack(name, batch[-1][0])
+        metrics.count('rows_uploaded', len(batch), sink=name)
+        return len(batch)
+
+    def _drain(self, name):
+        wake = self._wake[name]
+        delay = self.retry_delay
+        while not self._stopping.is_set():
+            # Cleared before reading, so a put() from here on wakes the wait below.
+            wake.clear()
+            try:
+                sent = self.send(name)
+                delay = self.retry_delay
+            except Exception as e:
+                metrics.count('upload_errors', sink=name)
+                print(f"Upload to {name} failed, retrying in {delay:g}s: {e}")
+                if self.on_error:
+                    try:
+                        self.on_error(name, e)
+                    except Exception as error:
+                        print(f"on_error for {name} failed: {error}")
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            if sent < self.batch_size:
+                # Caught up: sleep until the next put (or a periodic recheck).
+                wake.wait(60)
+
+    def stop(self, timeout=30):
+        """Stops the threads, then sends what's left for up to timeout seconds.
+
+        Whatever a sink doesn't take in time (or while it is failing) stays
+        in the spool for the next start.
+        """
+        deadline = time.monotonic() + timeout
+        self._stopping.set()
+        for event in self._wake.values():
+            event.set()
+        for name, thread in zip(self.sinks, self._threads):
+            thread.join(max(0, deadline - time.monotonic()))
+            if thread.is_alive():
+                # Still inside a stalled sink call; sending again could duplicate it.
+                continue
+            try:
+                while time.monotonic() < deadline and self.send(name):
+                    pass
+            except Exception as e:
+                print(f"Leaving rows for {name} in the spool: {e}")
+
+    def pending(self):
+        return self.spool.pending()
+
+
+def move_tree(local_root, remote_root):
+    """Moves every file under local_root to the same place under remote_root; returns how many.
+
+    For an uploader sink that ships files written to local disk to a slow
+    mount (Drive). .csv files are appended to the remote file, without
+    their header line if it already exists there; anything else replaces
+    the remote file. Each local file is removed once it is in place, so a
+    failed call is simply made again. Files still being written (.tmp)
+    are left for the next call.
+    """
+    moved = 0
+    for directory, _, names in os.walk(local_root):
+        for name in sorted(names):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(directory, name)
+            if name.endswith('.csv'):
+                if os.path.exists(path + '.moving'):
+                    # Left by a failed call; it goes first, this one next time.
+                    continue
+                # Renamed first, so lines appended from now on go to a new local file.
+                os.replace(path, path + '.moving')
+                path += '.moving'
+            elif name.endswith('.csv.moving'):
+                name = name[:-len('.moving')]
+            remote_path = os.path.join(remote_root, os.path.relpath(directory, local_root), name)
+            os.makedirs(os.path.dirname(remote_path), exist_ok=True)
+            with open(path, 'rb') as f:
+                content = f.read()
+            if name.endswith('.csv'):
+                if os.path.exists(remote_path):
+                    content = content.partition(b'\n')[2]
+                with open(remote_path, 'ab') as f:
+                    f.write(content)
+            else:
+                with open(remote_path + '.tmp', 'wb') as f:
+                    f.write(content)
+                os.replace(remote_path + '.tmp', remote_path)
+            os.remove(path)
+            moved += 1
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    status_parser = commands.add_parser('status', help='rows waiting for each sink')
+    status_parser.add_argument('file_path')
+    drop_parser = commands.add_parser('drop', help='stop keeping rows for a sink')
+    drop_parser.add_argument('file_path')
+    drop_parser.add_argument('sink')
+    args = parser.parse_args()
+
+    spool = Spool(args.file_path)
+    if args.command == 'drop':
+        spool.remove_sink(args.sink)
+    for name, count in spool.pending().items():
+        print(f"{name}: {count} row(s) waiting")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+import argparse
+import csv
+import io
+import os
+
+from observation import Observation
+from schema import COLUMN_NAMES
+
+
+class LogStore:
+    """Base class for the places an observation log can be kept.
+
+    A store takes one observation (an observation.Observation or a dict keyed
+    by column name) at a time and
+    can hand the whole history back newest first, which is the order the
+    original bbc_weather.csv was kept in.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def append(self, row):
+        """Adds a single observation to the log."""
+        raise NotImplementedError
+
+    def read_newest_first(self):
+        """Returns the whole log as a DataFrame, newest observation first."""
+        raise NotImplementedError
+
+
+class AppendOnlyCSVStore(LogStore):
+    """Keeps the log as a chronological CSV that is only ever appended to.
+
+    The header is written once, when the file is created, and each append
+    writes exactly one line and fsyncs it, so the cost of saving a row does
+    not depend on how much history is already on disk. With index=True the
+    query.TimeIndex next to the file is kept up to date as rows are added.
+    """
+
+    def __init__(self, file_path, index=False):
+        super().__init__(file_path)
+        self.columns = None
+        self.index = None
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            if is_newest_first(file_path):
+                migrate_newest_first(file_path)
+            self.columns = read_header(file_path)
+        if index:
+            from query import TimeIndex
+            self.index = TimeIndex(file_path)
+            self.index.refresh()
+
+    def append(self, row):
+        """Appends one observation as a single CSV line and fsyncs it.
+
+        row is an observation.Observation or a dict keyed by column name.
+        """
+        self.extend([row])
+
+    def extend(self, rows):
+        """Appends several observations with one write and one fsync."""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        # Where each row starts in the buffer, and its time of search, for the index.
+        starts = []
+        for row in rows:
+            is_observation = isinstance(row, Observation)
+            if self.columns is None:
+                self.columns = COLUMN_NAMES if is_observation else list(row.keys())
+                writer.writerow(self.columns)
+
+            if is_observation and self.columns == COLUMN_NAMES:
+                values = row.to_csv_row()
+            else:
+                if is_observation:
+                    row = row.to_dict()
+                values = [row.get(column, 'N/A') for column in self.columns]
+            starts.append((buffer.tell(), values))
+            writer.writerow(values)
+
+        text = buffer.getvalue()
+        data = text.encode('utf-8')
+        with open(self.file_path, 'ab') as f:
+            start = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self.index is not None:
+            time_column = self.columns.index('Time of Search') if 'Time of Search' in self.columns else 0
+            bounds = [position for position, _ in starts] + [len(text)]
+            lines = [('', text[:bounds[0]].encode('utf-8'))]
+            for (position, values), end in zip(starts, bounds[1:]):
+                lines.append((values[time_column], text[position:end].encode('utf-8')))
+            self.index.appended(start, lines)
+
+    def read(self):
+        """Returns the whole log as a DataFrame in the order it was written."""
+        import pandas as pd
+        return pd.read_csv(self.file_path)
+
+    def read_newest_first(self):
+        """Returns the whole log as a DataFrame, newest observation first."""
+        return self.read().iloc[::-1].reset_index(drop=True)
+
+    def iter_newest_first(self):
+        """Yields rows as dicts from the end of the file backwards without loading it all."""
+        if self.columns is None:
+            return
+        for line in _iter_lines_backwards(self.file_path):
+            values = next(csv.reader([line]))
+            if values == self.columns:
+                break
+            yield dict(zip(self.columns, values))
+
+
+class RewriteCSVStore(LogStore):
+    """The original behaviour: prepend the row and rewrite the whole file.
+
+    Kept so the old newest-first layout is still available, e.g. for files
+    other tools read directly. Every append costs O(history).
+    """
+
+    def append(self, row):
+        """Puts the observation at the top of the file and rewrites it."""
+        import pandas as pd
+        if isinstance(row, Observation):
+            row = row.to_dict()
+        df = pd.DataFrame([row])
+        if os.path.exists(self.file_path):
+            existing_df = pd.read_csv(self.file_path)
+            df = pd.concat([df, existing_df], ignore_index=True)
+        df.to_csv(self.file_path, index=False)
+
+    def read_newest_first(self):
+        """Returns the whole log as a DataFrame, newest observation first."""
+        import pandas as pd
+        return pd.read_csv(self.file_path)
+
+
+class DeltaCSVStore(LogStore):
+    """A chronological, append-only CSV that only writes fields that changed.
+
+    Same columns as bbc_weather.csv, but a field equal to the one in the row
+    before is left empty, and trailing empty fields are dropped. Sunrise,
+    sunset, tides, UV, pollen and pollution change once a day and most
+    current conditions once an hour, so a typical 10-minute row is just
+    the time of search and a comma or two. Missing values are still
+    written as 'N/A', so an empty field always means "unchanged". The
+    first row and every keyframe_every-th row after it are written in full,
+    so a damaged line only affects the rows up to the next keyframe.
+
+    read() and iter_rows() give back full rows.
+    """
+
+    def __init__(self, file_path, keyframe_every=144):
+        super().__init__(file_path)
+        self.keyframe_every = keyframe_every
+        self.columns = None
+        self.previous = None
+        self.since_keyframe = 0
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            self.columns = read_header(file_path)
+            self.previous, self.since_keyframe = self._last_row()
+
+    def _last_row(self):
+        """Rebuilds the last full row from the end of the file back to its keyframe."""
+        tail = []
+        for line in _iter_lines_backwards(self.file_path):
+            values = next(csv.reader([line]))
+            if values == self.columns:
+                break
+            tail.append(values)
+            if _is_full(values, len(self.columns)):
+                break
+        previous = None
+        for values in reversed(tail):
+            previous = _expand(values, previous, len(self.columns))
+        return previous, max(len(tail) - 1, 0)
+
+    def append(self, row):
+        """Appends one observation, writing only the fields that changed."""
+        self.extend([row])
+
+    def extend(self, rows):
+        """Appends several observations with one write and one fsync."""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        for row in rows:
+            is_observation = isinstance(row, Observation)
+            if self.columns is None:
+                self.columns = COLUMN_NAMES if is_observation else list(row.keys())
+                writer.writerow(self.columns)
+            if is_observation and self.columns == COLUMN_NAMES:
+                values = row.to_csv_row()
+            else:
+                if is_observation:
+                    row = row.to_dict()
+                values = [row.get(column, 'N/A') for column in self.columns]
+            # Empty means "unchanged" here, so a value that is empty anyway is written as missing.
+            values = ['N/A' if value is None or value == '' else str(value) for value in values]
+
+            if self.previous is None or self.since_keyframe + 1 >= self.keyframe_every:
+                writer.writerow(values)
+                self.since_keyframe = 0
+            else:
+                changed = [values[0]] + [value if value != before else ''
+                                         for value, before in zip(values[1:], self.previous[1:])]
+                while changed[-1] == '' and len(changed) > 1:
+                    changed.pop()
+                writer.writerow(changed)
+                self.since_keyframe += 1
+            self.previous = values
+
+        with open(self.file_path, 'a', newline='', encoding='utf-8') as f:
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_rows(self):
+        """Yields every row in full, as a list of values in column order, oldest first."""
+        if self.columns is None:
+            return
+        with open(self.file_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            previous = None
+            for values in reader:
+                if not values:
+                    continue
+                previous = _expand(values, previous, len(self.columns))
+                yield previous
+
+    def iter_observations(self):
+        """Yields an observation.Observation per row, skipping rows without a usable time."""
+        for values in self.iter_rows():
+            try:
+                yield Observation.from_csv_row(values, self.columns)
+            except ValueError:
+                continue
+
+    def to_csv(self, file_path):
+        """Writes the log out in full as an ordinary bbc_weather.csv."""
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            if self.columns is not None:
+                writer.writerow(self.columns)
+                writer.writerows(self.iter_rows())
+        os.replace(tmp_path, file_path)
+
+    def read(self):
+        """Returns the whole log as a DataFrame in the order it was written, every field filled in."""
+        import pandas as pd
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(self.columns or [])
+        writer.writerows(self.iter_rows())
+        buffer.seek(0)
+        return pd.read_csv(buffer)
+
+    def read_newest_first(self):
+        """Returns the whole log as a DataFrame, newest observation first."""
+        return self.read().iloc[::-1].reset_index(drop=True)
+
+
+def _is_full(values, width):
+    return len(values) == width and all(value != '' for value in values)
+
+
+def _expand(values, previous, width):
+    """Fills a delta row's empty and dropped fields from the full row before it."""
+    if previous is None:
+        return values + ['N/A'] * (width - len(values))
+    return [value if value != '' else before
+            for value, before in zip(values + [''] * (width - len(values)), previous)]
+
+
+def convert_to_delta(csv_path, delta_path, keyframe_every=144):
+    """Writes an ordinary bbc_weather.csv out as a DeltaCSVStore file."""
+    if os.path.exists(delta_path):
+        raise ValueError(f"{delta_path} already exists")
+    store = DeltaCSVStore(delta_path, keyframe_every)
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return store
+        batch = []
+        for values in reader:
+            if values:
+                batch.append(dict(zip(header, values)))
+            if len(batch) >= 10000:
+                store.extend(batch)
+                batch = []
+        store.extend(batch)
+    return store
+
+
+BACKENDS = {
+    'append': AppendOnlyCSVStore,
+    'rewrite': RewriteCSVStore,
+    'delta': DeltaCSVStore,
+}
+
+
+def open_store(file_path, backend='append', **options):
+    """Returns the log store for file_path using the named backend.
+
+    options go to the backend's constructor, e.g. index=True for 'append'.
+    """
+    try:
+        store_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend}") from None
+    return store_class(file_path, **options)
+
+
+def read_header(file_path):
+    """Returns the column names from the first line of a CSV file."""
+    with open(file_path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+
+def is_newest_first(file_path):
+    """Checks whether a log file has its newest row at the top.
+
+    Only the first and last data rows are read. 'Time of Search' values are
+    'YYYY-MM-DD HH:MM' strings, so they compare correctly as text.
+    """
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        first = next(reader, None)
+    if not first:
+        return False
+    last_line = next(_iter_lines_backwards(file_path), None)
+    last = next(csv.reader([last_line])) if last_line else None
+    if not last or last == first:
+        return False
+    return first[0] > last[0]
+
+
+def migrate_newest_first(file_path):
+    """Rewrites a newest-first log in chronological order, once."""
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    rows.reverse()
+
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def _iter_lines_backwards(file_path, block_size=65536):
+    """Yields the non-empty lines of a text file, last line first."""
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                line = line.rstrip(b'\r')
+                if line:
+                    yield line.decode('utf-8')
+        if remainder:
+            yield remainder.rstrip(b'\r').decode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Converts a log between the full and change-only CSV layouts.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help in (('to-delta', 'full bbc_weather.csv to a DeltaCSVStore file'),
+                       ('expand', 'DeltaCSVStore file to a full bbc_weather.csv')):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('source')
+        command.add_argument('destination')
+    args = parser.parse_args()
+
+    if args.command == 'to-delta':
+        convert_to_delta(args.source, args.destination)
+    else:
+        DeltaCSVStore(args.source).to_csv(args.destination)
+    print(f"{args.source} ({os.path.getsize(args.source) / 1024:.0f} KB) -> "
+          f"{args.destination} ({os.path.getsize(args.destination) / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
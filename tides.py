@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+from extraction import TIDE_FIELDS
+from schema import is_missing
+
+# Bumped when tide extraction changes in a way the field paths don't show
+# (section lookup, conversions).
+CACHE_VERSION = 1
+
+# Changes whenever the tide fields are read differently, so tables cached by
+# an older extraction.py are dropped instead of being served for days.
+EXTRACTION_STAMP = hashlib.sha1('|'.join(
+    [str(CACHE_VERSION)] + [f'{field.name}:{field.xpath.path}:{field.suffix}' for field in TIDE_FIELDS]
+).encode()).hexdigest()[:12]
+
+
+class TideCache:
+    """Tide tables by station URL and date, kept in a small JSON file.
+
+    A tide page lists several days at once, so after one download the
+    following days can be answered without fetching the page again. Days
+    that came back with every field missing aren't kept, so they are
+    fetched again, and the file is ignored if it was written with other
+    tide field definitions (EXTRACTION_STAMP).
+    """
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+        self._stations = {}
+        self._lock = threading.Lock()
+        if file_path and os.path.exists(file_path):
+            try:
+                with open(file_path, encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable tide cache {file_path}: {e}")
+            else:
+                if isinstance(saved, dict) and saved.get('extraction') == EXTRACTION_STAMP:
+                    self._stations = saved['stations']
+                else:
+                    print(f"Ignoring tide cache {file_path} from an older extraction")
+
+    def get(self, url, day):
+        """Returns the cached tide columns for url on day ('YYYY-MM-DD'), or None."""
+        with self._lock:
+            return self._stations.get(url, {}).get(day)
+
+    def update(self, url, days):
+        """Stores the days parsed from a tide page, dropping days already past."""
+        # A day of slack so a clock in another timezone never drops "today".
+        cutoff = (date.today() - timedelta(days=1)).isoformat()
+        with self._lock:
+            station = self._stations.setdefault(url, {})
+            station.update({day: tides for day, tides in days.items()
+                            if not all(is_missing(value) for value in tides.values())})
+            for day in [day for day in station if day < cutoff]:
+                del station[day]
+            self._save()
+
+    def _save(self):
+        if not self.file_path:
+            return
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'extraction': EXTRACTION_STAMP, 'stations': self._stations}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.file_path)
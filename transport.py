@@ -0,0 +1,109 @@
+"""The HTTP session every scraper shares.
+
+    session = Transport()
+    get_weather_data(session, time_of_search, cache=cache, tide_cache=tide_cache)
+    print(session.stats())
+
+Transport is a requests.Session with:
+  * a pool of up to pool_size kept-alive connections per host (for up to
+    `hosts` hosts), so create one per process and keep it across runs;
+  * Accept-Encoding for every encoding urllib3 can decode here: gzip and
+    deflate always, br when the brotli package is installed, zstd with
+    zstandard;
+  * (connect, read) timeouts on every request that doesn't pass its own;
+  * retries of connection errors, timeouts and 429/5xx answers, waiting
+    backoff * 2**n seconds plus up to `jitter` seconds more, or however long
+    Retry-After asks for (at most max_retry_after);
+  * counters for connections opened and reused and for bytes on the wire
+    against bytes after decoding (stats()).
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from fetch import DEFAULT_TIMEOUT
+
+# Answers worth asking again for; bbc.com sends 503 with Retry-After when busy.
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class Transport(requests.Session):
+    """A requests.Session with pooling, compression, timeouts, retries and statistics."""
+
+    def __init__(self, pool_size=10, hosts=10, timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.5, jitter=0.5,
+                 max_backoff=10, max_retry_after=30):
+        super().__init__()
+        self.timeout = timeout
+        self.headers['Accept-Encoding'] = ', '.join(ACCEPT_ENCODING.split(','))
+        retry = Retry(total=retries, redirect=5, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset(['GET', 'HEAD']), backoff_factor=backoff, backoff_jitter=jitter,
+                      backoff_max=max_backoff, respect_retry_after_header=True, retry_after_max=max_retry_after,
+                      raise_on_status=False)
+        self.adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, max_retries=retry)
+        self.mount('https://', self.adapter)
+        self.mount('http://', self.adapter)
+        self.responses = 0
+        self.retries = 0
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        response = super().send(request, **kwargs)
+        history = response.raw.retries.history if response.raw.retries else ()
+        with self._lock:
+            self.responses += 1
+            self.retries += len(history)
+        if kwargs.get('stream'):
+            self._count_when_read(response)
+        else:
+            self._count(wire=response.raw.tell(), body=len(response.content))
+        return response
+
+    def _count(self, wire=0, body=0):
+        with self._lock:
+            self.wire_bytes += wire
+            self.body_bytes += body
+
+    def _count_when_read(self, response):
+        """Counts a streamed response's decoded bytes as they are read and its wire bytes when it is closed."""
+        iter_content, close = response.iter_content, response.close
+
+        def counted_iter_content(*args, **kwargs):
+            # Once read, .content is replayed from memory; don't count it twice.
+            counting = not response._content_consumed
+            for chunk in iter_content(*args, **kwargs):
+                if counting:
+                    self._count(body=len(chunk))
+                yield chunk
+
+        def counted_close():
+            self._count(wire=response.raw.tell())
+            close()
+
+        response.iter_content = counted_iter_content
+        response.close = counted_close
+
+    def stats(self):
+        """Returns the connection and byte counters.
+
+        requests counts every attempt (retries included) over the open host
+        pools, connections the TCP connections those pools opened; the rest
+        were served over a kept-alive one.
+        """
+        pools = self.adapter.poolmanager.pools
+        opened = attempts = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                attempts += pool.num_requests
+        with self._lock:
+            return {'requests': attempts, 'connections': opened, 'reused': attempts - opened,
+                    'responses': self.responses, 'retries': self.retries,
+                    'wire_bytes': self.wire_bytes, 'body_bytes': self.body_bytes}
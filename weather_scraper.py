@@ -0,0 +1,191 @@
+"""Runs the scraper as a long-lived process on any machine, no Colab needed.
+
+Usage: python weather_scraper.py run [--csv bbc_weather.csv] [--interval 1800]
+           [--parquet DIR] [--forecasts DIR] [--pages DIR] [--aggregates FILE]
+           [--sheet-url URL --credentials KEY.json] [--spool FILE]
+           [--metrics-file FILE | --metrics-port N]
+
+Every sink is optional, and the libraries behind one (pyarrow, gspread,
+oauth2client) are only imported when it is turned on, so a CSV-only worker
+starts quickly and stays small. The time of search and the tide day come
+from each run's slot, so a process can run for weeks. SIGTERM and Ctrl-C
+flush buffered rows before exiting. With --spool, rows are committed to
+local disk first and uploaded in the background, so a slow Drive mount or
+Sheets API never holds up (or loses) a scrape.
+"""
+import argparse
+import signal
+
+import metrics
+from fetch import PageCache
+from locations import LONDON, Location, forecast_url, tide_url
+from observation import Observation
+from scheduler import Scheduler
+from scraper import get_weather_and_forecast, get_weather_data
+from storage import open_store
+from tides import TideCache
+from transport import Transport
+
+
+class Sinks:
+    """The places each observation goes, built from the command-line options.
+
+    With --spool, observations are committed to a local spool.Spool and
+    background threads upload them to each sink in batches; otherwise each
+    sink is written in turn during the run.
+    """
+
+    def __init__(self, args):
+        # name -> (write one observation, write a batch, flush on exit)
+        self.sinks = {}
+        self.forecasts = None
+        options = {'index': not args.no_index} if args.backend == 'append' else {}
+        store = open_store(args.csv, args.backend, **options)
+        self.sinks['csv_write'] = (store.append, store.extend, None)
+
+        if args.parquet:
+            from archive import ParquetArchive
+            archive = ParquetArchive(args.parquet)
+            self.sinks['archive_write'] = (archive.append, archive.extend, archive.close)
+        if args.forecasts:
+            from archive import ForecastArchive
+            self.forecasts = ForecastArchive(args.forecasts)
+        if args.aggregates:
+            from aggregates import Aggregates
+            aggregates = Aggregates(args.aggregates)
+
+            def aggregate(observations):
+                for observation in observations:
+                    aggregates.add(observation)
+                aggregates.save()
+            self.sinks['aggregates'] = (lambda observation: aggregate([observation]), aggregate, None)
+        if args.sheet_url:
+            from schema import COLUMN_NAMES
+            from sheets import SheetSink
+            sheet = SheetSink.from_credentials(args.credentials, args.sheet_url, newest_first_view=COLUMN_NAMES)
+            self.sinks['sheets'] = (sheet.append, sheet.extend, sheet.close)
+
+        self.uploader = None
+        if args.spool:
+            from spool import Spool, Uploader
+            self.uploader = Uploader(Spool(args.spool), {name: write_batch for name, (_, write_batch, _)
+                                                         in self.sinks.items()}).start()
+
+    def write(self, observation, forecast=None):
+        """Writes one run's observation (and forecast) to every sink.
+
+        Only a failure of the first sink (the CSV) raises, so the scheduler
+        retries the run. Once the CSV has the row, raising would make the
+        retry write it there again, so errors from the other sinks are only
+        reported; the archives keep failed rows buffered for their next write.
+        """
+        if self.uploader:
+            self.uploader.put(observation)
+        else:
+            for i, (stage, (write, _, _)) in enumerate(self.sinks.items()):
+                try:
+                    with metrics.timed(stage):
+                        write(observation)
+                except Exception as e:
+                    if i == 0:
+                        raise
+                    print(f"Couldn't write to {stage}: {e}")
+        if self.forecasts and forecast is not None:
+            try:
+                with metrics.timed('forecast_write'):
+                    self.forecasts.append(forecast)
+            except Exception as e:
+                print(f"Couldn't write forecasts, will retry next run: {e}")
+
+    def close(self):
+        if self.uploader:
+            self.uploader.stop()
+        closers = [] if self.uploader else [close for _, _, close in self.sinks.values() if close]
+        if self.forecasts:
+            closers.append(self.forecasts.close)
+        for close in closers:
+            try:
+                close()
+            except Exception as e:
+                print(f"Couldn't flush on exit: {e}")
+
+
+def run(args):
+    if args.metrics_port or args.metrics_file:
+        metrics.enable()
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+    location = Location(args.geo_id, args.tide_station or None)
+    urls = {'forecast_url': forecast_url(location), 'tide_url': tide_url(location)}
+    session = transport = Transport()
+    if args.pages:
+        from page_archive import ArchivingSession, PageArchive
+        session = ArchivingSession(session, PageArchive(args.pages))
+    cache = PageCache(stream=args.stream)
+    tide_cache = TideCache(args.tide_cache)
+    sinks = Sinks(args)
+
+    def run_once(slot):
+        time_of_search = slot.strftime('%Y-%m-%d %H:%M')
+        if sinks.forecasts:
+            weather_data, forecast = get_weather_and_forecast(session, time_of_search, cache=cache,
+                                                              tide_cache=tide_cache, **urls)
+        else:
+            weather_data = get_weather_data(session, time_of_search, cache=cache, tide_cache=tide_cache, **urls)
+            forecast = None
+        sinks.write(Observation.from_row(weather_data), forecast)
+        print(f"{time_of_search} {weather_data['Current Temperature(°C)']}°C "
+              f"{weather_data['Weather Condition']} saved; page cache {cache.stats()}, "
+              f"transport {transport.stats()}")
+        if metrics.enabled():
+            print(metrics.cycle_summary(time_of_search=time_of_search))
+            if args.metrics_file:
+                metrics.write_textfile(args.metrics_file)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        Scheduler(run_once, args.interval, catch_up=args.catch_up, state_path=args.state).run()
+    except KeyboardInterrupt:
+        print("Stopping")
+    finally:
+        sinks.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='scrape on every interval until stopped')
+    run_parser.add_argument('--csv', default='bbc_weather.csv', help='observation log to append to')
+    run_parser.add_argument('--backend', choices=['append', 'delta'], default='append',
+                            help="'delta' writes only the fields that changed (see storage.DeltaCSVStore)")
+    run_parser.add_argument('--no-index', action='store_true', help="don't keep the query.py index")
+    run_parser.add_argument('--interval', type=float, default=1800, help='seconds between runs')
+    run_parser.add_argument('--catch-up', action='store_true', help='run slots missed while stopped')
+    run_parser.add_argument('--state', help='file the scheduler keeps its last slot in')
+    run_parser.add_argument('--geo-id', default=LONDON.geo_id, help='BBC forecast location')
+    run_parser.add_argument('--tide-station', default=LONDON.tide_station, help="'' for none")
+    run_parser.add_argument('--tide-cache', default='tide_cache.json')
+    run_parser.add_argument('--parquet', help='also write a Parquet archive here (needs pyarrow)')
+    run_parser.add_argument('--forecasts', help='also archive the whole forecast here (needs pyarrow)')
+    run_parser.add_argument('--pages', help='also keep every raw page here')
+    run_parser.add_argument('--stream', action='store_true',
+                            help='parse pages as they download, keeping only the parts read from')
+    run_parser.add_argument('--spool', help='commit rows to this local SQLite file and upload them '
+                                            'from background threads, retrying failed sinks')
+    run_parser.add_argument('--aggregates', help='keep running statistics in this JSON file')
+    run_parser.add_argument('--sheet-url', help='also send rows to this Google Sheet (needs gspread)')
+    run_parser.add_argument('--credentials', help='service-account JSON key for --sheet-url')
+    run_parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this port')
+    run_parser.add_argument('--metrics-file', help='write Prometheus metrics to this file after each run')
+    args = parser.parse_args()
+    if args.sheet_url and not args.credentials:
+        parser.error('--sheet-url needs --credentials')
+    if args.command == 'run':
+        run(args)
+
+
+if __name__ == '__main__':
+    main()